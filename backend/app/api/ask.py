@@ -1,16 +1,118 @@
 """Ask模式API - RAG问答"""
+import time
 from fastapi import APIRouter
 from fastapi.responses import StreamingResponse
 import json
+from typing import List, Optional, Tuple
+
+import numpy as np
 
 from app.schemas.models import AskRequest
+from app.infrastructure.cache import LRUCache
+from app.infrastructure.config import settings
 from app.infrastructure.logger import get_logger
 from app.infrastructure.vector_store import get_vector_store
+from app.infrastructure.warmup import get_warmup
 from app.core.llm import LLMFactory
 
 router = APIRouter()
 logger = get_logger("tc_agent.api.ask")
 
+# 回放缓存回答时每个content事件的字符数
+REPLAY_CHUNK_CHARS = 64
+
+# (归一化query embedding, 回答, 写入时间)
+_AnswerEntry = Tuple[np.ndarray, str, float]
+
+
+class SemanticAnswerCache:
+    """语义答案缓存
+
+    - 按 (知识库版本, 模型, 知识类型, 检索来源集合) 分桶,桶内按query embedding余弦相似度匹配
+    - 来源集合相同才可能命中,保证回答所依据的参考资料一致
+    - 知识库任一集合增删/重置后版本变化,旧回答不再命中并随LRU淘汰
+    - 条目数/字节数上限与TTL复用LRUCache
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries: int = 512,
+        max_bytes: int = 0,
+        ttl_seconds: float = 0,
+    ):
+        self.threshold = threshold
+        self.ttl_seconds = max(0.0, ttl_seconds)
+        # 桶内条目数通常为1~2,按桶计条目数,按回答长度计字节
+        self._buckets: LRUCache[Tuple[_AnswerEntry, ...]] = LRUCache(
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+            ttl_seconds=ttl_seconds,
+            sizeof=lambda entries: sum(len(e[1].encode("utf-8")) + e[0].nbytes for e in entries),
+        )
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vec))
+        return vec / norm if norm else vec
+
+    def _live(self, entries: Tuple[_AnswerEntry, ...]) -> List[_AnswerEntry]:
+        if not self.ttl_seconds:
+            return list(entries)
+        deadline = time.monotonic() - self.ttl_seconds
+        return [e for e in entries if e[2] >= deadline]
+
+    def get(self, key: tuple, embedding: List[float]) -> Optional[str]:
+        entries = self._buckets.get(key)
+        if not entries:
+            return None
+        query = self._normalize(embedding)
+        best, best_score = None, self.threshold
+        for vec, answer, _ in self._live(entries):
+            score = float(vec @ query)
+            if score >= best_score:
+                best, best_score = answer, score
+        return best
+
+    def set(self, key: tuple, embedding: List[float], answer: str) -> None:
+        entry = (self._normalize(embedding), answer, time.monotonic())
+        entries = self._live(self._buckets.get(key) or ())
+        self._buckets.set(key, (*entries, entry))
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+    def stats(self) -> dict:
+        return self._buckets.stats()
+
+
+_answer_cache: Optional[SemanticAnswerCache] = None
+
+
+def get_answer_cache() -> Optional[SemanticAnswerCache]:
+    """获取语义答案缓存(单例),未开启时返回None"""
+    global _answer_cache
+    if not settings.ask_answer_cache_enabled:
+        return None
+    if _answer_cache is None:
+        _answer_cache = SemanticAnswerCache(
+            threshold=settings.ask_answer_cache_threshold,
+            max_entries=settings.ask_answer_cache_size,
+            max_bytes=settings.ask_answer_cache_max_bytes,
+            ttl_seconds=settings.ask_answer_cache_ttl,
+        )
+    return _answer_cache
+
+
+def _answer_cache_key(version: tuple, knowledge_type: str, docs) -> tuple:
+    """缓存分桶键"""
+    sources = frozenset(
+        d.metadata.get("parent_id") or d.metadata.get("source", "") for d in docs
+    )
+    model = f"{settings.llm_provider}:{settings.get_default_model()}"
+    return (version, model, knowledge_type, sources)
+
 
 def build_ask_prompt(query: str, context: str) -> str:
     """构建Ask模式的prompt"""
@@ -35,15 +137,44 @@ async def ask_question_stream(body: AskRequest):
 
     async def generate():
         try:
-            # 发送检索状态
-            yield f"data: {json.dumps({'type': 'status', 'data': '正在检索相关文档...'}, ensure_ascii=False)}\n\n"
-
-            # 获取向量存储
-            vector_store = await get_vector_store()
-            retriever = vector_store.get_retriever(body.knowledge_type or "all")
+            warmup = get_warmup()
+            cache = embedding = version = None
+            if warmup.initializing:
+                # 向量库仍在后台初始化: 不等待,直接基于模型知识回答
+                yield f"data: {json.dumps({'type': 'status', 'data': '知识库正在加载,本次回答未使用参考资料'}, ensure_ascii=False)}\n\n"
+                docs = []
+            else:
+                # 发送检索状态
+                yield f"data: {json.dumps({'type': 'status', 'data': '正在检索相关文档...'}, ensure_ascii=False)}\n\n"
+                if warmup.syncing:
+                    yield f"data: {json.dumps({'type': 'status', 'data': '预置知识库同步中,参考资料可能不完整'}, ensure_ascii=False)}\n\n"
+
+                # 获取向量存储
+                vector_store = await get_vector_store()
+                retriever = vector_store.get_retriever(
+                    body.knowledge_type or "all", namespace=body.workspace_id
+                )
 
-            # RAG检索
-            docs = await retriever.retrieve(body.query, top_k=5, where={"scope": "ask"})
+                # 知识库版本取自检索之前,检索期间有写入时回答只会存到旧版本下
+                cache = get_answer_cache()
+                embedding = getattr(vector_store, "embedding", None)
+                version = getattr(vector_store, "version", None)
+                if version is not None and body.workspace_id:
+                    # 命名空间的写入不改变全局版本,需要单独计入
+                    version = (version, vector_store.namespace_version(body.workspace_id))
+
+                # RAG检索
+                docs = await retriever.retrieve(body.query, top_k=5, where={"scope": "ask"})
+
+            # 语义缓存: 相似问题且来源相同时直接回放已有回答
+            cache_key = query_embedding = None
+            if cache is not None and embedding is not None and version is not None:
+                knowledge = body.knowledge_type or "all"
+                if body.workspace_id:
+                    knowledge = f"{knowledge}@{body.workspace_id}"
+                cache_key = _answer_cache_key(version, knowledge, docs)
+                # 同一query的embedding通常已在查询缓存中
+                query_embedding = await embedding.embed(body.query)
 
             # 发送来源信息
             sources_data = [
@@ -52,6 +183,15 @@ async def ask_question_stream(body: AskRequest):
             ]
             yield f"data: {json.dumps({'type': 'sources', 'data': sources_data}, ensure_ascii=False)}\n\n"
 
+            cached_answer = cache.get(cache_key, query_embedding) if cache_key is not None else None
+            if cached_answer is not None:
+                logger.info("Ask命中语义缓存", query=body.query[:50])
+                for start in range(0, len(cached_answer), REPLAY_CHUNK_CHARS):
+                    piece = cached_answer[start : start + REPLAY_CHUNK_CHARS]
+                    yield f"data: {json.dumps({'type': 'content', 'data': piece}, ensure_ascii=False)}\n\n"
+                yield f"data: {json.dumps({'type': 'done', 'cached': True})}\n\n"
+                return
+
             # 发送生成状态
             yield f"data: {json.dumps({'type': 'status', 'data': '正在生成回答...'}, ensure_ascii=False)}\n\n"
 
@@ -70,9 +210,15 @@ async def ask_question_stream(body: AskRequest):
             llm = LLMFactory.create_from_config()
             prompt = build_ask_prompt(body.query, context)
 
+            parts = []
             async for chunk in llm.stream(prompt):
+                parts.append(chunk)
                 yield f"data: {json.dumps({'type': 'content', 'data': chunk}, ensure_ascii=False)}\n\n"
 
+            answer = "".join(parts)
+            if cache_key is not None and answer.strip():
+                cache.set(cache_key, query_embedding, answer)
+
             yield f"data: {json.dumps({'type': 'done'})}\n\n"
 
         except Exception as e:
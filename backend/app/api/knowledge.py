@@ -1,8 +1,19 @@
 """知识库管理API"""
-from fastapi import APIRouter, HTTPException
+import asyncio
+import uuid
+from pathlib import Path
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import FileResponse
+from starlette.background import BackgroundTask
 
 from app.schemas.models import AddDocumentRequest
+from app.infrastructure.config import settings
+from app.infrastructure.ingest_jobs import BULK_FORMATS, get_ingest_jobs
+from app.infrastructure.knowledge_watcher import get_knowledge_watcher
 from app.infrastructure.logger import get_logger
+from app.infrastructure.snapshot import SNAPSHOT_SUFFIX
 from app.infrastructure.vector_store import get_vector_store
 
 router = APIRouter()
@@ -12,7 +23,12 @@ logger = get_logger("tc_agent.api.knowledge")
 @router.post("/add-document")
 async def add_document(body: AddDocumentRequest):
     """添加单个文档"""
-    logger.info("添加文档", collection=body.collection, content_len=len(body.content))
+    logger.info(
+        "添加文档",
+        collection=body.collection,
+        namespace=body.namespace,
+        content_len=len(body.content),
+    )
 
     try:
         vector_store = await get_vector_store()
@@ -20,13 +36,106 @@ async def add_document(body: AddDocumentRequest):
             collection=body.collection,
             documents=[body.content],
             metadatas=[body.metadata],
+            namespace=body.namespace,
         )
         return {"status": "success", "message": "文档已添加"}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error("添加文档失败", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
+_CONTENT_TYPE_FORMATS = {
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/zip": "zip",
+    "application/x-zip-compressed": "zip",
+    "application/x-tar": "tar",
+    "application/gzip": "tar",
+    "application/x-gzip": "tar",
+    "application/x-gtar": "tar",
+}
+
+
+# 上传内容攒到此大小再交给线程写盘,避免每个小块都切换线程
+_UPLOAD_FLUSH_BYTES = 1 << 20
+
+
+async def _save_upload(request: Request, path: Path, max_bytes: int) -> int:
+    """把请求体流式写入path(文件IO在线程中执行,不阻塞事件循环),返回字节数"""
+    size = 0
+    buffer = bytearray()
+    f = await asyncio.to_thread(open, path, "wb")
+    try:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(status_code=413, detail="上传内容超过大小限制")
+            buffer += chunk
+            if len(buffer) >= _UPLOAD_FLUSH_BYTES:
+                await asyncio.to_thread(f.write, buffer)
+                buffer.clear()
+        if buffer:
+            await asyncio.to_thread(f.write, buffer)
+    finally:
+        await asyncio.to_thread(f.close)
+    if size == 0:
+        raise HTTPException(status_code=400, detail="上传内容为空")
+    return size
+
+
+@router.post("/bulk", status_code=202)
+async def bulk_ingest(
+    request: Request,
+    format: Optional[str] = None,
+    collection: Optional[str] = None,
+    scope: Optional[str] = None,
+):
+    """批量导入(NDJSON或tar/zip归档)
+
+    请求体流式写入磁盘后立即返回job_id,切分与embedding在后台任务中进行,
+    进度通过 GET /knowledge/jobs/{job_id} 查询。
+    - NDJSON: 每行 {"content": ..., "metadata": {...}, "collection": "text"}
+    - 归档: 按扩展名导入 .md/.txt/.c/.h/.py 等文本文件,collection参数可统一指定集合
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    fmt = (format or _CONTENT_TYPE_FORMATS.get(content_type, "")).lower()
+    if fmt not in BULK_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"无法识别的导入格式,请通过format参数指定: {', '.join(BULK_FORMATS)}",
+        )
+
+    jobs = get_ingest_jobs()
+    job_id, path = jobs.new_upload_path()
+    try:
+        size = await _save_upload(request, path, settings.knowledge_bulk_max_bytes)
+        job = jobs.submit(job_id, path, fmt, collection=collection, scope=scope)
+    except Exception:
+        path.unlink(missing_ok=True)
+        raise
+
+    logger.info("批量导入已受理", job_id=job_id, format=fmt, bytes=size)
+    return job.to_dict()
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """查询批量导入任务进度"""
+    job = get_ingest_jobs().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"任务 {job_id} 不存在")
+    return job.to_dict()
+
+
+@router.get("/jobs")
+async def list_jobs():
+    """列出最近的批量导入任务"""
+    return {"jobs": [job.to_dict() for job in reversed(get_ingest_jobs().jobs.values())]}
+
+
 @router.get("/stats")
 async def get_stats():
     """获取知识库统计"""
@@ -57,6 +166,29 @@ async def delete_collection(name: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.delete("/document/{doc_id}")
+async def delete_document(
+    doc_id: str, collection: Optional[str] = None, namespace: Optional[str] = None
+):
+    """按doc_id删除文档(可选限定集合/命名空间)"""
+    logger.info("删除文档", doc_id=doc_id, collection=collection, namespace=namespace)
+
+    try:
+        vector_store = await get_vector_store()
+        deleted = await vector_store.delete_document(
+            doc_id, collection=collection, namespace=namespace
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("删除文档失败", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"文档 {doc_id} 不存在")
+    return {"status": "success", "doc_id": doc_id, "collections": deleted}
+
+
 @router.post("/reload-preset")
 async def reload_preset():
     """重新加载预置知识库"""
@@ -70,3 +202,104 @@ async def reload_preset():
     except Exception as e:
         logger.error("加载预置知识库失败", error=str(e))
         raise HTTPException(status_code=500, detail=str(e))
+
+
+@router.get("/namespaces")
+async def list_namespaces():
+    """列出有私有知识的命名空间及当前打开的索引"""
+    vector_store = await get_vector_store()
+    return {
+        "namespaces": vector_store.list_namespaces(),
+        "open": vector_store.open_namespaces,
+        "evictions": vector_store.namespace_evictions,
+    }
+
+
+@router.get("/namespace/{namespace}")
+async def namespace_stats(namespace: str):
+    """命名空间各集合的文档数"""
+    vector_store = await get_vector_store()
+    try:
+        return await vector_store.namespace_stats(namespace)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.delete("/namespace/{namespace}")
+async def delete_namespace(namespace: str):
+    """删除命名空间的全部私有知识"""
+    logger.info("删除命名空间", namespace=namespace)
+    vector_store = await get_vector_store()
+    try:
+        deleted = await vector_store.delete_namespace(namespace)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if not deleted:
+        raise HTTPException(status_code=404, detail=f"命名空间 {namespace} 不存在")
+    return {"status": "success", "namespace": namespace}
+
+
+@router.get("/watch")
+async def watch_status():
+    """预置知识目录监听状态与 修改->可检索 延迟"""
+    watcher = get_knowledge_watcher()
+    if watcher is None:
+        return {"enabled": False}
+    return watcher.metrics()
+
+
+def _snapshot_path(kind: str):
+    directory = settings.data_dir / "snapshots"
+    directory.mkdir(parents=True, exist_ok=True)
+    return directory / f"{kind}-{uuid.uuid4().hex}{SNAPSHOT_SUFFIX}"
+
+
+@router.get("/snapshot")
+async def export_snapshot(collection: Optional[List[str]] = Query(None)):
+    """导出知识库快照(单文件下载,collection可重复指定,默认全部集合)
+
+    快照包含child向量与文本、元数据、parent store、旁路索引、预置知识清单和embedding模型id,
+    新节点通过 POST /knowledge/snapshot 导入后无需重新embedding。
+    """
+    path = _snapshot_path("export")
+    try:
+        vector_store = await get_vector_store()
+        result = await vector_store.export_snapshot(path, collections=collection)
+    except ValueError as e:
+        path.unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        path.unlink(missing_ok=True)
+        logger.error("导出快照失败", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return FileResponse(
+        path,
+        media_type="application/octet-stream",
+        filename=f"tc_agent_knowledge{SNAPSHOT_SUFFIX}",
+        headers={"X-Snapshot-Collections": ",".join(result["collections"])},
+        background=BackgroundTask(path.unlink, missing_ok=True),
+    )
+
+
+@router.post("/snapshot")
+async def import_snapshot(request: Request):
+    """导入知识库快照(请求体为快照文件),覆盖快照中包含的集合"""
+    path = _snapshot_path("import")
+    try:
+        size = await _save_upload(request, path, settings.knowledge_snapshot_max_bytes)
+        vector_store = await get_vector_store()
+        result = await vector_store.import_snapshot(path)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error("导入快照失败", error=str(e))
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        path.unlink(missing_ok=True)
+
+    return {"status": "success", "bytes": size, **result}
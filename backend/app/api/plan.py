@@ -1,4 +1,6 @@
 """Plan模式API - 任务规划"""
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException
 
 from app.schemas.models import (
@@ -9,7 +11,7 @@ from app.schemas.models import (
 )
 from app.infrastructure.logger import get_logger
 from app.infrastructure.workflow_store import get_workflow_store
-from app.infrastructure.vector_store import get_vector_store
+from app.infrastructure.vector_store import get_vector_store, validate_namespace
 from app.core.llm import LLMFactory
 from app.core.workflow import WorkflowManager
 
@@ -17,13 +19,20 @@ router = APIRouter()
 logger = get_logger("tc_agent.api.plan")
 
 
-async def get_workflow_manager() -> WorkflowManager:
-    """获取WorkflowManager实例"""
+async def get_workflow_manager(workspace_id: Optional[str] = None) -> WorkflowManager:
+    """获取WorkflowManager实例(指定工作区时同时检索其私有知识)"""
+    if workspace_id:
+        try:
+            validate_namespace(workspace_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     llm = LLMFactory.create_from_config()
     try:
         vector_store = await get_vector_store()
-        retriever = vector_store.get_retriever("all")
-    except Exception:
+        retriever = vector_store.get_retriever("all", namespace=workspace_id)
+    except Exception as e:
+        # 向量库不可用时不检索,计划仍基于模型知识生成
+        logger.warning("向量库不可用,Plan不使用知识库检索", error=str(e))
         retriever = None
     return WorkflowManager(llm, retriever)
 
@@ -38,7 +47,7 @@ async def init_plan(body: PlanInitRequest):
         workspace_id=body.workspace_id,
     )
 
-    manager = await get_workflow_manager()
+    manager = await get_workflow_manager(body.workspace_id)
     workflow = await manager.generate_workflow(body.task, body.context)
     workflow.workspace_root = body.workspace_root
     workflow.workspace_id = body.workspace_id
@@ -63,7 +72,7 @@ async def refine_plan(body: PlanRefineRequest):
         raise HTTPException(status_code=404, detail="Workflow not found")
     logger.info("修改Plan", workflow_id=body.workflow_id, instruction=body.instruction[:50])
 
-    manager = await get_workflow_manager()
+    manager = await get_workflow_manager(workflow.workspace_id)
     workflow = await manager.refine_workflow(workflow, body.instruction)
     await store.set(workflow)
 
@@ -0,0 +1,85 @@
+"""TC Agent 命令行工具
+
+用法(在 backend 目录下):
+    python -m app.cli snapshot export /data/knowledge.tcsnap              # 导出全部集合
+    python -m app.cli snapshot export /data/code.tcsnap --collection code
+    python -m app.cli snapshot import /data/knowledge.tcsnap              # 新节点免重新embedding
+    python -m app.cli snapshot info /data/knowledge.tcsnap
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+
+from app.infrastructure.snapshot import CODECS, SnapshotError, SnapshotReader
+
+
+async def _with_store(action):
+    from app.infrastructure.vector_store import get_vector_store
+
+    vector_store = await get_vector_store()
+    try:
+        return await action(vector_store)
+    finally:
+        await vector_store.close()
+
+
+def _snapshot_info(path: Path) -> dict:
+    with SnapshotReader(path) as reader:
+        return {
+            "path": str(path),
+            "bytes": path.stat().st_size,
+            **reader.meta,
+            "sections": {
+                name: {k: entry[k] for k in ("length", "raw_length", "codec")}
+                for name, entry in reader.sections.items()
+            },
+        }
+
+
+def _snapshot(args: argparse.Namespace) -> dict:
+    if args.action == "info":
+        return _snapshot_info(args.path)
+    if args.action == "export":
+        return asyncio.run(
+            _with_store(
+                lambda store: store.export_snapshot(
+                    args.path, collections=args.collection, codec=args.codec
+                )
+            )
+        )
+    return asyncio.run(_with_store(lambda store: store.import_snapshot(args.path)))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.cli", description=__doc__, formatter_class=argparse.RawTextHelpFormatter
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    snapshot = commands.add_parser("snapshot", help="知识库快照导出/导入")
+    snapshot.add_argument("action", choices=["export", "import", "info"])
+    snapshot.add_argument("path", type=Path, help="快照文件路径")
+    snapshot.add_argument(
+        "--collection", action="append", help="导出的集合(可重复,默认全部)"
+    )
+    snapshot.add_argument(
+        "--codec", choices=("auto",) + CODECS, default=None, help="压缩格式(默认读取配置)"
+    )
+    snapshot.set_defaults(handler=_snapshot)
+
+    args = parser.parse_args(argv)
+    try:
+        result = args.handler(args)
+    except (SnapshotError, ValueError) as e:
+        print(f"错误: {e}", file=sys.stderr)
+        return 1
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
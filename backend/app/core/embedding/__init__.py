@@ -1,10 +1,27 @@
-"""Embedding模块"""
+"""Embedding模块
+
+本地(sentence-transformers)与远程(httpx)实现只在选用对应模式时才导入。
+"""
+from importlib import import_module
 from typing import Optional
 
 from app.core.embedding.base import BaseEmbedding
-from app.core.embedding.local import LocalEmbedding
-from app.core.embedding.remote import RemoteEmbedding
+from app.core.embedding.cache import CachedEmbedding, PersistentCachedEmbedding
 from app.infrastructure.config import settings
+from app.infrastructure.embedding_store import EmbeddingDiskCache
+
+# 类名 -> 所在模块,按需导入
+_LAZY_CLASSES = {
+    "LocalEmbedding": "app.core.embedding.local",
+    "RemoteEmbedding": "app.core.embedding.remote",
+}
+
+
+def __getattr__(name: str):
+    module = _LAZY_CLASSES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(module), name)
 
 
 class EmbeddingFactory:
@@ -16,6 +33,7 @@ class EmbeddingFactory:
         model_name: str = None,
         api_key: str = None,
         provider: str = None,
+        disk_cache: Optional[bool] = None,
     ) -> BaseEmbedding:
         """创建Embedding实例
 
@@ -24,17 +42,51 @@ class EmbeddingFactory:
             model_name: 本地模型名称
             api_key: 远程API Key
             provider: 远程提供商 ("zhipu" 或 "qwen")
+            disk_cache: 是否套用持久化embedding缓存(默认读取配置)
         """
+        embedding = EmbeddingFactory._create_raw(mode, model_name, api_key, provider)
+
+        use_disk_cache = settings.embedding_disk_cache if disk_cache is None else disk_cache
+        if use_disk_cache:
+            store = EmbeddingDiskCache(
+                settings.data_dir / "embedding_cache",
+                embedding.model_id,
+                dtype=settings.embedding_disk_cache_dtype,
+            )
+            embedding = PersistentCachedEmbedding(embedding, store)
+        return embedding
+
+    @staticmethod
+    def _create_raw(
+        mode: str = None,
+        model_name: str = None,
+        api_key: str = None,
+        provider: str = None,
+    ) -> BaseEmbedding:
         mode = mode or settings.embedding_mode
 
         if mode == "local":
+            from app.core.embedding.local import LocalEmbedding
+
             model = model_name or settings.embedding_model
-            return LocalEmbedding(model_name=model)
+            return LocalEmbedding(
+                model_name=model,
+                max_batch_size=settings.embedding_max_batch_size,
+                batch_window_ms=settings.embedding_batch_window_ms,
+            )
 
         elif mode == "remote":
+            from app.core.embedding.remote import RemoteEmbedding
+
             key = api_key or settings.embedding_api_key or settings.get_llm_api_key()
             prov = provider or settings.llm_provider
-            return RemoteEmbedding(provider=prov, api_key=key)
+            return RemoteEmbedding(
+                provider=prov,
+                api_key=key,
+                max_concurrency=settings.embedding_remote_concurrency,
+                max_retries=settings.embedding_remote_max_retries,
+                http2=settings.embedding_remote_http2,
+            )
 
         else:
             raise ValueError(f"Unknown embedding mode: {mode}")
@@ -45,4 +97,11 @@ class EmbeddingFactory:
         return EmbeddingFactory.create()
 
 
-__all__ = ["BaseEmbedding", "LocalEmbedding", "RemoteEmbedding", "EmbeddingFactory"]
+__all__ = [
+    "BaseEmbedding",
+    "CachedEmbedding",
+    "PersistentCachedEmbedding",
+    "LocalEmbedding",
+    "RemoteEmbedding",
+    "EmbeddingFactory",
+]
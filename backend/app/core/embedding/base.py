@@ -21,3 +21,16 @@ class BaseEmbedding(ABC):
     def dimension(self) -> int:
         """返回embedding维度"""
         pass
+
+    @property
+    def model_id(self) -> str:
+        """模型标识,用于区分不同模型产生的向量(清单/缓存键)"""
+        return type(self).__name__
+
+    def metrics(self) -> dict:
+        """运行时指标(批量/缓存等),默认为空"""
+        return {}
+
+    async def aclose(self) -> None:
+        """释放连接池等资源"""
+        return None
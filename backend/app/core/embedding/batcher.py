@@ -0,0 +1,136 @@
+"""Embedding请求合并器(micro-batching)"""
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Callable, List, Optional, Set, Tuple
+
+from app.infrastructure.logger import get_logger
+
+logger = get_logger("tc_agent.embedding.batcher")
+
+EncodeFn = Callable[[List[str]], List[List[float]]]
+
+
+class EmbeddingBatcher:
+    """把短时间窗口内的并发embedding请求合并为一次encode
+
+    - 请求在 max_wait_ms 窗口内累积,或累计文本数达到 max_batch_size 时立即发出;
+      加入新请求会超过 max_batch_size 时先发出已累积的批次,单批不超过上限
+    - 单次encode在线程池中执行,结果按请求切片回填到各自的future
+    - 本身已达到 max_batch_size 的大请求直接单独执行,不参与等待
+    """
+
+    def __init__(
+        self,
+        encode_fn: EncodeFn,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+    ):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._pending: List[Tuple[List[str], asyncio.Future, float]] = []
+        self._pending_texts = 0
+        self._timer: Optional[asyncio.TimerHandle] = None
+        # 持有进行中的批次任务,避免被垃圾回收
+        self._tasks: Set[asyncio.Task] = set()
+
+        # 指标
+        self._batches = 0
+        self._requests = 0
+        self._texts = 0
+        self._max_batch = 0
+        self._delay_total = 0.0
+        self._delay_max = 0.0
+
+    def _bind_loop(self) -> asyncio.AbstractEventLoop:
+        """绑定当前事件循环(循环变化时丢弃旧状态)"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._pending = []
+            self._pending_texts = 0
+            self._timer = None
+            self._tasks = set()
+        return loop
+
+    async def submit(self, texts: List[str]) -> List[List[float]]:
+        """提交一组文本,返回对应的embeddings"""
+        if not texts:
+            return []
+        loop = self._bind_loop()
+
+        if len(texts) >= self.max_batch_size:
+            self._record([len(texts)], [0.0])
+            return await loop.run_in_executor(None, self.encode_fn, texts)
+
+        if self._pending_texts + len(texts) > self.max_batch_size:
+            self._flush()
+        future = loop.create_future()
+        self._pending.append((texts, future, time.perf_counter()))
+        self._pending_texts += len(texts)
+
+        if self._pending_texts >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending, self._pending_texts = self._pending, [], 0
+        task = self._loop.create_task(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch: List[Tuple[List[str], asyncio.Future, float]]) -> None:
+        started = time.perf_counter()
+        all_texts = [text for texts, _, _ in batch for text in texts]
+        self._record([len(texts) for texts, _, _ in batch], [started - t for _, _, t in batch])
+
+        loop = asyncio.get_running_loop()
+        try:
+            vectors = await loop.run_in_executor(None, self.encode_fn, all_texts)
+        except Exception as e:
+            logger.error("批量embedding失败", batch_size=len(all_texts), error=str(e))
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        offset = 0
+        for texts, future, _ in batch:
+            if not future.done():
+                future.set_result(vectors[offset : offset + len(texts)])
+            offset += len(texts)
+
+    def _record(self, sizes: List[int], delays: List[float]) -> None:
+        total = sum(sizes)
+        self._batches += 1
+        self._requests += len(sizes)
+        self._texts += total
+        self._max_batch = max(self._max_batch, total)
+        self._delay_total += sum(delays)
+        self._delay_max = max(self._delay_max, max(delays))
+
+    def metrics(self) -> dict:
+        """批量大小与排队延迟统计"""
+        requests = self._requests or 1
+        batches = self._batches or 1
+        return {
+            "batches": self._batches,
+            "requests": self._requests,
+            "texts": self._texts,
+            "avg_batch_size": round(self._texts / batches, 2),
+            "max_batch_size": self._max_batch,
+            "avg_queue_delay_ms": round(self._delay_total / requests * 1000, 3),
+            "max_queue_delay_ms": round(self._delay_max * 1000, 3),
+        }
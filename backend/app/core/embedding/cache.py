@@ -0,0 +1,151 @@
+"""Embedding缓存(查询LRU / 持久化内容寻址)"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+from typing import Dict, List
+
+from app.core.embedding.base import BaseEmbedding
+from app.infrastructure.cache import LRUCache
+from app.infrastructure.embedding_store import EmbeddingDiskCache
+
+
+def _vector_bytes(vec: List[float]) -> int:
+    # list对象头 + 每个元素(指针 + float对象)的近似开销
+    return 56 + 32 * len(vec)
+
+
+class CachedEmbedding(BaseEmbedding):
+    """为embed()加一层有界LRU缓存
+
+    - 键: 模型标识 + 归一化文本(合并空白)的sha1
+    - 仅缓存单条查询embedding; embed_batch(入库)直接透传,避免冲掉查询热点
+    - 同一键的并发未命中只计算一次
+    """
+
+    def __init__(
+        self,
+        inner: BaseEmbedding,
+        max_entries: int = 2048,
+        max_bytes: int = 0,
+        ttl_seconds: float = 0,
+    ):
+        self.inner = inner
+        self.cache: LRUCache[List[float]] = LRUCache(
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+            ttl_seconds=ttl_seconds,
+            sizeof=_vector_bytes,
+        )
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    @property
+    def dimension(self) -> int:
+        return self.inner.dimension
+
+    @property
+    def model_id(self) -> str:
+        return self.inner.model_id
+
+    def cache_key(self, text: str) -> str:
+        normalized = " ".join(text.split())
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        return f"{self.model_id}:{digest}"
+
+    async def embed(self, text: str) -> List[float]:
+        key = self.cache_key(text)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        pending = self._inflight.get(key)
+        if pending is not None and pending.get_loop() is asyncio.get_running_loop():
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # 首个调用方被取消(如SSE客户端断开)时等待者自行重试,自身被取消则照常抛出
+                if not pending.cancelled():
+                    raise
+            return await self.embed(text)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            vector = await self.inner.embed(text)
+            self.cache.set(key, vector)
+            future.set_result(vector)
+            return vector
+        except Exception as e:
+            future.set_exception(e)
+            # 等待者会收到异常;无人等待时避免"exception never retrieved"告警
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(key, None)
+            # CancelledError等BaseException不经过上面的分支,必须结束future,否则等待者永远挂起
+            if not future.done():
+                future.cancel()
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        return await self.inner.embed_batch(texts)
+
+    def metrics(self) -> dict:
+        return {**self.inner.metrics(), "query_cache": self.cache.stats()}
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+
+
+class PersistentCachedEmbedding(BaseEmbedding):
+    """为embed_batch(入库)加一层磁盘缓存
+
+    - 键: 文本sha256,缓存目录按模型标识隔离
+    - 重新入库相同文本时只有磁盘IO,远程模式下不再产生API调用
+    - 单条embed(查询)直接透传,由CachedEmbedding负责
+    """
+
+    def __init__(self, inner: BaseEmbedding, store: EmbeddingDiskCache):
+        self.inner = inner
+        self.store = store
+
+    @property
+    def dimension(self) -> int:
+        return self.inner.dimension
+
+    @property
+    def model_id(self) -> str:
+        return self.inner.model_id
+
+    @staticmethod
+    def content_key(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    async def embed(self, text: str) -> List[float]:
+        return await self.inner.embed(text)
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        keys = [self.content_key(t) for t in texts]
+        found = await asyncio.to_thread(self.store.get_many, keys)
+
+        # 同一批内重复的文本只计算一次
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        if missing:
+            vectors = await self.inner.embed_batch(list(missing.values()))
+            computed = dict(zip(missing.keys(), vectors))
+            await asyncio.to_thread(self.store.put_many, computed)
+            found.update(computed)
+
+        return [found[key] for key in keys]
+
+    def metrics(self) -> dict:
+        return {**self.inner.metrics(), "disk_cache": self.store.stats()}
+
+    async def aclose(self) -> None:
+        await self.inner.aclose()
+        self.store.close()
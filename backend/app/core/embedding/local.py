@@ -1,8 +1,9 @@
 """本地Embedding模型"""
-import asyncio
+import threading
 from typing import List
 
 from app.core.embedding.base import BaseEmbedding
+from app.core.embedding.batcher import EmbeddingBatcher
 from app.infrastructure.logger import get_logger
 
 logger = get_logger("tc_agent.embedding.local")
@@ -12,28 +13,47 @@ class LocalEmbedding(BaseEmbedding):
     """本地Embedding模型(sentence-transformers)"""
 
     _model_cache = {}  # 模型缓存,避免重复加载
+    _model_lock = threading.Lock()  # encode在线程池中执行,并发的首次请求只加载一次
 
-    def __init__(self, model_name: str = "BAAI/bge-small-zh-v1.5"):
+    def __init__(
+        self,
+        model_name: str = "BAAI/bge-small-zh-v1.5",
+        max_batch_size: int = 64,
+        batch_window_ms: float = 5.0,
+    ):
+        """
+        Args:
+            model_name: sentence-transformers模型名称
+            max_batch_size: 合并后单次encode的最大文本数
+            batch_window_ms: 并发请求的合并等待窗口(毫秒)
+        """
         self.model_name = model_name
         self._model = None
         self._dimension = None
+        # 并发的embed/embed_batch请求合并为一次forward
+        self._batcher = EmbeddingBatcher(
+            self._encode, max_batch_size=max_batch_size, max_wait_ms=batch_window_ms
+        )
 
     def _get_model(self):
         """懒加载模型"""
-        if self._model is None:
-            if self.model_name in self._model_cache:
-                self._model = self._model_cache[self.model_name]
-            else:
-                try:
-                    from sentence_transformers import SentenceTransformer
+        if self._model is not None:
+            return self._model
+        with self._model_lock:
+            if self._model is None:
+                if self.model_name in self._model_cache:
+                    self._model = self._model_cache[self.model_name]
+                else:
+                    try:
+                        from sentence_transformers import SentenceTransformer
 
-                    logger.info("加载本地Embedding模型", model=self.model_name)
-                    self._model = SentenceTransformer(self.model_name)
-                    self._model_cache[self.model_name] = self._model
-                    logger.info("模型加载完成", model=self.model_name)
-                except Exception as e:
-                    logger.error("模型加载失败", model=self.model_name, error=str(e))
-                    raise
+                        logger.info("加载本地Embedding模型", model=self.model_name)
+                        self._model = SentenceTransformer(self.model_name)
+                        self._model_cache[self.model_name] = self._model
+                        logger.info("模型加载完成", model=self.model_name)
+                    except Exception as e:
+                        logger.error("模型加载失败", model=self.model_name, error=str(e))
+                        raise
         return self._model
 
     @property
@@ -43,25 +63,25 @@ class LocalEmbedding(BaseEmbedding):
             self._dimension = model.get_sentence_embedding_dimension()
         return self._dimension
 
-    async def embed(self, text: str) -> List[float]:
-        """生成单个文本的embedding"""
-        loop = asyncio.get_event_loop()
+    @property
+    def model_id(self) -> str:
+        return f"local:{self.model_name}"
+
+    def _encode(self, texts: List[str]) -> List[List[float]]:
+        """同步encode(在线程池中执行)"""
         model = self._get_model()
+        return model.encode(texts, normalize_embeddings=True).tolist()
 
-        embedding = await loop.run_in_executor(
-            None, lambda: model.encode(text, normalize_embeddings=True)
-        )
-        return embedding.tolist()
+    def metrics(self) -> dict:
+        return {"model": self.model_id, "batching": self._batcher.metrics()}
+
+    async def embed(self, text: str) -> List[float]:
+        """生成单个文本的embedding"""
+        vectors = await self._batcher.submit([text])
+        return vectors[0]
 
     async def embed_batch(self, texts: List[str]) -> List[List[float]]:
         """批量生成embeddings"""
         if not texts:
             return []
-
-        loop = asyncio.get_event_loop()
-        model = self._get_model()
-
-        embeddings = await loop.run_in_executor(
-            None, lambda: model.encode(texts, normalize_embeddings=True)
-        )
-        return embeddings.tolist()
+        return await self._batcher.submit(texts)
@@ -1,5 +1,8 @@
 """远程Embedding API"""
-from typing import List
+import asyncio
+import random
+from typing import List, Optional
+
 import httpx
 
 from app.core.embedding.base import BaseEmbedding
@@ -9,74 +12,217 @@ logger = get_logger("tc_agent.embedding.remote")
 
 
 class RemoteEmbedding(BaseEmbedding):
-    """远程Embedding API(智谱/通义)"""
+    """远程Embedding API(智谱/通义)
+
+    - 长连接池(keep-alive,可选HTTP/2),按事件循环复用同一个AsyncClient
+    - embed_batch使用供应商的多输入请求,按max_batch切分后并发发送
+    - 全局并发上限由信号量控制,429/5xx按指数退避重试(优先遵循Retry-After)
+    """
 
     PROVIDERS = {
         "zhipu": {
             "url": "https://open.bigmodel.cn/api/paas/v4/embeddings",
             "model": "embedding-2",
             "dimension": 1024,
+            "max_batch": 64,
         },
         "qwen": {
             "url": "https://dashscope.aliyuncs.com/api/v1/services/embeddings/text-embedding/text-embedding",
             "model": "text-embedding-v2",
             "dimension": 1536,
+            "max_batch": 25,
         },
     }
 
-    def __init__(self, provider: str = "zhipu", api_key: str = None):
+    RETRY_STATUS = {429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        provider: str = "zhipu",
+        api_key: str = None,
+        max_concurrency: int = 4,
+        max_retries: int = 3,
+        timeout: float = 30.0,
+        http2: bool = False,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        """
+        Args:
+            provider: 提供商 ("zhipu" 或 "qwen")
+            api_key: API Key
+            max_concurrency: 同时在途的请求数上限(跨批次共享)
+            max_retries: 429/5xx/网络错误的最大重试次数
+            timeout: 单次请求超时(秒)
+            http2: 是否启用HTTP/2(需要安装h2,缺失时回退HTTP/1.1)
+            transport: 自定义transport(测试用)
+        """
         self.provider = provider
         self.api_key = api_key
         self.config = self.PROVIDERS.get(provider, self.PROVIDERS["zhipu"])
         self._dimension = self.config["dimension"]
-        logger.info("远程Embedding已配置", provider=provider)
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_retries = max(0, max_retries)
+        self.timeout = timeout
+        self.http2 = http2 and self._h2_available()
+        self._transport = transport
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self._requests = 0
+        self._retries = 0
+        logger.info("远程Embedding已配置", provider=provider, http2=self.http2)
+
+    @staticmethod
+    def _h2_available() -> bool:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("未安装h2,HTTP/2不可用,回退HTTP/1.1")
+            return False
+        return True
 
     @property
     def dimension(self) -> int:
         return self._dimension
 
+    @property
+    def model_id(self) -> str:
+        return f"{self.provider}:{self.config['model']}"
+
+    async def _get_client(self) -> httpx.AsyncClient:
+        """按事件循环复用连接池(AsyncClient不能跨事件循环使用)"""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            await self._close_client()
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                    keepalive_expiry=60.0,
+                ),
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "Content-Type": "application/json",
+                },
+                transport=self._transport,
+            )
+            self._client_loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client
+
+    async def _close_client(self) -> None:
+        """关闭当前连接池;绑定的事件循环仍在其他线程运行时交给该循环关闭"""
+        client, loop = self._client, self._client_loop
+        self._client = None
+        self._client_loop = None
+        if client is None:
+            return
+        if loop is not None and loop.is_running() and loop is not asyncio.get_running_loop():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+            return
+        try:
+            await client.aclose()
+        except RuntimeError as e:
+            # 旧事件循环已关闭: 连接池已标记关闭,底层连接随旧循环释放
+            logger.debug("关闭旧连接池", error=str(e))
+
+    def _build_payload(self, texts: List[str], text_type: str) -> dict:
+        if self.provider == "zhipu":
+            return {"model": self.config["model"], "input": texts}
+        elif self.provider == "qwen":
+            return {
+                "model": self.config["model"],
+                "input": {"texts": texts},
+                "parameters": {"text_type": text_type},
+            }
+        raise ValueError(f"Unknown provider: {self.provider}")
+
+    def _parse_response(self, data: dict) -> List[List[float]]:
+        """按返回的下标还原输入顺序"""
+        if self.provider == "zhipu":
+            items = sorted(data["data"], key=lambda x: x.get("index", 0))
+            return [item["embedding"] for item in items]
+        items = sorted(data["output"]["embeddings"], key=lambda x: x.get("text_index", 0))
+        return [item["embedding"] for item in items]
+
+    @staticmethod
+    def _retry_delay(attempt: int, response: Optional[httpx.Response]) -> float:
+        if response is not None:
+            retry_after = response.headers.get("Retry-After")
+            if retry_after:
+                try:
+                    return min(float(retry_after), 30.0)
+                except ValueError:
+                    pass
+        return min(0.5 * (2**attempt), 8.0) + random.uniform(0, 0.25)
+
+    async def _request(self, texts: List[str], text_type: str) -> List[List[float]]:
+        client = await self._get_client()
+        payload = self._build_payload(texts, text_type)
+
+        async with self._semaphore:
+            for attempt in range(self.max_retries + 1):
+                response = None
+                try:
+                    self._requests += 1
+                    response = await client.post(self.config["url"], json=payload)
+                    if response.status_code not in self.RETRY_STATUS:
+                        response.raise_for_status()
+                        vectors = self._parse_response(response.json())
+                        if len(vectors) != len(texts):
+                            raise ValueError(
+                                f"Embedding count mismatch: {len(vectors)} != {len(texts)}"
+                            )
+                        return vectors
+                    if attempt == self.max_retries:
+                        response.raise_for_status()
+                except httpx.TransportError as e:
+                    if attempt == self.max_retries:
+                        raise
+                    logger.warning("远程Embedding请求失败,重试", error=str(e), attempt=attempt + 1)
+
+                self._retries += 1
+                delay = self._retry_delay(attempt, response)
+                if response is not None:
+                    logger.warning(
+                        "远程Embedding限流/服务端错误,重试",
+                        status=response.status_code,
+                        attempt=attempt + 1,
+                        delay=round(delay, 2),
+                    )
+                await asyncio.sleep(delay)
+
+        raise RuntimeError("unreachable")
+
     async def embed(self, text: str) -> List[float]:
         """生成单个文本的embedding"""
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            if self.provider == "zhipu":
-                response = await client.post(
-                    self.config["url"],
-                    headers={"Authorization": f"Bearer {self.api_key}"},
-                    json={"model": self.config["model"], "input": text},
-                )
-                response.raise_for_status()
-                data = response.json()
-                return data["data"][0]["embedding"]
-
-            elif self.provider == "qwen":
-                response = await client.post(
-                    self.config["url"],
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "model": self.config["model"],
-                        "input": {"texts": [text]},
-                        "parameters": {"text_type": "query"},
-                    },
-                )
-                response.raise_for_status()
-                data = response.json()
-                return data["output"]["embeddings"][0]["embedding"]
-
-            else:
-                raise ValueError(f"Unknown provider: {self.provider}")
+        vectors = await self._request([text], "query")
+        return vectors[0]
 
     async def embed_batch(self, texts: List[str]) -> List[List[float]]:
-        """批量生成embeddings"""
+        """批量生成embeddings(按供应商上限切分,批次间并发)"""
         if not texts:
             return []
 
-        # 大多数API支持批量,但这里简化为循环处理
-        # 可以后续优化为真正的批量请求
-        results = []
-        for text in texts:
-            embedding = await self.embed(text)
-            results.append(embedding)
-        return results
+        size = self.config["max_batch"]
+        batches = [texts[i : i + size] for i in range(0, len(texts), size)]
+        results = await asyncio.gather(*(self._request(b, "document") for b in batches))
+        return [vec for part in results for vec in part]
+
+    def metrics(self) -> dict:
+        return {
+            "model": self.model_id,
+            "remote": {
+                "requests": self._requests,
+                "retries": self._retries,
+                "max_concurrency": self.max_concurrency,
+                "http2": self.http2,
+            },
+        }
+
+    async def aclose(self) -> None:
+        await self._close_client()
@@ -1,11 +1,26 @@
-"""LLM模块"""
+"""LLM模块
+
+各提供商的SDK(dashscope/zhipuai)导入较慢,只在选用该提供商时才加载。
+"""
+from importlib import import_module
 from typing import Optional
 
 from app.core.llm.base import BaseLLM
-from app.core.llm.qwen import QwenLLM
-from app.core.llm.zhipu import ZhipuLLM
 from app.infrastructure.config import settings
 
+# 类名 -> 所在模块,按需导入
+_PROVIDER_CLASSES = {
+    "QwenLLM": "app.core.llm.qwen",
+    "ZhipuLLM": "app.core.llm.zhipu",
+}
+
+
+def __getattr__(name: str):
+    module = _PROVIDER_CLASSES.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(import_module(module), name)
+
 
 class LLMFactory:
     """LLM工厂"""
@@ -17,9 +32,13 @@ class LLMFactory:
         model = model or settings.get_default_model()
 
         if provider == "qwen":
+            from app.core.llm.qwen import QwenLLM
+
             key = api_key or settings.qwen_api_key
             return QwenLLM(api_key=key, model=model)
         elif provider == "zhipu":
+            from app.core.llm.zhipu import ZhipuLLM
+
             key = api_key or settings.zhipu_api_key
             return ZhipuLLM(api_key=key, model=model)
         elif provider == "doubao":
@@ -1,6 +1,13 @@
 """RAG模块"""
 from app.core.rag.base import BaseRetriever
-from app.core.rag.chunker import BaseChunker, TextChunker, CodeChunker
+from app.core.rag.chunker import (
+    BaseChunker,
+    CChunker,
+    CodeChunker,
+    PythonChunker,
+    TextChunker,
+)
+from app.core.rag.lexical import BM25Index, tokenize
 from app.core.rag.retriever import ParentDocumentRetriever
 
 __all__ = [
@@ -8,5 +15,9 @@ __all__ = [
     "BaseChunker",
     "TextChunker",
     "CodeChunker",
+    "CChunker",
+    "PythonChunker",
     "ParentDocumentRetriever",
+    "BM25Index",
+    "tokenize",
 ]
@@ -0,0 +1,133 @@
+"""C源码的轻量词法扫描,供代码切分使用
+
+只识别影响结构划分的记号: 注释、字符串/字符字面量、预处理指令、花括号和分号,
+其余代码由正则快速跳过。字面量与注释中的括号不参与计数,
+预处理指令(含续行的 #define 体)整体作为一个记号。
+"""
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Iterator, List, Tuple
+
+# 顶层条目类型
+BLOCK = "block"  # 函数/结构体/初始化列表等带花括号的定义
+DECLARATION = "declaration"  # 原型、全局变量、typedef等以分号结束的声明
+MACRO = "macro"  # 预处理指令(#define/#include/#if...)
+TRAILING = "trailing"  # 文件末尾无法归类的内容
+
+# 单一字符类,正则引擎可快速跳过普通代码
+_INTERESTING = re.compile(r"[/\"'#{};]")
+_STRING = re.compile(r'"(?:[^"\\\n]|\\.)*"?', re.S)
+_CHAR = re.compile(r"'(?:[^'\\\n]|\\.)*'?", re.S)
+_NON_SPACE = re.compile(r"\S")
+_EXTERN_C = re.compile(r"extern\s*\"C\"\s*$")
+
+
+def _line_end(text: str, pos: int) -> int:
+    """pos所在行的行尾(含换行符)"""
+    newline = text.find("\n", pos)
+    return len(text) if newline < 0 else newline + 1
+
+
+def _at_line_start(text: str, pos: int) -> bool:
+    start = text.rfind("\n", 0, pos) + 1
+    return not text[start:pos].strip()
+
+
+def _directive_end(text: str, pos: int) -> int:
+    """预处理指令结束位置,跟随反斜杠续行"""
+    end = len(text)
+    while True:
+        newline = text.find("\n", pos)
+        if newline < 0:
+            return end
+        back = newline - 1
+        if back >= 0 and text[back] == "\r":
+            back -= 1
+        if back < 0 or text[back] != "\\":
+            return newline + 1
+        pos = newline + 1
+
+
+@dataclass
+class TopLevelItem:
+    """顶层条目 [start, end),包含其前面的注释"""
+
+    kind: str
+    start: int
+    end: int
+
+
+def top_level_items(text: str) -> Iterator[TopLevelItem]:
+    """按顶层结构划分源码,条目按顺序首尾相接(只跳过条目间的空白)
+
+    - 花括号深度回到0时结束一个块,并延伸到该行末(覆盖 `};`、`} name_t;`)
+    - 顶层分号结束一个声明
+    - 顶层预处理指令单独成条(函数体内的指令属于函数)
+    - 注释不单独成条,并入其后的条目(即函数/结构体的前导注释)
+    - 头文件中的 `extern "C" {` 不增加深度,其中的声明照常划分
+    """
+    depth = 0
+    prev_end = 0
+    size = len(text)
+    search = _INTERESTING.search
+
+    def emit(kind: str, end: int) -> TopLevelItem:
+        match = _NON_SPACE.search(text, prev_end, end)
+        return TopLevelItem(kind, match.start() if match else prev_end, end)
+
+    # 扫描与划分合在一个循环里,每个记号只做一次分派
+    pos = 0
+    while True:
+        match = search(text, pos)
+        if match is None:
+            break
+        i = match.start()
+        ch = text[i]
+        pos = i + 1
+        if ch == "/":
+            nxt = text[i + 1 : i + 2]
+            if nxt == "*":
+                close = text.find("*/", i + 2)
+                pos = size if close < 0 else close + 2
+            elif nxt == "/":
+                pos = _directive_end(text, i)  # 行注释同样可以续行
+        elif ch == '"':
+            pos = _STRING.match(text, i).end()
+        elif ch == "'":
+            pos = _CHAR.match(text, i).end()
+        elif ch == "#":
+            if _at_line_start(text, i):
+                pos = _directive_end(text, i)
+                if depth == 0:
+                    yield emit(MACRO, pos)
+                    prev_end = pos
+            # 否则是宏体内的 # / ## 运算符
+        elif ch == "{":
+            if depth == 0 and _EXTERN_C.search(text, prev_end, i):
+                end = _line_end(text, i)
+                yield emit(MACRO, end)
+                pos = prev_end = end
+                continue
+            depth += 1
+        elif ch == "}":
+            if depth == 0:
+                continue  # 多余的 },忽略
+            depth -= 1
+            if depth == 0:
+                end = _line_end(text, i)
+                yield emit(BLOCK, end)
+                pos = prev_end = end  # 块结束行的剩余部分(`};`)并入该块
+        elif depth == 0:  # 顶层分号
+            end = _line_end(text, i)
+            yield emit(DECLARATION, end)
+            pos = prev_end = end
+
+    if _NON_SPACE.search(text, prev_end):
+        yield emit(TRAILING, size)
+
+
+def item_spans(text: str) -> List[Tuple[str, int, int]]:
+    """[(类型, start, end)],便于调试与测试"""
+    return [(item.kind, item.start, item.end) for item in top_level_items(text)]
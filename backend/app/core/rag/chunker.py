@@ -1,16 +1,145 @@
-"""文档切分器"""
+"""文档切分器
+
+所有切分器单遍扫描原文,只产出 (start, end) 偏移,不拼接字符串;
+chunk() 在需要文本时再按偏移切片。
+"""
 from abc import ABC, abstractmethod
-from typing import List
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
 import re
 
+from app.core.rag.c_lexer import BLOCK, top_level_items
+
+Span = Tuple[int, int]
+
+# 切分算法版本: chunk边界变化时递增,使预置知识清单失效、旧快照被拒绝
+CHUNKER_VERSION = 2
+
+# 段落: 不含空行的连续行,首尾均为非空白字符
+_LINE_BODY = r"\S(?:[^\n]*\S)?"
+_PARAGRAPH = re.compile(rf"{_LINE_BODY}(?:\n[ \t\r\f\v]*{_LINE_BODY})*")
+# 中文句末标点直接断句;英文标点后需跟空白,避免切开 3.14 / file.c
+# (单一字符类可走正则的快速扫描,英文标点的后续判断放在循环里)
+_SENTENCE_END = re.compile(r"[。！？.!?]+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _trim(text: str, start: int, end: int) -> Span:
+    """去掉span两端空白(只移动偏移)"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _trim_lines(text: str, start: int, end: int) -> Span:
+    """去掉span首尾的空行,保留首行缩进"""
+    pos = start
+    while pos < end and text[pos].isspace():
+        if text[pos] == "\n":
+            start = pos + 1
+        pos += 1
+    if pos >= end:
+        return end, end
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _lines(text: str, start: int, end: int) -> Iterator[Span]:
+    """[start, end) 内的行(含换行符)"""
+    pos = start
+    while pos < end:
+        nl = text.find("\n", pos, end)
+        stop = end if nl < 0 else nl + 1
+        yield pos, stop
+        pos = stop
+
+
+def _hard_split(start: int, end: int, size: int) -> Iterator[Span]:
+    for pos in range(start, end, size):
+        yield pos, min(pos + size, end)
+
+
+def _overlap_tail(text: str, window: List[Span], overlap: int) -> List[Span]:
+    """上一个chunk末尾不超过overlap个字符的单元,作为下一个chunk的开头
+
+    优先按单元边界取;最后一个单元本身超过overlap时退化为按字符截取,并对齐到下一个空白之后。
+    """
+    if overlap <= 0 or not window:
+        return []
+    end = window[-1][1]
+    for i in range(1, len(window)):
+        if end - window[i][0] <= overlap:
+            return window[i:]
+    start, unit_end = window[-1]
+    cut = max(start, end - overlap)
+    match = _WHITESPACE.search(text, cut, unit_end)
+    if match and match.end() < unit_end:
+        cut = match.end()
+    if cut <= window[0][0] or cut >= unit_end:
+        return []
+    return [(cut, unit_end)]
+
+
+def pack_spans(
+    text: str,
+    units: Iterable[Span],
+    size: int,
+    overlap: int = 0,
+    split: Optional[Callable[[int, int], Iterable[Span]]] = None,
+) -> Iterator[Span]:
+    """把相邻单元贪心合并为不超过size的chunk,相邻chunk共享约overlap个字符
+
+    单元需按偏移递增;超过size的单元先用split细分(如按句子),仍超长的部分硬切分
+    (每段预留overlap空间)。
+    """
+    size = max(1, size)
+    overlap = max(0, min(overlap, size // 2))
+    window: List[Span] = []
+    window_start = 0
+    for unit in units:
+        a, b = unit
+        if b - a <= size:
+            pieces = (unit,)
+        else:
+            pieces = [
+                piece
+                for sub in (split(a, b) if split else ((a, b),))
+                for piece in (
+                    _hard_split(sub[0], sub[1], size - overlap) if sub[1] - sub[0] > size else (sub,)
+                )
+            ]
+        for unit in pieces:
+            b = unit[1]
+            if window and b - window_start > size:
+                yield window_start, window[-1][1]
+                window = _overlap_tail(text, window, overlap)
+                while window and b - window[0][0] > size:
+                    window.pop(0)
+                if not window:
+                    window_start = unit[0]
+                else:
+                    window_start = window[0][0]
+            elif not window:
+                window_start = unit[0]
+            window.append(unit)
+    if window:
+        yield window_start, window[-1][1]
+
 
 class BaseChunker(ABC):
     """切分器抽象基类"""
 
     @abstractmethod
+    def iter_spans(self, text: str, chunk_size: int) -> Iterator[Span]:
+        """逐个产出chunk在原文中的 (start, end) 偏移"""
+
     def chunk(self, text: str, chunk_size: int) -> List[str]:
         """将文本切分为多个chunk"""
-        pass
+        if not text:
+            return []
+        return [text[start:end] for start, end in self.iter_spans(text, chunk_size)]
 
 
 class TextChunker(BaseChunker):
@@ -19,224 +148,136 @@ class TextChunker(BaseChunker):
     def __init__(self, overlap: int = 50):
         """
         Args:
-            overlap: chunk之间的重叠字符数
+            overlap: chunk之间的重叠字符数(不超过chunk_size的一半)
         """
         self.overlap = overlap
 
-    def chunk(self, text: str, chunk_size: int = 500) -> List[str]:
+    @staticmethod
+    def _sentences(text: str, start: int, end: int) -> Iterator[Span]:
+        """超长段落按句子拆分"""
+        pos = start
+        for match in _SENTENCE_END.finditer(text, start, end):
+            stop = match.end()
+            if stop < end and text[stop - 1] in ".!?" and not text[stop].isspace():
+                continue
+            a, b = _trim(text, pos, stop)
+            if a < b:
+                yield a, b
+            pos = stop
+        a, b = _trim(text, pos, end)
+        if a < b:
+            yield a, b
+
+    def iter_spans(self, text: str, chunk_size: int = 500) -> Iterator[Span]:
         """按段落和句子切分文本"""
-        if not text or not text.strip():
-            return []
+        paragraphs = map(re.Match.span, _PARAGRAPH.finditer(text))
+        return pack_spans(text, paragraphs, chunk_size, self.overlap, split=lambda a, b: self._sentences(text, a, b))
 
-        # 先按段落切分
-        paragraphs = re.split(r"\n\s*\n", text)
+    def chunk(self, text: str, chunk_size: int = 500) -> List[str]:
+        return super().chunk(text, chunk_size)
 
-        chunks = []
-        current_chunk = ""
 
-        for para in paragraphs:
-            para = para.strip()
-            if not para:
-                continue
+class _LineBlockChunker(BaseChunker):
+    """代码切分器公共部分: 先按语法块划分,超大的块再按行切分(块内带重叠)"""
 
-            if len(current_chunk) + len(para) + 2 <= chunk_size:
-                current_chunk += ("\n\n" + para) if current_chunk else para
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk)
-
-                # 如果单个段落超过chunk_size,按句子切分
-                if len(para) > chunk_size:
-                    sentence_chunks = self._split_by_sentences(para, chunk_size)
-                    chunks.extend(sentence_chunks[:-1])
-                    current_chunk = sentence_chunks[-1] if sentence_chunks else ""
-                else:
-                    current_chunk = para
+    def __init__(self, overlap: int = 50):
+        self.overlap = overlap
+
+    @abstractmethod
+    def _blocks(self, text: str, chunk_size: int) -> Iterator[Span]:
+        """按语言结构划分的块,依次覆盖全文"""
 
-        if current_chunk:
-            chunks.append(current_chunk)
+    def iter_spans(self, text: str, chunk_size: int = 1000) -> Iterator[Span]:
+        for start, end in self._blocks(text, chunk_size):
+            start, end = _trim_lines(text, start, end)
+            if start >= end:
+                continue
+            if end - start <= chunk_size:
+                yield start, end
+                continue
+            for a, b in pack_spans(text, _lines(text, start, end), chunk_size, self.overlap):
+                a, b = _trim_lines(text, a, b)
+                if a < b:
+                    yield a, b
 
-        return chunks
+    def chunk(self, text: str, chunk_size: int = 1000) -> List[str]:
+        return super().chunk(text, chunk_size)
+
+
+class CChunker(_LineBlockChunker):
+    """C代码切分器(基于c_lexer词法扫描)
+
+    - 每个顶层函数/结构体/初始化块连同前导注释单独成块
+    - 相邻的宏、声明合并到chunk_size以内
+    - 字符串、注释、#define体中的括号不影响划分
+    """
+
+    def _blocks(self, text: str, chunk_size: int) -> Iterator[Span]:
+        small: List[Span] = []
+        lines = lambda a, b: _lines(text, a, b)  # noqa: E731
+        for item in top_level_items(text):
+            if item.kind != BLOCK:
+                # 条目以非空白开头,只需去掉行尾换行
+                end = item.end
+                while end > item.start and text[end - 1].isspace():
+                    end -= 1
+                small.append((item.start, end))
+                continue
+            if small:
+                yield from pack_spans(text, small, chunk_size, split=lines)
+                small = []
+            yield item.start, item.end
+        if small:
+            yield from pack_spans(text, small, chunk_size, split=lines)
 
-    def _split_by_sentences(self, text: str, chunk_size: int) -> List[str]:
-        """按句子切分"""
-        # 中英文句子分隔符
-        sentences = re.split(r"([。！？.!?])", text)
 
-        chunks = []
-        current_chunk = ""
+class PythonChunker(_LineBlockChunker):
+    """Python代码切分器: 每个顶层 def/class(连同装饰器)一块"""
 
-        i = 0
-        while i < len(sentences):
-            sentence = sentences[i]
-            # 把标点符号和前面的句子合并
-            if i + 1 < len(sentences) and re.match(r"[。！？.!?]", sentences[i + 1]):
-                sentence += sentences[i + 1]
-                i += 1
+    TOP_LEVEL = re.compile(r"^(?:@|(?:async\s+)?def\s|class\s)", re.MULTILINE)
 
-            if len(current_chunk) + len(sentence) <= chunk_size:
-                current_chunk += sentence
-            else:
-                if current_chunk:
-                    chunks.append(current_chunk)
-                current_chunk = sentence
+    def _blocks(self, text: str, chunk_size: int) -> Iterator[Span]:
+        block_start = 0
+        after_decorator = False
+        for match in self.TOP_LEVEL.finditer(text):
+            is_decorator = text.startswith("@", match.start())
+            # 装饰器与其后的定义同属一块
+            if not after_decorator and match.start() > block_start:
+                yield block_start, match.start()
+                block_start = match.start()
+            after_decorator = is_decorator
+        if block_start < len(text):
+            yield block_start, len(text)
 
-            i += 1
 
-        if current_chunk:
-            chunks.append(current_chunk)
+class LineChunker(_LineBlockChunker):
+    """通用行切分"""
 
-        return chunks
+    def _blocks(self, text: str, chunk_size: int) -> Iterator[Span]:
+        yield 0, len(text)
 
 
 class CodeChunker(BaseChunker):
-    """代码切分器,按函数/类切分"""
+    """代码切分器,按语言选择C/Python/通用行切分"""
 
-    # C语言函数模式
-    C_FUNCTION_PATTERN = re.compile(
-        r"(?:static\s+)?(?:inline\s+)?(?:\w+\s+)+(\w+)\s*\([^)]*\)\s*\{",
-        re.MULTILINE,
-    )
+    # 语言检测只看开头一段,避免大文件整体扫描
+    SNIFF_CHARS = 16384
+    C_INDICATORS = ("#include", "TEE_Result", "void ", "int ", "char ")
+    PYTHON_INDICATORS = ("def ", "class ", "import ", "from ")
 
-    # Python函数/类模式
-    PYTHON_PATTERN = re.compile(
-        r"^(def\s+\w+|class\s+\w+)", re.MULTILINE
-    )
+    def __init__(self, overlap: int = 50):
+        self.c = CChunker(overlap)
+        self.python = PythonChunker(overlap)
+        self.lines = LineChunker(overlap)
 
-    def chunk(self, text: str, chunk_size: int = 1000) -> List[str]:
+    def iter_spans(self, text: str, chunk_size: int = 1000) -> Iterator[Span]:
         """按函数/类切分代码"""
-        if not text or not text.strip():
-            return []
+        head = text[: self.SNIFF_CHARS]
+        if any(indicator in head for indicator in self.C_INDICATORS):
+            return self.c.iter_spans(text, chunk_size)
+        if any(indicator in head for indicator in self.PYTHON_INDICATORS):
+            return self.python.iter_spans(text, chunk_size)
+        return self.lines.iter_spans(text, chunk_size)
 
-        # 检测语言类型
-        if self._is_c_code(text):
-            return self._chunk_c_code(text, chunk_size)
-        elif self._is_python_code(text):
-            return self._chunk_python_code(text, chunk_size)
-        else:
-            # 回退到通用行切分
-            return self._chunk_by_lines(text, chunk_size)
-
-    def _is_c_code(self, text: str) -> bool:
-        """检测是否为C代码"""
-        c_indicators = ["#include", "TEE_Result", "void ", "int ", "char "]
-        return any(indicator in text for indicator in c_indicators)
-
-    def _is_python_code(self, text: str) -> bool:
-        """检测是否为Python代码"""
-        py_indicators = ["def ", "class ", "import ", "from "]
-        return any(indicator in text for indicator in py_indicators)
-
-    def _chunk_c_code(self, text: str, chunk_size: int) -> List[str]:
-        """切分C代码"""
-        chunks = []
-        lines = text.split("\n")
-
-        current_chunk = []
-        current_size = 0
-        brace_count = 0
-        in_function = False
-
-        for line in lines:
-            line_with_newline = line + "\n"
-            current_chunk.append(line)
-            current_size += len(line_with_newline)
-
-            # 跟踪大括号
-            brace_count += line.count("{") - line.count("}")
-
-            # 检测函数开始
-            if "{" in line and not in_function:
-                in_function = True
-
-            # 函数结束
-            if in_function and brace_count == 0:
-                in_function = False
-                chunk_text = "\n".join(current_chunk)
-                if chunk_text.strip():
-                    chunks.append(chunk_text)
-                current_chunk = []
-                current_size = 0
-
-            # 如果不在函数内且超过大小限制,切分
-            elif not in_function and current_size >= chunk_size:
-                chunk_text = "\n".join(current_chunk)
-                if chunk_text.strip():
-                    chunks.append(chunk_text)
-                current_chunk = []
-                current_size = 0
-
-        # 处理剩余内容
-        if current_chunk:
-            chunk_text = "\n".join(current_chunk)
-            if chunk_text.strip():
-                chunks.append(chunk_text)
-
-        return chunks
-
-    def _chunk_python_code(self, text: str, chunk_size: int) -> List[str]:
-        """切分Python代码"""
-        chunks = []
-        lines = text.split("\n")
-
-        current_chunk = []
-        current_size = 0
-
-        for i, line in enumerate(lines):
-            line_with_newline = line + "\n"
-
-            # 检测新的函数/类定义(非嵌套)
-            if re.match(r"^(def |class )", line) and current_chunk:
-                # 保存当前chunk
-                chunk_text = "\n".join(current_chunk)
-                if chunk_text.strip():
-                    chunks.append(chunk_text)
-                current_chunk = []
-                current_size = 0
-
-            current_chunk.append(line)
-            current_size += len(line_with_newline)
-
-            # 超过大小限制且在空行处切分
-            if current_size >= chunk_size and (not line.strip() or i == len(lines) - 1):
-                chunk_text = "\n".join(current_chunk)
-                if chunk_text.strip():
-                    chunks.append(chunk_text)
-                current_chunk = []
-                current_size = 0
-
-        # 处理剩余内容
-        if current_chunk:
-            chunk_text = "\n".join(current_chunk)
-            if chunk_text.strip():
-                chunks.append(chunk_text)
-
-        return chunks
-
-    def _chunk_by_lines(self, text: str, chunk_size: int) -> List[str]:
-        """通用行切分"""
-        chunks = []
-        lines = text.split("\n")
-
-        current_chunk = []
-        current_size = 0
-
-        for line in lines:
-            line_with_newline = line + "\n"
-
-            if current_size + len(line_with_newline) > chunk_size and current_chunk:
-                chunk_text = "\n".join(current_chunk)
-                if chunk_text.strip():
-                    chunks.append(chunk_text)
-                current_chunk = []
-                current_size = 0
-
-            current_chunk.append(line)
-            current_size += len(line_with_newline)
-
-        if current_chunk:
-            chunk_text = "\n".join(current_chunk)
-            if chunk_text.strip():
-                chunks.append(chunk_text)
-
-        return chunks
+    def chunk(self, text: str, chunk_size: int = 1000) -> List[str]:
+        return super().chunk(text, chunk_size)
@@ -0,0 +1,103 @@
+"""近重复chunk检测(SimHash)"""
+from __future__ import annotations
+
+import hashlib
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.rag.lexical import tokenize
+
+SIMHASH_BITS = 64
+BANDS = 4  # 64位分4段,汉明距离<=3的指纹至少有一段完全相同(阈值上限为3)
+BAND_BITS = SIMHASH_BITS // BANDS
+MIN_FEATURES = 8  # 特征太少时SimHash不可靠,只做精确去重
+
+_BIT_SHIFTS = np.arange(SIMHASH_BITS, dtype=np.uint64)
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text: str) -> Tuple[int, int]:
+    """返回 (64位SimHash, 特征数)
+
+    特征为标识符感知分词后的词与相邻词二元组,按词频加权。
+    """
+    tokens = tokenize(text)
+    features = Counter(tokens)
+    features.update(f"{a} {b}" for a, b in zip(tokens, tokens[1:]))
+
+    if not features:
+        return 0, 0
+
+    # 每个特征哈希的64位展开为±1,按权重求和后取符号
+    hashes = np.fromiter((_feature_hash(f) for f in features), dtype=np.uint64, count=len(features))
+    weights = np.fromiter(features.values(), dtype=np.int64, count=len(features))
+    bits = (hashes[:, None] >> _BIT_SHIFTS) & np.uint64(1)
+    totals = weights @ (bits.astype(np.int64) * 2 - 1)
+
+    value = 0
+    for bit in np.flatnonzero(totals > 0):
+        value |= 1 << int(bit)
+    return value, len(features)
+
+
+def fingerprint(text: str) -> Tuple[int, bool]:
+    """返回 (指纹, 是否可做近似比较)
+
+    特征足够时为SimHash;过短的文本退化为内容哈希,只与完全相同的文本匹配。
+    """
+    value, features = simhash(text)
+    if features >= MIN_FEATURES:
+        return value, True
+    return _feature_hash(" ".join(text.split())), False
+
+
+def bands(value: int) -> List[int]:
+    mask = (1 << BAND_BITS) - 1
+    return [(value >> (i * BAND_BITS)) & mask for i in range(BANDS)]
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def to_signed(value: int) -> int:
+    """SQLite INTEGER为有符号64位"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def to_unsigned(value: int) -> int:
+    return value + (1 << 64) if value < 0 else value
+
+
+def partition_key(metadata: dict, approximate: bool) -> str:
+    """只在过滤字段完全相同的chunks之间去重,避免按scope/kb过滤时丢结果
+
+    近似指纹与精确哈希分属不同分区,互不比较。
+    """
+    fields = "|".join(f"{k}={metadata.get(k) or ''}" for k in ("scope", "kb", "category"))
+    return f"{'sim' if approximate else 'exact'}|{fields}"
+
+
+class BatchDeduper:
+    """一批待入库chunks内部的近重复检测(尚未写入索引的部分)"""
+
+    def __init__(self, max_distance: int):
+        self.max_distance = max(0, min(max_distance, BANDS - 1))
+        self._buckets: Dict[Tuple[str, int, int], List[Tuple[str, int]]] = {}
+
+    def find(self, partition: str, value: int, approximate: bool) -> Optional[str]:
+        limit = self.max_distance if approximate else 0
+        for i, band in enumerate(bands(value)):
+            for child_id, other in self._buckets.get((partition, i, band), ()):
+                if hamming(value, other) <= limit:
+                    return child_id
+        return None
+
+    def add(self, partition: str, value: int, child_id: str) -> None:
+        for i, band in enumerate(bands(value)):
+            self._buckets.setdefault((partition, i, band), []).append((child_id, value))
@@ -0,0 +1,278 @@
+"""BM25词法检索: 标识符感知分词 + SQLite倒排索引"""
+from __future__ import annotations
+
+import json
+import math
+import re
+import sqlite3
+import threading
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from app.infrastructure.logger import get_logger
+from app.infrastructure.where_filter import match_where
+
+logger = get_logger("tc_agent.rag.lexical")
+
+_TOKEN_RE = re.compile(
+    r"[A-Za-z_][A-Za-z0-9_]*"  # C/Python标识符
+    r"|[0-9]+"
+    r"|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+"  # CJK连续片段
+)
+_CAMEL_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+# 文档频率低于此值的词总是参与打分(小语料扫描代价可忽略,不因剪枝改变排序)
+_MIN_PRUNE_DF = 256
+
+
+def _identifier_terms(word: str) -> List[str]:
+    """标识符 -> 完整标识符 + 下划线/驼峰拆分出的子词
+
+    TEE_ALG_HMAC_SHA256 -> tee_alg_hmac_sha256, tee, alg, hmac, sha256, sha, 256
+    TEE_AllocateOperation -> tee_allocateoperation, tee, allocateoperation, allocate, operation
+    """
+    full = word.strip("_").lower()
+    if not full:
+        return []
+    terms = {full}
+    for part in word.split("_"):
+        if not part:
+            continue
+        terms.add(part.lower())
+        pieces = _CAMEL_RE.findall(part)
+        if len(pieces) > 1:
+            terms.update(p.lower() for p in pieces)
+    return [t for t in terms if len(t) > 1 or t.isdigit()]
+
+
+def tokenize(text: str) -> List[str]:
+    """代码/中英文混合文本分词: 标识符拆分子词, 中文按二元组"""
+    tokens: List[str] = []
+    for match in _TOKEN_RE.finditer(text):
+        word = match.group()
+        first = word[0]
+        if first.isdigit():
+            tokens.append(word)
+        elif first == "_" or first.isascii():
+            tokens.extend(_identifier_terms(word))
+        elif len(word) == 1:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i : i + 2] for i in range(len(word) - 1))
+    return tokens
+
+
+class BM25Index:
+    """与向量集合并列存放的BM25倒排索引(SQLite)
+
+    - postings(term, child_id, tf) 以 (term, child_id) 为主键,按词取倒排表
+    - 每个child记录长度与过滤用元数据,增删只涉及该child自己的行
+    - 文档总数/总长度随增删事务更新,打分时无需全表统计
+    """
+
+    def __init__(
+        self,
+        path: Optional[Path] = None,
+        k1: float = 1.2,
+        b: float = 0.75,
+        tokenizer: Callable[[str], List[str]] = tokenize,
+        max_df_ratio: float = 0.5,
+    ):
+        self.path = Path(path) if path else None
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.k1 = k1
+        self.b = b
+        self.tokenizer = tokenizer
+        self.max_df_ratio = max_df_ratio
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            str(self.path) if self.path else ":memory:", check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                child_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, child_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_postings_child ON postings(child_id);
+            CREATE TABLE IF NOT EXISTS chunks (
+                child_id TEXT PRIMARY KEY,
+                length INTEGER NOT NULL,
+                metadata TEXT
+            );
+            CREATE TABLE IF NOT EXISTS stats (k TEXT PRIMARY KEY, v INTEGER NOT NULL);
+            """
+        )
+        self._conn.commit()
+
+    def _stats(self) -> Tuple[int, int]:
+        rows = dict(self._conn.execute("SELECT k, v FROM stats").fetchall())
+        return rows.get("docs", 0), rows.get("length", 0)
+
+    def _bump_stats(self, docs: int, length: int) -> None:
+        self._conn.executemany(
+            "INSERT INTO stats (k, v) VALUES (?, ?) ON CONFLICT(k) DO UPDATE SET v = v + excluded.v",
+            [("docs", docs), ("length", length)],
+        )
+
+    def add(self, entries: Iterable[Tuple[str, str, dict]]) -> None:
+        """登记chunks: (child_id, text, metadata),已存在的child_id先移除"""
+        entries = list(entries)
+        if not entries:
+            return
+        chunk_rows = []
+        posting_rows = []
+        total_length = 0
+        for child_id, text, metadata in entries:
+            counts = Counter(self.tokenizer(text))
+            length = sum(counts.values())
+            total_length += length
+            chunk_rows.append((child_id, length, json.dumps(metadata or {}, ensure_ascii=False)))
+            posting_rows.extend((term, child_id, tf) for term, tf in counts.items())
+
+        with self._lock, self._conn:
+            self._remove([e[0] for e in entries])
+            self._conn.executemany(
+                "INSERT INTO chunks (child_id, length, metadata) VALUES (?, ?, ?)", chunk_rows
+            )
+            self._conn.executemany(
+                "INSERT INTO postings (term, child_id, tf) VALUES (?, ?, ?)", posting_rows
+            )
+            self._bump_stats(len(chunk_rows), total_length)
+
+    def _remove(self, child_ids: List[str]) -> None:
+        for start in range(0, len(child_ids), 500):
+            part = child_ids[start : start + 500]
+            marks = ",".join("?" * len(part))
+            count, length = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks WHERE child_id IN ({marks})",
+                part,
+            ).fetchone()
+            if not count:
+                continue
+            self._conn.execute(f"DELETE FROM postings WHERE child_id IN ({marks})", part)
+            self._conn.execute(f"DELETE FROM chunks WHERE child_id IN ({marks})", part)
+            self._bump_stats(-count, -length)
+
+    def remove(self, child_ids: List[str]) -> None:
+        with self._lock, self._conn:
+            self._remove(list(child_ids))
+
+    def search(
+        self, query: str, top_k: int = 10, where: Optional[dict] = None
+    ) -> List[Tuple[str, float, dict]]:
+        """BM25检索,返回 [(child_id, score, metadata)],按分数降序
+
+        打分与排序在SQL中完成,只为排名靠前的行读取并解析元数据;
+        出现在大部分chunk中的常见词(如 tee/result)IDF很低,直接丢弃,不扫描其倒排表。
+        """
+        terms = list(dict.fromkeys(self.tokenizer(query)))
+        if not terms or top_k <= 0:
+            return []
+
+        with self._lock:
+            docs, total_length = self._stats()
+            if not docs:
+                return []
+            marks = ",".join("?" * len(terms))
+            df = dict(
+                self._conn.execute(
+                    f"SELECT term, COUNT(*) FROM postings WHERE term IN ({marks}) GROUP BY term",
+                    terms,
+                ).fetchall()
+            )
+            if not df:
+                return []
+            df = self._selective_terms(df, docs)
+            idf = [(t, math.log(1 + (docs - n + 0.5) / (n + 0.5))) for t, n in df.items()]
+            avg_length = total_length / docs or 1.0
+            values = ",".join("(?, ?)" for _ in idf)
+            sql = f"""
+                WITH q(term, idf) AS (VALUES {values})
+                SELECT p.child_id,
+                       SUM(q.idf * p.tf * ? / (p.tf + ? * (1 - ? + ? * c.length / ?))) AS score
+                FROM q
+                JOIN postings p ON p.term = q.term
+                JOIN chunks c ON c.child_id = p.child_id
+                GROUP BY p.child_id
+                ORDER BY score DESC, p.child_id
+                LIMIT ? OFFSET ?
+            """
+            params = [v for pair in idf for v in pair]
+            params += [self.k1 + 1, self.k1, self.b, self.b, avg_length]
+
+            results: List[Tuple[str, float, dict]] = []
+            offset = 0
+            limit = top_k if not where else top_k * 4
+            while len(results) < top_k:
+                ranked = self._conn.execute(sql, params + [limit, offset]).fetchall()
+                if not ranked:
+                    break
+                metadata = dict(
+                    self._conn.execute(
+                        f"SELECT child_id, metadata FROM chunks WHERE child_id IN "
+                        f"({','.join('?' * len(ranked))})",
+                        [r[0] for r in ranked],
+                    ).fetchall()
+                )
+                for child_id, score in ranked:
+                    meta = json.loads(metadata.get(child_id) or "{}")
+                    if where and not match_where(meta, where):
+                        continue
+                    results.append((child_id, score, meta))
+                    if len(results) >= top_k:
+                        break
+                if len(ranked) < limit:
+                    break
+                # 过滤掉的多时翻倍取下一页,分页次数为对数级
+                offset += limit
+                limit *= 2
+        return results
+
+    def _selective_terms(self, df: Dict[str, int], docs: int) -> Dict[str, int]:
+        """丢弃文档频率过高的词;全部都是常见词时只保留最少见的一个"""
+        threshold = max(self.max_df_ratio * docs, _MIN_PRUNE_DF)
+        kept = {t: n for t, n in df.items() if n <= threshold}
+        if not kept:
+            term = min(df, key=df.get)
+            kept = {term: df[term]}
+        return kept
+
+    def count(self) -> int:
+        with self._lock:
+            return self._stats()[0]
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM postings")
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute("DELETE FROM stats")
+
+    def backup(self, path: Path) -> None:
+        """在线备份到path(用于知识库快照)"""
+        with self._lock:
+            dest = sqlite3.connect(str(path))
+            try:
+                self._conn.backup(dest)
+            finally:
+                dest.close()
+
+    def restore(self, path: Path) -> None:
+        """用path处的备份整体替换当前内容"""
+        with self._lock:
+            src = sqlite3.connect(str(path))
+            try:
+                src.backup(self._conn)
+            finally:
+                src.close()
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.close()
+            except Exception as e:
+                logger.warning("关闭BM25索引失败", error=str(e))
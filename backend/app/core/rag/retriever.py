@@ -1,17 +1,62 @@
 """Parent Document Retriever实现"""
+import asyncio
 import hashlib
-from typing import List, Dict, Optional
+import json
+from collections.abc import MutableMapping
+from dataclasses import dataclass, field
+from typing import List, Dict, Optional, Tuple
 import uuid as uuid_lib
 
 from app.core.rag.base import BaseRetriever
 from app.core.rag.chunker import BaseChunker, TextChunker
+from app.core.rag.dedup import BatchDeduper, fingerprint, partition_key
+from app.core.rag.lexical import BM25Index
 from app.core.embedding.base import BaseEmbedding
 from app.schemas.models import RetrievedDoc
+from app.infrastructure.async_store import AsyncCollection, StoreExecutor, get_store_executor
+from app.infrastructure.cache import LRUCache
+from app.infrastructure.doc_index import DocumentIndex
 from app.infrastructure.logger import get_logger
 
 logger = get_logger("tc_agent.rag.retriever")
 
 
+def _copy_docs(docs: List[RetrievedDoc]) -> List[RetrievedDoc]:
+    """缓存存取时逐条复制(含metadata),调用方修改结果不会污染缓存"""
+    return [d.model_copy(update={"metadata": dict(d.metadata)}) for d in docs]
+
+
+def compute_doc_id(content: str) -> str:
+    """文档ID(由内容决定,与处理顺序无关)"""
+    return hashlib.md5(content.encode()).hexdigest()[:16]
+
+
+@dataclass
+class PreparedChunks:
+    """切分完成、尚未embedding的一批chunks"""
+
+    doc_ids: List[str] = field(default_factory=list)
+    parents: Dict[str, dict] = field(default_factory=dict)
+    child_ids: List[str] = field(default_factory=list)
+    child_texts: List[str] = field(default_factory=list)
+    child_metadatas: List[dict] = field(default_factory=list)
+    sources: Dict[str, str] = field(default_factory=dict)  # doc_id -> source
+    # 保留下来的child的去重指纹 (child_id, partition, value)
+    fingerprints: List[Tuple[str, str, int]] = field(default_factory=list)
+    # 去重后复用已有child的引用 (child_id, parent_id, doc_id)
+    refs: List[Tuple[str, str, str]] = field(default_factory=list)
+
+    def extend(self, other: "PreparedChunks") -> None:
+        self.doc_ids.extend(other.doc_ids)
+        self.parents.update(other.parents)
+        self.child_ids.extend(other.child_ids)
+        self.child_texts.extend(other.child_texts)
+        self.child_metadatas.extend(other.child_metadatas)
+        self.sources.update(other.sources)
+        self.fingerprints.extend(other.fingerprints)
+        self.refs.extend(other.refs)
+
+
 class ParentDocumentRetriever(BaseRetriever):
     """
     Parent Document Retriever实现
@@ -19,6 +64,9 @@ class ParentDocumentRetriever(BaseRetriever):
     策略: Small-to-Big Retrieval
     - 用小chunk做检索(更精确匹配)
     - 返回大chunk/完整文档(更多上下文)
+    - 提供lexical_index时混合检索: 向量与BM25结果按parent做倒数排名融合(RRF)
+    - 开启去重时近重复的child只存一个向量,其余parent通过doc_index引用它
+    - 检索结果按 (query, where, top_k, collection, version) 缓存,增删/重置时version递增使旧结果失效
     """
 
     def __init__(
@@ -26,36 +74,116 @@ class ParentDocumentRetriever(BaseRetriever):
         collection,  # Chroma collection
         embedding: BaseEmbedding,
         chunker: BaseChunker = None,
-        parent_store: Dict[str, dict] = None,
+        parent_store: MutableMapping = None,
         child_chunk_size: int = 200,
         parent_chunk_size: int = 1000,
+        embed_batch_size: int = 64,
+        embed_batch_max_chars: int = 32000,
+        write_batch_size: int = 2000,
+        executor: Optional[StoreExecutor] = None,
+        doc_index: Optional[DocumentIndex] = None,
+        lexical_index: Optional[BM25Index] = None,
+        rrf_k: int = 60,
+        dedup_max_distance: Optional[int] = None,
+        result_cache_size: int = 0,
+        result_cache_ttl: float = 0,
     ):
         """
         Args:
             collection: Chroma collection实例
             embedding: Embedding模型
             chunker: 文档切分器
-            parent_store: 存储parent文档的字典
+            parent_store: parent文档存储(dict或SqliteParentStore等MutableMapping)
             child_chunk_size: child chunk大小(用于检索)
             parent_chunk_size: parent chunk大小(用于返回)
+            embed_batch_size: 单次embedding调用的最大文本数
+            embed_batch_max_chars: 单次embedding调用的最大总字符数
+            write_batch_size: 单次collection写入的最大条数
+            executor: 向量库读写执行器(默认全局单例),同步IO均在其线程中执行
+            doc_index: doc_id -> parent/child 索引(默认使用内存索引)
+            lexical_index: child chunks的BM25索引(为None时只做向量检索)
+            rrf_k: RRF融合常数,越大排名靠后的结果权重越高
+            dedup_max_distance: 近重复判定的SimHash汉明距离(0为仅精确重复,None关闭去重)
+            result_cache_size: 检索结果缓存条目数(0关闭)
+            result_cache_ttl: 检索结果缓存TTL秒数(0表示不过期)
         """
+        self.executor = executor or get_store_executor()
         self.collection = collection
         self.embedding = embedding
         self.chunker = chunker or TextChunker()
         self.parent_store = parent_store if parent_store is not None else {}
+        self.doc_index = doc_index or DocumentIndex()
+        self.lexical_index = lexical_index
+        self.rrf_k = rrf_k
+        self.dedup_max_distance = dedup_max_distance
+        self.dedup_stats = {"unique": 0, "duplicates": 0}
         self.child_chunk_size = child_chunk_size
         self.parent_chunk_size = parent_chunk_size
+        self.embed_batch_size = max(1, embed_batch_size)
+        self.embed_batch_max_chars = max(1, embed_batch_max_chars)
+        self.write_batch_size = max(1, write_batch_size)
+        self.version = 0
+        self.result_cache: Optional[LRUCache[List[RetrievedDoc]]] = (
+            LRUCache(max_entries=result_cache_size, ttl_seconds=result_cache_ttl)
+            if result_cache_size > 0
+            else None
+        )
 
-    async def add_documents(
+    @property
+    def collection(self) -> AsyncCollection:
+        return self._collection
+
+    @collection.setter
+    def collection(self, collection) -> None:
+        """接受原始Chroma collection,统一包装为AsyncCollection"""
+        if not isinstance(collection, AsyncCollection):
+            collection = AsyncCollection(collection, self.executor)
+        self._collection = collection
+
+    def invalidate(self) -> None:
+        """集合内容变化: 递增版本号,之前缓存的检索结果不再命中"""
+        self.version += 1
+
+    def _cache_key(self, query: str, top_k: int, where: Optional[dict]) -> tuple:
+        where_key = json.dumps(where, sort_keys=True, ensure_ascii=False) if where else ""
+        return (self.collection.name, self.version, query, top_k, where_key)
+
+    def _cached(self, key: tuple) -> Optional[List[RetrievedDoc]]:
+        if self.result_cache is None:
+            return None
+        docs = self.result_cache.get(key)
+        return _copy_docs(docs) if docs is not None else None
+
+    def _store(self, key: tuple, docs: List[RetrievedDoc]) -> None:
+        # key中的版本号取自检索开始前,检索期间有写入时结果不会被后续查询命中
+        if self.result_cache is not None:
+            self.result_cache.set(key, _copy_docs(docs))
+
+    def cache_stats(self) -> dict:
+        stats = self.result_cache.stats() if self.result_cache is not None else {"enabled": False}
+        return {**stats, "version": self.version}
+
+    def prepare_documents(
         self, documents: List[str], metadatas: List[dict]
-    ) -> None:
-        """添加文档,同时构建parent和child索引"""
+    ) -> PreparedChunks:
+        """切分文档为parent/child chunks(纯CPU,不涉及embedding与写入)"""
+        prepared = PreparedChunks()
+        child_chunker = TextChunker()
+
         for doc, meta in zip(documents, metadatas):
             if not doc or not doc.strip():
                 continue
 
             # 生成文档ID
-            doc_id = hashlib.md5(doc.encode()).hexdigest()[:16]
+            doc_id = compute_doc_id(doc)
+            prepared.doc_ids.append(doc_id)
+            prepared.sources[doc_id] = meta.get("source", "")
+
+            filter_meta = {
+                key: meta.get(key)
+                for key in ("scope", "kb", "category")
+                if meta.get(key) is not None
+            }
 
             # 切分为parent chunks
             parent_chunks = self.chunker.chunk(doc, self.parent_chunk_size)
@@ -65,49 +193,177 @@ class ParentDocumentRetriever(BaseRetriever):
                     continue
 
                 parent_id = f"{doc_id}_p{i}"
-
-                # 存储parent到内存
-                self.parent_store[parent_id] = {
+                prepared.parents[parent_id] = {
                     "content": parent_chunk,
                     "metadata": {**meta, "chunk_index": i, "parent_id": parent_id},
                 }
 
                 # 将parent切分为child chunks
-                child_chunker = TextChunker()
                 child_chunks = child_chunker.chunk(parent_chunk, self.child_chunk_size)
-
                 if not child_chunks:
                     child_chunks = [parent_chunk]
 
-                # 批量生成embeddings
-                child_embeddings = await self.embedding.embed_batch(child_chunks)
-
-                # 存储到Chroma
-                child_ids = [f"{parent_id}_c{j}" for j in range(len(child_chunks))]
-                filter_meta = {
-                    key: meta.get(key)
-                    for key in ("scope", "kb", "category")
-                    if meta.get(key) is not None
-                }
-                child_metadatas = []
-                for j in range(len(child_chunks)):
-                    child_metadatas.append(
+                for j, child in enumerate(child_chunks):
+                    prepared.child_ids.append(f"{parent_id}_c{j}")
+                    prepared.child_texts.append(child)
+                    prepared.child_metadatas.append(
                         {
                             "parent_id": parent_id,
+                            "doc_id": doc_id,
                             "source": meta.get("source", ""),
                             "child_index": j,
                             **filter_meta,
                         }
                     )
 
-                self.collection.add(
-                    ids=child_ids,
-                    embeddings=child_embeddings,
-                    documents=child_chunks,
-                    metadatas=child_metadatas,
+        return prepared
+
+    async def _embed_texts(self, texts: List[str]) -> List[List[float]]:
+        """按长度排序后打包为受限大小的批次,减少padding与调用次数"""
+        order = sorted(range(len(texts)), key=lambda idx: len(texts[idx]))
+        embeddings: List[Optional[List[float]]] = [None] * len(texts)
+
+        batch: List[int] = []
+        batch_chars = 0
+        for idx in order:
+            size = len(texts[idx])
+            if batch and (
+                len(batch) >= self.embed_batch_size
+                or batch_chars + size > self.embed_batch_max_chars
+            ):
+                vectors = await self.embedding.embed_batch([texts[k] for k in batch])
+                for k, vec in zip(batch, vectors):
+                    embeddings[k] = vec
+                batch, batch_chars = [], 0
+            batch.append(idx)
+            batch_chars += size
+
+        if batch:
+            vectors = await self.embedding.embed_batch([texts[k] for k in batch])
+            for k, vec in zip(batch, vectors):
+                embeddings[k] = vec
+        return embeddings
+
+    async def index_prepared(self, prepared: PreparedChunks) -> None:
+        """为已切分的chunks生成embedding并批量写入parent store与collection"""
+        if not prepared.child_ids:
+            return
+
+        embeddings = await self.embed_prepared(prepared)
+        await self.write_prepared(prepared, embeddings)
+
+    async def embed_prepared(self, prepared: PreparedChunks) -> List[List[float]]:
+        """只生成embedding(流水线中与写入阶段重叠执行),开启去重时先剔除近重复child"""
+        if self.dedup_max_distance is not None and prepared.child_ids:
+            await self.executor.read(self._dedupe, prepared)
+        if not prepared.child_ids:
+            return []
+        return await self._embed_texts(prepared.child_texts)
+
+    def _dedupe(self, prepared: PreparedChunks) -> None:
+        """原地剔除近重复child,改为引用已有child(批内与已入库的都比较)"""
+        batch = BatchDeduper(self.dedup_max_distance)
+        # 与BatchDeduper使用同一个钳制后的阈值(分段查找只支持到BANDS-1)
+        max_distance = batch.max_distance
+        prints = []
+        for text, meta in zip(prepared.child_texts, prepared.child_metadatas):
+            value, approximate = fingerprint(text)
+            prints.append((partition_key(meta, approximate), value, approximate))
+
+        existing = self.doc_index.find_similar(
+            [(part, value, max_distance if approx else 0) for part, value, approx in prints]
+        )
+        keep = []
+        for i, (part, value, approx) in enumerate(prints):
+            meta = prepared.child_metadatas[i]
+            canonical = existing[i] or batch.find(part, value, approx)
+            if canonical is None:
+                batch.add(part, value, prepared.child_ids[i])
+                keep.append(i)
+            else:
+                prepared.refs.append((canonical, meta["parent_id"], meta["doc_id"]))
+
+        self.dedup_stats["unique"] += len(keep)
+        self.dedup_stats["duplicates"] += len(prints) - len(keep)
+        if len(keep) == len(prints):
+            prepared.fingerprints = [(prepared.child_ids[i], prints[i][0], prints[i][1]) for i in keep]
+            return
+        prepared.child_ids = [prepared.child_ids[i] for i in keep]
+        prepared.child_texts = [prepared.child_texts[i] for i in keep]
+        prepared.child_metadatas = [prepared.child_metadatas[i] for i in keep]
+        prepared.fingerprints = [(prepared.child_ids[n], prints[i][0], prints[i][1]) for n, i in enumerate(keep)]
+
+    async def write_prepared(
+        self, prepared: PreparedChunks, embeddings: List[List[float]]
+    ) -> None:
+        """把已embedding的chunks写入索引、parent store与collection"""
+        if not prepared.child_ids and not prepared.refs:
+            return
+
+        try:
+            # 先登记索引(保证之后总能按id删除),再写parent,保证child可见时parent一定存在
+            await self.executor.write(
+                self.doc_index.add,
+                prepared.sources,
+                [
+                    (child_id, meta["parent_id"], meta["doc_id"])
+                    for child_id, meta in zip(prepared.child_ids, prepared.child_metadatas)
+                ],
+                prepared.refs,
+                prepared.fingerprints,
+            )
+            await self.executor.write(self.parent_store.update, prepared.parents)
+            if self.lexical_index is not None:
+                await self.executor.write(
+                    self.lexical_index.add,
+                    zip(prepared.child_ids, prepared.child_texts, prepared.child_metadatas),
                 )
 
-        logger.debug("文档已索引", doc_count=len(documents))
+            step = self.write_batch_size
+            for start in range(0, len(prepared.child_ids), step):
+                end = start + step
+                await self.collection.add(
+                    ids=prepared.child_ids[start:end],
+                    embeddings=embeddings[start:end],
+                    documents=prepared.child_texts[start:end],
+                    metadatas=prepared.child_metadatas[start:end],
+                )
+        except Exception:
+            # 回滚已写入的部分(含doc_index登记),否则add_documents会认为文档已存在而永远跳过
+            await self._rollback(list(prepared.sources))
+            raise
+        finally:
+            # 写入中途失败也可能留下部分数据,总是使缓存失效
+            self.invalidate()
+
+    async def _rollback(self, doc_ids: List[str]) -> None:
+        try:
+            await self.delete_documents(doc_ids)
+        except Exception as e:
+            logger.error("写入失败后回滚失败", doc_count=len(doc_ids), error=str(e))
+
+    async def add_documents(
+        self, documents: List[str], metadatas: List[dict]
+    ) -> None:
+        """添加文档,同时构建parent和child索引
+
+        先切分全部文档,再跨文档批量embedding并大批量写入collection。
+        """
+        # 内容相同的文档(doc_id相同)已入库或在本次调用中重复时只保留第一份
+        unique: Dict[str, tuple] = {}
+        for doc, meta in zip(documents, metadatas):
+            if doc and doc.strip():
+                unique.setdefault(compute_doc_id(doc), (doc, meta))
+        pairs = [(doc, meta, doc_id) for doc_id, (doc, meta) in unique.items()]
+        existing = await self.executor.read(self.doc_index.existing, [p[2] for p in pairs])
+        documents = [doc for doc, _, doc_id in pairs if doc_id not in existing]
+        metadatas = [meta for _, meta, doc_id in pairs if doc_id not in existing]
+
+        prepared = self.prepare_documents(documents, metadatas)
+        await self.index_prepared(prepared)
+        logger.debug(
+            "文档已索引", doc_count=len(documents), child_count=len(prepared.child_ids)
+        )
 
     async def retrieve(
         self, query: str, top_k: int = 5, where: Optional[Dict[str, str]] = None
@@ -116,72 +372,176 @@ class ParentDocumentRetriever(BaseRetriever):
         if not query or not query.strip():
             return []
 
+        # 命中结果缓存时连query embedding也不需要计算
+        key = self._cache_key(query, top_k, where)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+
         # 生成query embedding
         query_embedding = await self.embedding.embed(query)
+        docs = await self._search(query, query_embedding, top_k, where)
+        self._store(key, docs)
+        return docs
 
-        # 在child chunks中检索
-        results = self.collection.query(
-            query_embeddings=[query_embedding],
-            n_results=top_k * 3,  # 多检索一些,去重后取top_k
-            include=["documents", "metadatas", "distances"],
-            where=where,
-        )
+    async def retrieve_with_embedding(
+        self,
+        query: str,
+        query_embedding: Optional[List[float]],
+        top_k: int = 5,
+        where: Optional[Dict[str, str]] = None,
+    ) -> List[RetrievedDoc]:
+        """使用已计算好的query embedding检索(多集合检索时共享同一embedding)
 
-        if not results["ids"] or not results["ids"][0]:
+        query_embedding为None(embedding失败)时只做BM25检索,未启用混合检索则返回空;
+        降级结果不写入缓存。
+        """
+        if query_embedding is None:
+            if self.lexical_index is None:
+                return []
+            return await self._search(query, None, top_k, where)
+        key = self._cache_key(query, top_k, where)
+        cached = self._cached(key)
+        if cached is not None:
+            return cached
+        docs = await self._search(query, query_embedding, top_k, where)
+        self._store(key, docs)
+        return docs
+
+    async def _search(
+        self,
+        query: str,
+        query_embedding: Optional[List[float]],
+        top_k: int,
+        where: Optional[Dict[str, str]],
+    ) -> List[RetrievedDoc]:
+        # 在child chunks中检索,多检索一些,按parent去重后取top_k
+        lexical_search = None
+        if self.lexical_index is not None:
+            lexical_search = self.executor.read(self.lexical_index.search, query, top_k * 3, where)
+        if query_embedding is None:
+            # 只做BM25(调用方保证此时lexical_index存在)
+            results = {"ids": [], "metadatas": [], "documents": [], "distances": []}
+            lexical_hits = await lexical_search
+        else:
+            vector_query = self.collection.query(
+                query_embeddings=[query_embedding],
+                n_results=top_k * 3,
+                include=["documents", "metadatas", "distances"],
+                where=where,
+            )
+            if lexical_search is None:
+                results = await vector_query
+                lexical_hits = None
+            else:
+                results, lexical_hits = await asyncio.gather(vector_query, lexical_search)
+
+        vector_ids = results["ids"][0] if results["ids"] else []
+        shared: Dict[str, List[str]] = {}
+        if self.dedup_max_distance is not None:
+            # 去重后一个child可能属于多个parent
+            child_ids = list(vector_ids) + [cid for cid, _, _ in lexical_hits or []]
+            shared = await self.executor.read(self.doc_index.parents_for, child_ids)
+
+        def parents_of(child_id: str, meta: dict) -> List[str]:
+            return shared.get(child_id) or ([meta["parent_id"]] if meta.get("parent_id") else [])
+
+        # 向量命中: parent_id -> (相似度, 命中的child文本),保持命中顺序
+        vector_hits: Dict[str, tuple] = {}
+        for i, child_id in enumerate(vector_ids):
+            # 将distance转换为相似度分数 (cosine distance -> similarity)
+            score = 1.0 / (1.0 + results["distances"][0][i])
+            for parent_id in parents_of(child_id, results["metadatas"][0][i]):
+                if parent_id not in vector_hits:
+                    vector_hits[parent_id] = (score, results["documents"][0][i][:100])
+
+        if lexical_hits is None:
+            ranked = [(pid, score) for pid, (score, _) in vector_hits.items()]
+        else:
+            lexical_parents = dict.fromkeys(
+                pid for cid, _, meta in lexical_hits for pid in parents_of(cid, meta)
+            )
+            ranked = self._fuse(list(vector_hits), list(lexical_parents))
+        if not ranked:
             return []
 
-        # 收集唯一的parent_ids
-        seen_parents = set()
-        retrieved_docs = []
+        parents = await self.executor.read(self._load_parents, [pid for pid, _ in ranked])
 
-        for i, child_id in enumerate(results["ids"][0]):
-            meta = results["metadatas"][0][i]
-            parent_id = meta.get("parent_id")
-
-            if not parent_id or parent_id in seen_parents:
+        retrieved_docs = []
+        for parent_id, score in ranked:
+            parent_data = parents.get(parent_id)
+            if not parent_data:
                 continue
-            seen_parents.add(parent_id)
-
-            # 获取parent文档
-            parent_data = self.parent_store.get(parent_id)
-            if parent_data:
-                # 将distance转换为相似度分数 (cosine distance -> similarity)
-                distance = results["distances"][0][i]
-                score = 1.0 / (1.0 + distance)
-
-                retrieved_docs.append(
-                    RetrievedDoc(
-                        content=parent_data["content"],
-                        metadata={
-                            **parent_data["metadata"],
-                            "matched_child": results["documents"][0][i][:100],
-                        },
-                        score=score,
-                    )
-                )
-
+            metadata = dict(parent_data["metadata"])
+            if parent_id in vector_hits:
+                metadata["matched_child"] = vector_hits[parent_id][1]
+            retrieved_docs.append(
+                RetrievedDoc(content=parent_data["content"], metadata=metadata, score=score)
+            )
             if len(retrieved_docs) >= top_k:
                 break
 
         logger.debug(
-            "检索完成", query=query[:30], results=len(retrieved_docs)
+            "检索完成",
+            query=query[:30],
+            results=len(retrieved_docs),
+            lexical=lexical_hits is not None and len(lexical_hits),
         )
         return retrieved_docs
 
+    def _fuse(self, *rankings: List[str]) -> List[tuple]:
+        """倒数排名融合: score = sum(1 / (k + rank)),归一化到(0, 1]"""
+        fused: Dict[str, float] = {}
+        for ranking in rankings:
+            for rank, parent_id in enumerate(ranking, start=1):
+                fused[parent_id] = fused.get(parent_id, 0.0) + 1.0 / (self.rrf_k + rank)
+        best = len(rankings) / (self.rrf_k + 1)
+        return sorted(
+            ((pid, score / best) for pid, score in fused.items()),
+            key=lambda item: item[1],
+            reverse=True,
+        )
+
+    def _load_parents(self, parent_ids: List[str]) -> Dict[str, dict]:
+        """批量读取parent(在读通道线程中执行)"""
+        found = {}
+        for parent_id in parent_ids:
+            data = self.parent_store.get(parent_id)
+            if data:
+                found[parent_id] = data
+        return found
+
+    def _delete_parents(self, parent_ids: List[str]) -> None:
+        delete_many = getattr(self.parent_store, "delete_many", None)
+        if delete_many is not None:
+            delete_many(parent_ids)
+            return
+        for parent_id in parent_ids:
+            self.parent_store.pop(parent_id, None)
+
+    async def has_document(self, doc_id: str) -> bool:
+        return await self.executor.read(self.doc_index.contains, doc_id)
+
     async def delete_documents(self, ids: List[str]) -> None:
-        """删除文档"""
-        # 删除child chunks
-        for doc_id in ids:
-            # 找到所有相关的child ids
-            results = self.collection.get(
-                where={"parent_id": {"$regex": f"^{doc_id}"}}
-            )
-            if results["ids"]:
-                self.collection.delete(ids=results["ids"])
+        """按文档索引直接删除child向量、parent与索引条目
+
+        仍被其他文档引用的共享child保留,由doc_index转交给引用方。
+        """
+        try:
+            for doc_id in ids:
+                parent_ids, child_ids = await self.executor.read(
+                    self.doc_index.deletion_plan, doc_id
+                )
 
-            # 删除parent store中的记录
-            to_delete = [k for k in self.parent_store if k.startswith(doc_id)]
-            for k in to_delete:
-                del self.parent_store[k]
+                step = self.write_batch_size
+                for start in range(0, len(child_ids), step):
+                    await self.collection.delete(ids=child_ids[start : start + step])
+                if parent_ids:
+                    await self.executor.write(self._delete_parents, parent_ids)
+                if self.lexical_index is not None and child_ids:
+                    await self.executor.write(self.lexical_index.remove, child_ids)
+                await self.executor.write(self.doc_index.remove, doc_id)
+        finally:
+            self.invalidate()
 
         logger.debug("文档已删除", count=len(ids))
@@ -0,0 +1,105 @@
+"""向量库异步适配层: 把同步的Chroma调用移出事件循环"""
+from __future__ import annotations
+
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+
+from app.infrastructure.config import settings
+from app.infrastructure.logger import get_logger
+
+logger = get_logger("tc_agent.async_store")
+
+T = TypeVar("T")
+
+
+class StoreExecutor:
+    """向量库专用执行器,读写分道
+
+    - 读(query/get/count)走多线程读通道,互不阻塞
+    - 写(add/delete/SQLite事务)走独立写通道,默认单线程串行,
+      大批量入库不会占满读通道,也不会阻塞uvicorn事件循环
+    """
+
+    def __init__(self, read_workers: int = 4, write_workers: int = 1):
+        self.read_workers = max(1, read_workers)
+        self.write_workers = max(1, write_workers)
+        self._read_pool = ThreadPoolExecutor(
+            max_workers=self.read_workers, thread_name_prefix="vs-read"
+        )
+        self._write_pool = ThreadPoolExecutor(
+            max_workers=self.write_workers, thread_name_prefix="vs-write"
+        )
+
+    @staticmethod
+    async def _run(pool: ThreadPoolExecutor, fn: Callable[..., T], *args, **kwargs) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, functools.partial(fn, *args, **kwargs))
+
+    async def read(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        return await self._run(self._read_pool, fn, *args, **kwargs)
+
+    async def write(self, fn: Callable[..., T], *args, **kwargs) -> T:
+        return await self._run(self._write_pool, fn, *args, **kwargs)
+
+    def shutdown(self) -> None:
+        self._read_pool.shutdown(wait=False)
+        self._write_pool.shutdown(wait=True)
+
+
+class AsyncCollection:
+    """Chroma collection 的可等待封装(接口与collection同名)"""
+
+    def __init__(self, collection: Any, executor: StoreExecutor):
+        self.raw = collection
+        self.executor = executor
+
+    @property
+    def name(self) -> str:
+        return getattr(self.raw, "name", "")
+
+    async def query(self, **kwargs) -> dict:
+        return await self.executor.read(self.raw.query, **kwargs)
+
+    async def get(self, **kwargs) -> dict:
+        return await self.executor.read(self.raw.get, **kwargs)
+
+    async def count(self) -> int:
+        return await self.executor.read(self.raw.count)
+
+    async def add(self, **kwargs) -> None:
+        await self.executor.write(self.raw.add, **kwargs)
+
+    async def upsert(self, **kwargs) -> None:
+        await self.executor.write(self.raw.upsert, **kwargs)
+
+    async def delete(self, **kwargs) -> None:
+        await self.executor.write(self.raw.delete, **kwargs)
+
+
+_executor: Optional[StoreExecutor] = None
+
+
+def get_store_executor() -> StoreExecutor:
+    """获取全局向量库执行器(单例)"""
+    global _executor
+    if _executor is None:
+        _executor = StoreExecutor(
+            read_workers=settings.vector_store_read_workers,
+            write_workers=settings.vector_store_write_workers,
+        )
+        logger.info(
+            "向量库执行器已创建",
+            read_workers=_executor.read_workers,
+            write_workers=_executor.write_workers,
+        )
+    return _executor
+
+
+def shutdown_store_executor() -> None:
+    """关闭全局向量库执行器(等待写通道任务完成),释放读写线程"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
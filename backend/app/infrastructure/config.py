@@ -12,6 +12,8 @@ class Settings(BaseSettings):
     host: str = "127.0.0.1"
     port: int = 8765
     debug: bool = False
+    # 启动时在后台初始化向量库/加载模型/同步预置知识,服务立即可用(false则阻塞到预热完成)
+    startup_background_warmup: bool = True
 
     # 数据目录 (默认在代码目录下的 data 文件夹)
     data_dir: Path = Field(default_factory=lambda: Path(__file__).parent.parent.parent / "data")
@@ -30,6 +32,16 @@ class Settings(BaseSettings):
     embedding_mode: str = "local"  # local, remote
     embedding_model: str = "BAAI/bge-small-zh-v1.5"
     embedding_api_key: Optional[str] = None
+    embedding_batch_window_ms: float = 5.0  # 并发请求合并窗口
+    embedding_max_batch_size: int = 64  # 合并后单次encode的最大文本数
+    embedding_query_cache_size: int = 2048  # 查询embedding LRU条目数(0表示关闭)
+    embedding_query_cache_max_bytes: int = 0  # 查询embedding缓存字节上限(0表示不限)
+    embedding_query_cache_ttl: float = 0  # 查询embedding缓存TTL秒数(0表示不过期)
+    embedding_disk_cache: bool = True  # 入库embedding持久化缓存(按文本sha寻址)
+    embedding_disk_cache_dtype: str = "float16"  # float16 | float32
+    embedding_remote_concurrency: int = 4  # 远程embedding在途请求上限
+    embedding_remote_max_retries: int = 3  # 429/5xx重试次数
+    embedding_remote_http2: bool = False  # 需要安装h2
 
     # 工具包配置
     tool_packs: str = "core,runner"
@@ -38,6 +50,60 @@ class Settings(BaseSettings):
     rag_child_chunk_size: int = 200
     rag_parent_chunk_size: int = 1000
     rag_top_k: int = 5
+    rag_parent_cache_size: int = 1024  # parent store LRU热缓存条目数
+    rag_embed_batch_size: int = 64  # 入库时单次embedding的最大文本数
+    rag_embed_batch_max_chars: int = 32000  # 入库时单次embedding的最大总字符数
+    rag_write_batch_size: int = 2000  # 入库时单次向量库写入条数
+    rag_collection_timeout: float = 5.0  # 多集合检索时单个集合的超时秒数
+    rag_load_workers: int = 4  # 目录加载时读取/切分文件的线程数
+    rag_load_queue_size: int = 64  # 已切分、待embedding的文件队列上限
+    rag_load_batch_chunks: int = 512  # 目录加载时每批embedding/写入的chunk数
+    rag_dedup_max_distance: int = 0  # 近重复child的SimHash汉明距离阈值(0-3, 0为仅精确重复, -1关闭)
+    rag_result_cache_size: int = 256  # 每个集合的检索结果缓存条目数(0关闭)
+    rag_result_cache_ttl: float = 0  # 检索结果缓存TTL秒数(0表示不过期,内容变化时按版本失效)
+    rag_hybrid_search: bool = True  # 向量 + BM25 混合检索(RRF融合)
+    rag_rrf_k: int = 60
+    rag_bm25_k1: float = 1.2
+    rag_bm25_b: float = 0.75
+
+    # Ask语义答案缓存(相似问题且检索来源相同时复用已生成的回答)
+    ask_answer_cache_enabled: bool = False
+    ask_answer_cache_threshold: float = 0.95  # query embedding余弦相似度下限
+    ask_answer_cache_size: int = 512  # 缓存的回答条数上限
+    ask_answer_cache_max_bytes: int = 16 * 1024 * 1024  # 回答总字节上限
+    ask_answer_cache_ttl: float = 3600  # 回答过期秒数(0表示不过期)
+
+    # 知识库批量导入
+    knowledge_bulk_max_bytes: int = 2 * 1024 * 1024 * 1024  # 单次上传大小上限
+    knowledge_bulk_max_file_bytes: int = 2 * 1024 * 1024  # 归档内单个文件大小上限
+    knowledge_bulk_max_jobs: int = 1  # 同时运行的导入任务数
+    knowledge_bulk_batch_docs: int = 64  # 每批入库的文档数
+    knowledge_bulk_batch_chars: int = 2_000_000  # 每批入库的最大字符数
+
+    # 知识库快照(单文件导出/导入,免重新embedding)
+    knowledge_snapshot_codec: str = "auto"  # auto | zstd | zlib | none (auto: 有zstandard时用zstd)
+    knowledge_snapshot_max_bytes: int = 4 * 1024 * 1024 * 1024  # 上传快照大小上限
+    knowledge_snapshot_bootstrap: Optional[Path] = None  # 启动时集合为空则从该快照导入
+
+    # 预置知识目录监听(文件变化后增量重新索引)
+    knowledge_watch_enabled: bool = False
+    knowledge_watch_backend: str = "auto"  # auto | watchfiles | polling (auto: 有watchfiles时用系统通知)
+    knowledge_watch_debounce_ms: int = 500  # 最后一次变化后静默多久再同步
+    knowledge_watch_poll_interval: float = 1.0  # 轮询模式扫描间隔(秒)
+
+    # 知识命名空间(工作区/租户私有知识,索引按需打开)
+    knowledge_namespace_max_open: int = 8  # 同时打开的命名空间数,超出时关闭最久未用的
+    knowledge_namespace_idle_seconds: float = 600  # 空闲超过该时间的命名空间索引被关闭(0不按时间关闭)
+
+    # 向量库后端: chroma | flat(NumPy内存映射精确检索)
+    vector_store_backend: str = "chroma"
+    vector_store_flat_dtype: str = "float32"  # flat后端向量精度: float16 | float32
+    vector_store_flat_pq_subspaces: int = 0  # >0启用PQ: 每行压缩为该字节数先粗筛,需整除向量维度
+    vector_store_flat_pq_rerank: int = 8  # PQ候选数为top_k的倍数,候选按原始向量精确重排
+
+    # 向量库执行器(读写分道,同步IO不占用事件循环)
+    vector_store_read_workers: int = 4
+    vector_store_write_workers: int = 1
 
     # 后端工作区
     workspace_root: Path = Field(default_factory=lambda: Path("/tmp/tc_agent_workspaces"))
@@ -0,0 +1,264 @@
+"""文档ID索引: doc_id -> parent_ids -> child_ids(含去重后的共享child引用)"""
+from __future__ import annotations
+
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.core.rag.dedup import bands, hamming, to_signed, to_unsigned
+from app.infrastructure.logger import get_logger
+
+logger = get_logger("tc_agent.doc_index")
+
+
+class DocumentIndex:
+    """与集合并列存放的文档索引(SQLite)
+
+    删除/替换文档时直接按id操作,不再扫描集合或parent store。
+    path为None时使用内存数据库(测试或临时集合)。
+
+    近重复去重后,一个child向量可以被多个parent引用:
+    - chunks 记录child的所属文档(owner)
+    - refs 记录其他文档对该child的引用(back-reference)
+    - fingerprints 记录child的SimHash分段,用于查找近重复
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else None
+        if self.path:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(
+            str(self.path) if self.path else ":memory:", check_same_thread=False
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                doc_id TEXT PRIMARY KEY,
+                source TEXT NOT NULL DEFAULT ''
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                child_id TEXT PRIMARY KEY,
+                parent_id TEXT NOT NULL,
+                doc_id TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_chunks_doc ON chunks(doc_id);
+            CREATE TABLE IF NOT EXISTS refs (
+                child_id TEXT NOT NULL,
+                parent_id TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                PRIMARY KEY (child_id, parent_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_refs_doc ON refs(doc_id);
+            CREATE TABLE IF NOT EXISTS fingerprints (
+                child_id TEXT PRIMARY KEY,
+                partition TEXT NOT NULL,
+                value INTEGER NOT NULL,
+                b0 INTEGER NOT NULL,
+                b1 INTEGER NOT NULL,
+                b2 INTEGER NOT NULL,
+                b3 INTEGER NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_fp_b0 ON fingerprints(partition, b0);
+            CREATE INDEX IF NOT EXISTS idx_fp_b1 ON fingerprints(partition, b1);
+            CREATE INDEX IF NOT EXISTS idx_fp_b2 ON fingerprints(partition, b2);
+            CREATE INDEX IF NOT EXISTS idx_fp_b3 ON fingerprints(partition, b3);
+            """
+        )
+        self._conn.commit()
+
+    def add(
+        self,
+        documents: Dict[str, str],
+        chunks: Iterable[Tuple[str, str, str]],
+        refs: Iterable[Tuple[str, str, str]] = (),
+        fingerprints: Iterable[Tuple[str, str, int]] = (),
+    ) -> None:
+        """登记文档及其chunks
+
+        Args:
+            documents: doc_id -> source
+            chunks: (child_id, parent_id, doc_id)
+            refs: 复用已有child的引用 (child_id, parent_id, doc_id)
+            fingerprints: (child_id, partition, 64位指纹)
+        """
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO documents (doc_id, source) VALUES (?, ?)",
+                list(documents.items()),
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunks (child_id, parent_id, doc_id) VALUES (?, ?, ?)",
+                list(chunks),
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO refs (child_id, parent_id, doc_id) VALUES (?, ?, ?)",
+                list(refs),
+            )
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO fingerprints "
+                "(child_id, partition, value, b0, b1, b2, b3) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (child_id, partition, to_signed(value), *bands(value))
+                    for child_id, partition, value in fingerprints
+                ],
+            )
+
+    def find_similar(
+        self, items: List[Tuple[str, int, int]]
+    ) -> List[Optional[str]]:
+        """批量查找近重复child: items为 (partition, 指纹, 最大汉明距离)"""
+        found: List[Optional[str]] = []
+        with self._lock:
+            for partition, value, max_distance in items:
+                match = None
+                for i, band in enumerate(bands(value)):
+                    rows = self._conn.execute(
+                        f"SELECT child_id, value FROM fingerprints WHERE partition = ? AND b{i} = ?",
+                        (partition, band),
+                    ).fetchall()
+                    for child_id, other in rows:
+                        if hamming(value, to_unsigned(other)) <= max_distance:
+                            match = child_id
+                            break
+                    if match or max_distance == 0:
+                        # 精确匹配时任一分段即可命中,无需再查其余分段
+                        break
+                found.append(match)
+        return found
+
+    def parents_for(self, child_ids: List[str]) -> Dict[str, List[str]]:
+        """child -> 引用它的全部parent(所属parent在前)"""
+        parents: Dict[str, List[str]] = {}
+        with self._lock:
+            for start in range(0, len(child_ids), 500):
+                part = child_ids[start : start + 500]
+                marks = ",".join("?" * len(part))
+                for child_id, parent_id in self._conn.execute(
+                    f"SELECT child_id, parent_id FROM chunks WHERE child_id IN ({marks})", part
+                ):
+                    parents.setdefault(child_id, []).insert(0, parent_id)
+                for child_id, parent_id in self._conn.execute(
+                    f"SELECT child_id, parent_id FROM refs WHERE child_id IN ({marks}) "
+                    "ORDER BY rowid",
+                    part,
+                ):
+                    parents.setdefault(child_id, []).append(parent_id)
+        return parents
+
+    def contains(self, doc_id: str) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM documents WHERE doc_id = ?", (doc_id,)
+            ).fetchone()
+            return row is not None
+
+    def existing(self, doc_ids: List[str]) -> set:
+        """返回已登记的doc_id集合"""
+        found: set = set()
+        with self._lock:
+            for start in range(0, len(doc_ids), 500):
+                part = doc_ids[start : start + 500]
+                marks = ",".join("?" * len(part))
+                found.update(
+                    r[0]
+                    for r in self._conn.execute(
+                        f"SELECT doc_id FROM documents WHERE doc_id IN ({marks})", part
+                    )
+                )
+        return found
+
+    def lookup(self, doc_id: str) -> Tuple[List[str], List[str]]:
+        """返回 (parent_ids, 所属child_ids),parent包括通过引用共享child的parent"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT parent_id, child_id FROM chunks WHERE doc_id = ?", (doc_id,)
+            ).fetchall()
+            ref_parents = self._conn.execute(
+                "SELECT parent_id FROM refs WHERE doc_id = ?", (doc_id,)
+            ).fetchall()
+        parent_ids = list(dict.fromkeys([r[0] for r in rows] + [r[0] for r in ref_parents]))
+        return parent_ids, [r[1] for r in rows]
+
+    def _shared(self, doc_id: str, child_ids: List[str]) -> Dict[str, Tuple[str, str]]:
+        """仍被其他文档引用的child -> 接管它的(parent_id, doc_id)"""
+        shared: Dict[str, Tuple[str, str]] = {}
+        for start in range(0, len(child_ids), 500):
+            part = child_ids[start : start + 500]
+            marks = ",".join("?" * len(part))
+            for child_id, parent_id, ref_doc in self._conn.execute(
+                f"SELECT child_id, parent_id, doc_id FROM refs WHERE child_id IN ({marks}) "
+                "AND doc_id != ? ORDER BY rowid",
+                [*part, doc_id],
+            ):
+                shared.setdefault(child_id, (parent_id, ref_doc))
+        return shared
+
+    def deletion_plan(self, doc_id: str) -> Tuple[List[str], List[str]]:
+        """删除文档时需要清理的 (parent_ids, 无人引用的child_ids)"""
+        parent_ids, child_ids = self.lookup(doc_id)
+        with self._lock:
+            shared = self._shared(doc_id, child_ids)
+        return parent_ids, [c for c in child_ids if c not in shared]
+
+    def remove(self, doc_id: str) -> None:
+        """删除文档;仍被引用的child转交给第一个引用它的文档"""
+        with self._lock, self._conn:
+            child_ids = [
+                r[0]
+                for r in self._conn.execute(
+                    "SELECT child_id FROM chunks WHERE doc_id = ?", (doc_id,)
+                )
+            ]
+            shared = self._shared(doc_id, child_ids)
+            self._conn.executemany(
+                "UPDATE chunks SET parent_id = ?, doc_id = ? WHERE child_id = ?",
+                [(parent_id, new_doc, child_id) for child_id, (parent_id, new_doc) in shared.items()],
+            )
+            self._conn.executemany(
+                "DELETE FROM refs WHERE child_id = ? AND parent_id = ?",
+                [(child_id, parent_id) for child_id, (parent_id, _) in shared.items()],
+            )
+            orphans = [(c,) for c in child_ids if c not in shared]
+            self._conn.executemany("DELETE FROM fingerprints WHERE child_id = ?", orphans)
+            self._conn.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+            self._conn.execute("DELETE FROM refs WHERE doc_id = ?", (doc_id,))
+            self._conn.execute("DELETE FROM documents WHERE doc_id = ?", (doc_id,))
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def clear(self) -> None:
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM chunks")
+            self._conn.execute("DELETE FROM refs")
+            self._conn.execute("DELETE FROM fingerprints")
+            self._conn.execute("DELETE FROM documents")
+
+    def backup(self, path: Path) -> None:
+        """在线备份到path(用于知识库快照)"""
+        with self._lock:
+            dest = sqlite3.connect(str(path))
+            try:
+                self._conn.backup(dest)
+            finally:
+                dest.close()
+
+    def restore(self, path: Path) -> None:
+        """用path处的备份整体替换当前内容"""
+        with self._lock:
+            src = sqlite3.connect(str(path))
+            try:
+                src.backup(self._conn)
+            finally:
+                src.close()
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._conn.close()
+            except Exception as e:
+                logger.warning("关闭文档索引失败", error=str(e))
@@ -0,0 +1,169 @@
+"""内容寻址的持久化Embedding缓存(内存映射向量文件 + SQLite索引)"""
+from __future__ import annotations
+
+import re
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.infrastructure.logger import get_logger
+
+logger = get_logger("tc_agent.embedding_store")
+
+_DTYPES = {"float16": np.float16, "float32": np.float32}
+
+
+class EmbeddingDiskCache:
+    """按 (模型标识, 文本sha) 寻址的向量缓存
+
+    - 每个模型一个目录: vectors.bin 为定长行的追加写文件,读取时内存映射
+    - index.sqlite 记录 key -> 行号,以及维度/精度等元信息
+    - 文件只追加不改写,已写入的行号永远有效
+    """
+
+    def __init__(self, root: Path, model_id: str, dtype: str = "float16"):
+        if dtype not in _DTYPES:
+            raise ValueError(f"Unsupported dtype: {dtype}")
+        safe_model = re.sub(r"[^A-Za-z0-9._-]+", "_", model_id)
+        self.dir = Path(root) / safe_model
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.model_id = model_id
+        self.dtype = np.dtype(_DTYPES[dtype])
+        self._vectors_path = self.dir / "vectors.bin"
+        self._lock = threading.Lock()
+        self._mmap: Optional[np.memmap] = None
+        self.hits = 0
+        self.misses = 0
+
+        self._conn = sqlite3.connect(str(self.dir / "index.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key TEXT PRIMARY KEY, row INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT)")
+        self._conn.commit()
+
+        meta = dict(self._conn.execute("SELECT k, v FROM meta").fetchall())
+        self.dimension: Optional[int] = int(meta["dimension"]) if "dimension" in meta else None
+        if meta.get("dtype") and meta["dtype"] != dtype:
+            # 精度配置变化: 旧文件无法按新精度解释,清空重建
+            logger.warning("缓存精度变化,重建缓存", old=meta["dtype"], new=dtype)
+            self._reset()
+        self._rows = self._row_count()
+
+    def _reset(self) -> None:
+        with self._conn:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute("DELETE FROM meta")
+        self._vectors_path.unlink(missing_ok=True)
+        self.dimension = None
+
+    def _row_count(self) -> int:
+        if self.dimension is None or not self._vectors_path.exists():
+            return 0
+        row_bytes = self.dimension * self.dtype.itemsize
+        size = self._vectors_path.stat().st_size
+        if size % row_bytes:
+            # 上次写入中断留下的半行,截断后再继续追加
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(size - size % row_bytes)
+        return size // row_bytes
+
+    def _view(self) -> Optional[np.memmap]:
+        """按当前文件大小重新映射(文件增长后旧映射看不到新行)"""
+        if self._rows == 0:
+            return None
+        if self._mmap is None or self._mmap.shape[0] < self._rows:
+            self._mmap = np.memmap(
+                self._vectors_path,
+                dtype=self.dtype,
+                mode="r",
+                shape=(self._rows, self.dimension),
+            )
+        return self._mmap
+
+    def _lookup_rows(self, keys: List[str]) -> Dict[str, int]:
+        rows: Dict[str, int] = {}
+        for start in range(0, len(keys), 500):
+            part = keys[start : start + 500]
+            marks = ",".join("?" * len(part))
+            rows.update(
+                self._conn.execute(
+                    f"SELECT key, row FROM entries WHERE key IN ({marks})", part
+                ).fetchall()
+            )
+        return rows
+
+    def get_many(self, keys: List[str]) -> Dict[str, List[float]]:
+        """批量读取,缺失的key不出现在结果中"""
+        found: Dict[str, List[float]] = {}
+        if not keys:
+            return found
+        with self._lock:
+            unique = list(dict.fromkeys(keys))
+            rows = self._lookup_rows(unique)
+            view = self._view()
+            if view is not None:
+                for key, row in rows.items():
+                    if row < view.shape[0]:
+                        found[key] = view[row].astype(np.float32).tolist()
+            self.hits += len(found)
+            self.misses += len(unique) - len(found)
+        return found
+
+    def put_many(self, items: Dict[str, List[float]]) -> None:
+        """追加写入新向量(已存在的key忽略)"""
+        if not items:
+            return
+        with self._lock:
+            existing = self._lookup_rows(list(items))
+            new_items = [(k, v) for k, v in items.items() if k not in existing]
+            if not new_items:
+                return
+
+            matrix = np.asarray([v for _, v in new_items], dtype=self.dtype)
+            if self.dimension is None:
+                self.dimension = int(matrix.shape[1])
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO meta (k, v) VALUES (?, ?)",
+                        [
+                            ("dimension", str(self.dimension)),
+                            ("dtype", self.dtype.name),
+                            ("model_id", self.model_id),
+                        ],
+                    )
+            elif matrix.shape[1] != self.dimension:
+                raise ValueError(
+                    f"Embedding dimension mismatch: {matrix.shape[1]} != {self.dimension}"
+                )
+
+            first_row = self._rows
+            with open(self._vectors_path, "ab") as f:
+                f.write(matrix.tobytes())
+                f.flush()
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO entries (key, row) VALUES (?, ?)",
+                    [(k, first_row + i) for i, (k, _) in enumerate(new_items)],
+                )
+            self._rows += len(new_items)
+
+    def stats(self) -> dict:
+        itemsize = self.dtype.itemsize * (self.dimension or 0)
+        return {
+            "model": self.model_id,
+            "rows": self._rows,
+            "bytes": self._rows * itemsize,
+            "dtype": self.dtype.name,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._mmap = None
+            self._conn.close()
@@ -0,0 +1,614 @@
+"""NumPy内存映射的精确向量索引(Chroma collection的轻量替代)"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.infrastructure.logger import get_logger
+from app.infrastructure.pq import CENTROIDS, ProductQuantizer
+from app.infrastructure.where_filter import field_conditions, value_matcher
+
+logger = get_logger("tc_agent.flat_index")
+
+_DTYPES = {"float16": np.float16, "float32": np.float32}
+
+
+class FlatVectorCollection:
+    """精确top-k的扁平向量集合,接口与Chroma collection的常用子集一致
+
+    - vectors.bin: 归一化向量的定长行追加文件(float16/float32),查询时内存映射
+    - rows.sqlite: 行号 -> id / 文档 / 元数据,启动时只把id和元数据载入内存
+    - 查询按块做矩阵-向量乘,argpartition取top-k,距离为余弦距离(1 - cos)
+    - where过滤在内存中字典编码的元数据列上按numpy掩码计算,支持Chroma的常用运算符
+    - 删除只打墓碑,墓碑占比过高时重写向量文件
+    - 启用PQ(pq_subspaces>0)时先在PQ码上查表筛出 top_k*rerank 个候选,再用vectors.bin中
+      的向量精确重排;PQ码追加写入codes.bin,内存中按段列存(每段一次take);
+      行数达到PQ_MIN_ROWS后才训练码本,之前精确扫描
+    """
+
+    BLOCK_ROWS = 65536
+    HALF_BLOCK_BYTES = 4 << 20
+    PQ_MIN_ROWS = 4096
+    PQ_TRAIN_ROWS = 8192
+
+    def __init__(
+        self,
+        path: Path,
+        name: str = "",
+        dtype: str = "float32",
+        compact_ratio: float = 0.5,
+        pq_subspaces: int = 0,
+        rerank: int = 8,
+    ):
+        if dtype not in _DTYPES:
+            raise ValueError(f"Unsupported dtype: {dtype}")
+        if pq_subspaces < 0 or rerank < 1:
+            raise ValueError("pq_subspaces must be >= 0 and rerank >= 1")
+        self.dir = Path(path)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.name = name or self.dir.name
+        self.dtype = np.dtype(_DTYPES[dtype])
+        self.compact_ratio = compact_ratio
+        self.pq_subspaces = pq_subspaces
+        self.rerank = rerank
+        self._vectors_path = self.dir / "vectors.bin"
+        self._codes_path = self.dir / "codes.bin"
+        self._codebooks_path = self.dir / "pq_codebooks.npy"
+        self._lock = threading.RLock()
+        self._mmap: Optional[np.memmap] = None
+        self._pq: Optional[ProductQuantizer] = None
+        # PQ码 (M, 容量) 列存,前_codes_rows列有效
+        self._codes = np.empty((0, 0), dtype=np.uint8)
+        self._codes_rows = 0
+
+        self._conn = sqlite3.connect(str(self.dir / "rows.sqlite"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS rows (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL,
+                document TEXT,
+                metadata TEXT
+            );
+            CREATE TABLE IF NOT EXISTS meta (k TEXT PRIMARY KEY, v TEXT);
+            """
+        )
+        self._conn.commit()
+
+        meta = dict(self._conn.execute("SELECT k, v FROM meta").fetchall())
+        self.dimension: Optional[int] = int(meta["dimension"]) if "dimension" in meta else None
+        if meta.get("dtype") and meta["dtype"] != self.dtype.name:
+            logger.warning("向量精度变化,清空集合", old=meta["dtype"], new=self.dtype.name)
+            self._truncate()
+        self._open_pq()
+        self._load()
+
+    # ------------------------------------------------------------------ 状态
+
+    def _open_pq(self) -> None:
+        """加载PQ码本;未启用或段数与配置不一致时丢弃(之后按需重新训练)"""
+        if self._codebooks_path.exists():
+            pq = ProductQuantizer.load(self._codebooks_path)
+            if pq.subspaces == self.pq_subspaces and pq.dimension == self.dimension:
+                self._pq = pq
+                return
+            logger.info("PQ配置变化,丢弃旧码本", collection=self.name, subspaces=self.pq_subspaces)
+        self._drop_pq()
+
+    def _drop_pq(self) -> None:
+        self._pq = None
+        self._codes = np.empty((0, 0), dtype=np.uint8)
+        self._codes_rows = 0
+        self._codes_path.unlink(missing_ok=True)
+        self._codebooks_path.unlink(missing_ok=True)
+
+    def _truncate(self) -> None:
+        with self._conn:
+            self._conn.execute("DELETE FROM rows")
+            self._conn.execute("DELETE FROM meta")
+        self._vectors_path.unlink(missing_ok=True)
+        self._mmap = None
+        self.dimension = None
+        self._drop_pq()
+
+    def _load(self) -> None:
+        """从rows.sqlite恢复内存中的id/元数据列"""
+        self._ids: List[Optional[str]] = []
+        self._metadatas: List[Optional[dict]] = []
+        self._row_of: Dict[str, int] = {}
+        self._columns: Dict[str, Tuple[np.ndarray, List[Any]]] = {}
+
+        rows = self._conn.execute("SELECT row, id, metadata FROM rows ORDER BY row").fetchall()
+        file_rows = self._file_rows()
+        total = max(file_rows, rows[-1][0] + 1 if rows else 0)
+        self._ids = [None] * total
+        self._metadatas = [None] * total
+        for row, id_, metadata in rows:
+            if row >= file_rows:
+                # 向量未写完的行(写入中断),丢弃
+                continue
+            self._ids[row] = id_
+            self._metadatas[row] = json.loads(metadata) if metadata else {}
+            self._row_of[id_] = row
+        self._ids = self._ids[:file_rows]
+        self._metadatas = self._metadatas[:file_rows]
+        self._alive = np.array([i is not None for i in self._ids], dtype=bool)
+        self._mmap = None
+        self._codes_rows = 0
+        self._generation = getattr(self, "_generation", 0) + 1
+        self._sync_codes()
+
+    def _file_rows(self) -> int:
+        if self.dimension is None or not self._vectors_path.exists():
+            return 0
+        row_bytes = self.dimension * self.dtype.itemsize
+        size = self._vectors_path.stat().st_size
+        if size % row_bytes:
+            with open(self._vectors_path, "r+b") as f:
+                f.truncate(size - size % row_bytes)
+        return size // row_bytes
+
+    def _view(self) -> Optional[np.memmap]:
+        rows = len(self._ids)
+        if rows == 0:
+            return None
+        if self._mmap is None or self._mmap.shape[0] != rows:
+            self._mmap = np.memmap(
+                self._vectors_path, dtype=self.dtype, mode="r", shape=(rows, self.dimension)
+            )
+        return self._mmap
+
+    def _codes_view(self) -> Optional[np.ndarray]:
+        if self._pq is None or self._codes_rows == 0:
+            return None
+        return self._codes[:, : self._codes_rows]
+
+    def _append_codes(self, codes: np.ndarray) -> None:
+        """追加PQ码到内存列存(容量倍增,已取出的视图不受影响)"""
+        rows = self._codes_rows + len(codes)
+        if rows > self._codes.shape[1]:
+            grown = np.empty((self._pq.subspaces, max(rows, 2 * self._codes.shape[1])), np.uint8)
+            if self._codes_rows:
+                grown[:, : self._codes_rows] = self._codes[:, : self._codes_rows]
+            self._codes = grown
+        self._codes[:, self._codes_rows : rows] = codes.T
+        self._codes_rows = rows
+
+    def _sync_codes(self) -> None:
+        """使PQ码与vectors.bin行数一致: 行数足够时训练码本,读入codes.bin并补齐新增行"""
+        rows = len(self._ids)
+        if not self.pq_subspaces or self.dimension is None:
+            return
+        if self._pq is None:
+            if len(self._row_of) < max(self.PQ_MIN_ROWS, CENTROIDS):
+                return
+            if self.dimension % self.pq_subspaces:
+                logger.warning(
+                    "向量维度不能被PQ段数整除,使用精确扫描",
+                    collection=self.name,
+                    dimension=self.dimension,
+                    subspaces=self.pq_subspaces,
+                )
+                self.pq_subspaces = 0
+                return
+            self._train_pq()
+            return
+
+        row_bytes = self._pq.subspaces
+        if self._codes_rows == 0 and self._codes_path.exists():
+            stored = np.fromfile(self._codes_path, dtype=np.uint8)
+            stored = stored[: min(len(stored) // row_bytes, rows) * row_bytes]
+            self._append_codes(stored.reshape(-1, row_bytes))
+        if self._codes_rows < rows:
+            view = self._view()
+            with open(self._codes_path, "r+b" if self._codes_path.exists() else "wb") as f:
+                # 写入中断时codes.bin可能与向量行数不一致,以向量为准
+                f.truncate(self._codes_rows * row_bytes)
+                f.seek(self._codes_rows * row_bytes)
+                for start in range(self._codes_rows, rows, self.BLOCK_ROWS):
+                    codes = self._pq.encode(view[start : min(start + self.BLOCK_ROWS, rows)])
+                    f.write(codes.tobytes())
+                    self._append_codes(codes)
+
+    def _train_pq(self) -> None:
+        alive = np.flatnonzero(self._alive)
+        if len(alive) > self.PQ_TRAIN_ROWS:
+            rng = np.random.default_rng(0)
+            alive = np.sort(rng.choice(alive, self.PQ_TRAIN_ROWS, replace=False))
+        sample = np.asarray(self._view()[alive], dtype=np.float32)
+        self._pq = ProductQuantizer.train(sample, self.pq_subspaces)
+        self._pq.save(self._codebooks_path)
+        self._codes_path.unlink(missing_ok=True)
+        logger.info(
+            "PQ码本训练完成", collection=self.name, rows=len(alive), subspaces=self.pq_subspaces
+        )
+        self._sync_codes()
+
+    def _column(self, key: str) -> Tuple[np.ndarray, List[Any]]:
+        """元数据列的字典编码 (codes, 取值表),写入后按需重建
+
+        条件只需在取值表上求一次,再按codes展开成行掩码。
+        """
+        column = self._columns.get(key)
+        if column is None or len(column[0]) != len(self._metadatas):
+            lookup: Dict[Any, int] = {}
+            values: List[Any] = []
+            codes = np.empty(len(self._metadatas), dtype=np.int32)
+            for row, meta in enumerate(self._metadatas):
+                value = meta.get(key) if meta else None
+                try:
+                    code = lookup.get(value)
+                except TypeError:  # 不可哈希的取值
+                    code, value = None, repr(value)
+                if code is None:
+                    code = lookup[value] = len(values)
+                    values.append(value)
+                codes[row] = code
+            column = (codes, values)
+            self._columns[key] = column
+        return column
+
+    # ------------------------------------------------------------------ 过滤
+
+    def _mask(self, where: Optional[dict]) -> np.ndarray:
+        if not where:
+            return self._alive.copy()
+        return self._alive & self._where_mask(where)
+
+    def _where_mask(self, where: dict) -> np.ndarray:
+        n = len(self._ids)
+        mask = np.ones(n, dtype=bool)
+        for key, cond in where.items():
+            if key == "$and":
+                for sub in cond:
+                    mask &= self._where_mask(sub)
+            elif key == "$or":
+                any_mask = np.zeros(n, dtype=bool)
+                for sub in cond:
+                    any_mask |= self._where_mask(sub)
+                mask &= any_mask
+            else:
+                codes, values = self._column(key)
+                for op, operand in field_conditions(cond).items():
+                    check = value_matcher(op, operand)
+                    matched = np.fromiter((check(v) for v in values), dtype=bool, count=len(values))
+                    mask &= matched[codes]
+        return mask
+
+    # ------------------------------------------------------------------ 读
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self._row_of)
+
+    def _documents(self, rows: List[int]) -> Dict[int, str]:
+        found: Dict[int, str] = {}
+        for start in range(0, len(rows), 500):
+            part = rows[start : start + 500]
+            marks = ",".join("?" * len(part))
+            found.update(
+                self._conn.execute(
+                    f"SELECT row, document FROM rows WHERE row IN ({marks})", part
+                ).fetchall()
+            )
+        return found
+
+    def _rows_payload(self, rows: List[int], include: List[str]) -> dict:
+        payload: dict = {"ids": [self._ids[r] for r in rows]}
+        if "documents" in include:
+            docs = self._documents(rows)
+            payload["documents"] = [docs.get(r) for r in rows]
+        if "metadatas" in include:
+            payload["metadatas"] = [self._metadatas[r] for r in rows]
+        if "embeddings" in include:
+            view = self._view()
+            payload["embeddings"] = [view[r].astype(np.float32).tolist() for r in rows]
+        return payload
+
+    def query(
+        self,
+        query_embeddings: List[List[float]],
+        n_results: int = 10,
+        where: Optional[dict] = None,
+        include: Optional[List[str]] = None,
+    ) -> dict:
+        include = include or ["documents", "metadatas", "distances"]
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[None, :]
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1.0, norms)
+
+        result: Dict[str, list] = {"ids": [], "distances": []}
+        for field in ("documents", "metadatas", "embeddings"):
+            if field in include:
+                result[field] = []
+
+        for query in queries:
+            payload, distances = self._query_one(query, n_results, where, include)
+            result["ids"].append(payload["ids"])
+            result["distances"].append(distances)
+            for field in ("documents", "metadatas", "embeddings"):
+                if field in include:
+                    result[field].append(payload[field])
+        return result
+
+    def _query_one(
+        self, query: np.ndarray, n_results: int, where: Optional[dict], include: List[str]
+    ):
+        while True:
+            # 只在取快照时持锁,矩阵乘在锁外进行,读通道可以并行
+            with self._lock:
+                generation = self._generation
+                view = self._view()
+                codes = self._codes_view()
+                pq = self._pq
+                mask = self._mask(where) if view is not None else None
+
+            rows: List[int] = []
+            scores = None
+            if view is not None and mask.any():
+                k = min(n_results, int(mask.sum()))
+                if codes is not None:
+                    scores = self._rerank_scores(view, codes, pq, query, mask, k)
+                else:
+                    scores = self._scores(view, query, mask)
+                top = np.argpartition(-scores, k - 1)[:k]
+                rows = top[np.argsort(-scores[top])].tolist()
+
+            with self._lock:
+                if generation != self._generation:
+                    # 期间发生了压缩/重置,行号已失效
+                    continue
+                # 期间被删除的行直接跳过
+                rows = [r for r in rows if self._ids[r] is not None]
+                payload = self._rows_payload(rows, include)
+            distances = [float(1.0 - scores[r]) for r in rows]
+            return payload, distances
+
+    def _scores(self, view: np.ndarray, query: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        """分块矩阵-向量乘,被过滤的行记为-inf"""
+        rows = view.shape[0]
+        scores = np.full(rows, -np.inf, dtype=np.float32)
+        selective = mask.sum() < rows // 4
+        # float16按小块转换到复用的float32缓冲区,转换结果留在CPU缓存中
+        half = view.dtype != np.float32
+        block_rows = self.BLOCK_ROWS
+        if half:
+            block_rows = min(block_rows, max(64, self.HALF_BLOCK_BYTES // (view.shape[1] * 4)))
+        buffer = np.empty((min(block_rows, rows), view.shape[1]), dtype=np.float32) if half else None
+        for start in range(0, rows, block_rows):
+            end = min(start + block_rows, rows)
+            block_mask = mask[start:end]
+            if not block_mask.any():
+                continue
+            if selective:
+                # 过滤后行数较少时只取命中行,避免整块转换精度
+                idx = np.flatnonzero(block_mask) + start
+                scores[idx] = view[idx].astype(np.float32) @ query
+            else:
+                if half:
+                    block = buffer[: end - start]
+                    np.copyto(block, view[start:end])
+                else:
+                    block = view[start:end]
+                scores[start:end] = np.where(block_mask, block @ query, -np.inf)
+        return scores
+
+    def _rerank_scores(
+        self,
+        view: np.ndarray,
+        codes: np.ndarray,
+        pq: ProductQuantizer,
+        query: np.ndarray,
+        mask: np.ndarray,
+        k: int,
+    ) -> np.ndarray:
+        """PQ查表筛出 k*rerank 个候选后精确打分,其余行记为-inf"""
+        shortlist = k * self.rerank
+        if int(mask.sum()) <= shortlist:
+            return self._scores(view, query, mask)
+        table = pq.table(query).reshape(pq.subspaces, -1)
+        if mask.all():
+            scores = np.zeros(codes.shape[1], dtype=np.float32)
+            for m in range(pq.subspaces):
+                scores += table[m].take(codes[m])
+        else:
+            idx = np.flatnonzero(mask)
+            partial = np.zeros(len(idx), dtype=np.float32)
+            for m in range(pq.subspaces):
+                partial += table[m].take(codes[m].take(idx))
+            scores = np.full(codes.shape[1], -np.inf, dtype=np.float32)
+            scores[idx] = partial
+        candidates = np.sort(np.argpartition(-scores, shortlist - 1)[:shortlist])
+        exact = view[candidates].astype(np.float32) @ query
+        scores.fill(-np.inf)
+        scores[candidates] = exact
+        return scores
+
+    def get(
+        self,
+        ids: Optional[List[str]] = None,
+        where: Optional[dict] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        include: Optional[List[str]] = None,
+    ) -> dict:
+        include = include or ["documents", "metadatas"]
+        with self._lock:
+            if ids is not None:
+                rows = [self._row_of[i] for i in ids if i in self._row_of]
+                if where:
+                    mask = self._mask(where)
+                    rows = [r for r in rows if mask[r]]
+            else:
+                rows = np.flatnonzero(self._mask(where)).tolist()
+            rows = rows[offset : offset + limit if limit is not None else None]
+            return self._rows_payload(rows, include)
+
+    # ------------------------------------------------------------------ 写
+
+    def add(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: Optional[List[str]] = None,
+        metadatas: Optional[List[dict]] = None,
+    ) -> None:
+        """追加写入(已存在的id忽略,与Chroma add一致)"""
+        self._write(ids, embeddings, documents, metadatas, replace=False)
+
+    def upsert(
+        self,
+        ids: List[str],
+        embeddings: List[List[float]],
+        documents: Optional[List[str]] = None,
+        metadatas: Optional[List[dict]] = None,
+    ) -> None:
+        self._write(ids, embeddings, documents, metadatas, replace=True)
+
+    def _write(self, ids, embeddings, documents, metadatas, replace: bool) -> None:
+        if not ids:
+            return
+        documents = documents or [None] * len(ids)
+        metadatas = metadatas or [{}] * len(ids)
+
+        with self._lock:
+            if replace:
+                self._tombstone([i for i in ids if i in self._row_of])
+            keep = []
+            seen = set()
+            for pos, id_ in enumerate(ids):
+                if id_ not in self._row_of and id_ not in seen:
+                    keep.append(pos)
+                    seen.add(id_)
+            if not keep:
+                return
+
+            matrix = np.asarray([embeddings[p] for p in keep], dtype=np.float32)
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = (matrix / np.where(norms == 0, 1.0, norms)).astype(self.dtype)
+            if self.dimension is None:
+                self.dimension = int(matrix.shape[1])
+                with self._conn:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO meta (k, v) VALUES (?, ?)",
+                        [("dimension", str(self.dimension)), ("dtype", self.dtype.name)],
+                    )
+            elif matrix.shape[1] != self.dimension:
+                raise ValueError(
+                    f"Embedding dimension mismatch: {matrix.shape[1]} != {self.dimension}"
+                )
+
+            first_row = len(self._ids)
+            with open(self._vectors_path, "ab") as f:
+                f.write(matrix.tobytes())
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT INTO rows (row, id, document, metadata) VALUES (?, ?, ?, ?)",
+                    [
+                        (
+                            first_row + n,
+                            ids[p],
+                            documents[p],
+                            json.dumps(metadatas[p] or {}, ensure_ascii=False),
+                        )
+                        for n, p in enumerate(keep)
+                    ],
+                )
+            for n, p in enumerate(keep):
+                self._ids.append(ids[p])
+                self._metadatas.append(metadatas[p] or {})
+                self._row_of[ids[p]] = first_row + n
+            self._alive = np.concatenate([self._alive, np.ones(len(keep), dtype=bool)])
+            self._sync_codes()
+
+    def _tombstone(self, ids: List[str]) -> None:
+        rows = [self._row_of.pop(i) for i in ids if i in self._row_of]
+        if not rows:
+            return
+        for row in rows:
+            self._ids[row] = None
+            self._metadatas[row] = None
+        # 元数据列编码无需重建,死行由_alive屏蔽
+        self._alive[rows] = False
+        with self._conn:
+            self._conn.executemany("DELETE FROM rows WHERE row = ?", [(r,) for r in rows])
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[dict] = None) -> None:
+        with self._lock:
+            if ids is None and where is None:
+                return
+            targets = list(ids) if ids is not None else []
+            if where:
+                mask = self._mask(where)
+                matched = {self._ids[r] for r in np.flatnonzero(mask)}
+                targets = [i for i in targets if i in matched] if ids is not None else list(matched)
+            self._tombstone(targets)
+            dead = len(self._ids) - len(self._row_of)
+            if dead and dead >= self.compact_ratio * len(self._ids):
+                self.compact()
+
+    def compact(self) -> None:
+        """重写向量文件,去掉墓碑行"""
+        with self._lock:
+            rows = np.flatnonzero(self._alive)
+            view = self._view()
+            tmp = self._vectors_path.with_suffix(".tmp")
+            with open(tmp, "wb") as f:
+                for start in range(0, len(rows), self.BLOCK_ROWS):
+                    f.write(np.asarray(view[rows[start : start + self.BLOCK_ROWS]]).tobytes())
+            codes = self._codes_view()
+            if codes is not None:
+                codes_tmp = self._codes_path.with_suffix(".tmp")
+                with open(codes_tmp, "wb") as f:
+                    for start in range(0, len(rows), self.BLOCK_ROWS):
+                        part = rows[start : start + self.BLOCK_ROWS]
+                        f.write(np.ascontiguousarray(codes[:, part].T).tobytes())
+            self._mmap = None
+            with self._conn:
+                self._conn.executemany(
+                    "UPDATE rows SET row = ? WHERE row = ?",
+                    [(new, int(old)) for new, old in enumerate(rows)],
+                )
+            tmp.replace(self._vectors_path)
+            if codes is not None:
+                codes_tmp.replace(self._codes_path)
+            if len(rows) == 0:
+                self._vectors_path.unlink(missing_ok=True)
+                self._codes_path.unlink(missing_ok=True)
+            self._load()
+            logger.debug("向量文件已压缩", collection=self.name, rows=len(rows))
+
+    def reset(self) -> None:
+        """清空集合"""
+        with self._lock:
+            self._truncate()
+            self._load()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rows": len(self._ids),
+                "live": len(self._row_of),
+                "dtype": self.dtype.name,
+                "dimension": self.dimension,
+                # 查询时每行扫描的字节数(PQ: 每段1字节)
+                "pq_subspaces": self._pq.subspaces if self._pq is not None else 0,
+                "scan_bytes_per_row": (
+                    self._pq.subspaces
+                    if self._pq is not None
+                    else (self.dimension or 0) * self.dtype.itemsize
+                ),
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._mmap = None
+            self._conn.close()
@@ -0,0 +1,331 @@
+"""知识库批量导入后台任务(NDJSON / tar / zip)"""
+from __future__ import annotations
+
+import asyncio
+import json
+import tarfile
+import time
+import uuid
+import zipfile
+from collections import OrderedDict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path, PurePosixPath
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from app.infrastructure.config import settings
+from app.infrastructure.logger import get_logger
+
+logger = get_logger("tc_agent.ingest_jobs")
+
+BULK_FORMATS = ("ndjson", "zip", "tar")
+
+# 归档内按扩展名决定目标集合
+EXTENSION_COLLECTIONS = {
+    ".md": "text",
+    ".txt": "text",
+    ".rst": "text",
+    ".c": "code",
+    ".h": "code",
+    ".py": "code",
+    ".cpp": "code",
+    ".hpp": "code",
+    ".S": "code",
+}
+
+# (collection, content, metadata)
+Record = Tuple[str, str, dict]
+
+
+@dataclass
+class IngestJob:
+    """导入任务状态"""
+
+    id: str
+    format: str
+    status: str = "queued"  # queued | running | done | failed
+    collection: Optional[str] = None
+    scope: Optional[str] = None
+    upload_bytes: int = 0
+    records_total: int = 0  # 已读取的记录(文件/行)数
+    documents: int = 0  # 已入库的文档数
+    skipped: int = 0
+    errors: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    MAX_ERRORS = 50
+
+    def add_error(self, message: str) -> None:
+        self.skipped += 1
+        if len(self.errors) < self.MAX_ERRORS:
+            self.errors.append(message)
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        end = self.finished_at or time.time()
+        data["elapsed"] = round(end - self.started_at, 3) if self.started_at else 0.0
+        return data
+
+
+def _decode(raw: bytes) -> Optional[str]:
+    if b"\x00" in raw[:8192]:
+        return None  # 二进制文件
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        return None
+
+
+class BulkReader:
+    """逐条读取上传文件,同一时刻只持有一条记录的内容"""
+
+    def __init__(self, path: Path, fmt: str, job: IngestJob, max_file_bytes: int):
+        self.path = path
+        self.fmt = fmt
+        self.job = job
+        self.max_file_bytes = max_file_bytes
+
+    def _collection_for(self, name: str) -> Optional[str]:
+        """只导入已知扩展名的文件,指定了集合时统一写入该集合"""
+        collection = EXTENSION_COLLECTIONS.get(PurePosixPath(name).suffix)
+        if collection is None:
+            return None
+        return self.job.collection or collection
+
+    def _file_record(self, name: str, size: int, read) -> Optional[Record]:
+        collection = self._collection_for(name)
+        if collection is None:
+            return None
+        if size > self.max_file_bytes:
+            self.job.add_error(f"{name}: 文件过大({size} bytes)")
+            return None
+        content = _decode(read())
+        if content is None:
+            self.job.add_error(f"{name}: 非UTF-8文本")
+            return None
+        path = PurePosixPath(name)
+        metadata = {"source": name, "filename": path.name, "type": path.suffix}
+        if self.job.scope:
+            metadata["scope"] = self.job.scope
+        return collection, content, metadata
+
+    def __iter__(self) -> Iterator[Record]:
+        if self.fmt == "ndjson":
+            yield from self._iter_ndjson()
+        elif self.fmt == "zip":
+            yield from self._iter_zip()
+        else:
+            yield from self._iter_tar()
+
+    def _iter_ndjson(self) -> Iterator[Record]:
+        with open(self.path, "r", encoding="utf-8", errors="replace") as f:
+            for lineno, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                self.job.records_total += 1
+                try:
+                    item = json.loads(line)
+                    content = item["content"]
+                except (ValueError, KeyError, TypeError) as e:
+                    self.job.add_error(f"line {lineno}: {e}")
+                    continue
+                metadata = dict(item.get("metadata") or {})
+                if self.job.scope:
+                    metadata.setdefault("scope", self.job.scope)
+                collection = item.get("collection") or self.job.collection or "text"
+                yield collection, content, metadata
+
+    def _iter_zip(self) -> Iterator[Record]:
+        with zipfile.ZipFile(self.path) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                self.job.records_total += 1
+                record = self._file_record(
+                    info.filename, info.file_size, lambda: archive.read(info)
+                )
+                if record:
+                    yield record
+
+    def _iter_tar(self) -> Iterator[Record]:
+        # 流式模式逐个成员读取,支持gz/bz2/xz压缩
+        with tarfile.open(self.path, mode="r|*") as archive:
+            for member in archive:
+                if not member.isfile():
+                    continue
+                self.job.records_total += 1
+
+                def read(member=member) -> bytes:
+                    f = archive.extractfile(member)
+                    return f.read() if f else b""
+
+                record = self._file_record(member.name, member.size, read)
+                if record:
+                    yield record
+
+
+def _next_batch(
+    records: Iterator[Record], max_docs: int, max_chars: int
+) -> List[Record]:
+    """读取下一批记录(在线程中执行),按文档数与字符数限制内存占用"""
+    batch: List[Record] = []
+    chars = 0
+    for record in records:
+        batch.append(record)
+        chars += len(record[1])
+        if len(batch) >= max_docs or chars >= max_chars:
+            break
+    return batch
+
+
+class IngestJobManager:
+    """批量导入任务管理
+
+    - 上传内容先落盘,接口立即返回job_id
+    - 后台任务逐批读取、切分、embedding、写入,任一时刻内存中只有一批文档
+    - 同时运行的任务数受限,多余任务排队;只保留最近的若干任务状态
+    """
+
+    def __init__(
+        self,
+        upload_dir: Optional[Path] = None,
+        max_concurrent: int = 1,
+        batch_docs: int = 64,
+        batch_chars: int = 2_000_000,
+        max_file_bytes: int = 2 * 1024 * 1024,
+        history: int = 100,
+    ):
+        self.upload_dir = Path(upload_dir or settings.data_dir / "uploads")
+        self.batch_docs = max(1, batch_docs)
+        self.batch_chars = max(1, batch_chars)
+        self.max_file_bytes = max_file_bytes
+        self.history = history
+        self.jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._max_concurrent = max(1, max_concurrent)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def new_upload_path(self) -> Tuple[str, Path]:
+        self.upload_dir.mkdir(parents=True, exist_ok=True)
+        job_id = uuid.uuid4().hex
+        return job_id, self.upload_dir / f"{job_id}.upload"
+
+    def submit(
+        self,
+        job_id: str,
+        path: Path,
+        fmt: str,
+        collection: Optional[str] = None,
+        scope: Optional[str] = None,
+    ) -> IngestJob:
+        if fmt not in BULK_FORMATS:
+            raise ValueError(f"Unsupported bulk format: {fmt}")
+        job = IngestJob(
+            id=job_id,
+            format=fmt,
+            collection=collection,
+            scope=scope,
+            upload_bytes=path.stat().st_size,
+        )
+        self.jobs[job_id] = job
+        self._trim()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrent)
+        task = asyncio.create_task(self._run(job, path))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+        logger.info("批量导入任务已提交", job_id=job_id, format=fmt, bytes=job.upload_bytes)
+        return job
+
+    def _trim(self) -> None:
+        while len(self.jobs) > self.history:
+            oldest = next(iter(self.jobs))
+            if self.jobs[oldest].status in ("queued", "running"):
+                break
+            self.jobs.popitem(last=False)
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self.jobs.get(job_id)
+
+    async def wait(self, job_id: str) -> Optional[IngestJob]:
+        task = self._tasks.get(job_id)
+        if task is not None:
+            await asyncio.shield(task)
+        return self.jobs.get(job_id)
+
+    async def _run(self, job: IngestJob, path: Path) -> None:
+        from app.infrastructure.vector_store import get_vector_store
+
+        async with self._semaphore:
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                vector_store = await get_vector_store()
+                records = iter(BulkReader(path, job.format, job, self.max_file_bytes))
+                while True:
+                    batch = await asyncio.to_thread(
+                        _next_batch, records, self.batch_docs, self.batch_chars
+                    )
+                    if not batch:
+                        break
+                    await self._index_batch(vector_store, job, batch)
+                job.status = "done"
+            except Exception as e:
+                job.status = "failed"
+                job.error = str(e)
+                logger.error("批量导入失败", job_id=job.id, error=str(e))
+            finally:
+                job.finished_at = time.time()
+                path.unlink(missing_ok=True)
+                logger.info(
+                    "批量导入任务结束",
+                    job_id=job.id,
+                    status=job.status,
+                    documents=job.documents,
+                    skipped=job.skipped,
+                )
+
+    @staticmethod
+    async def _index_batch(vector_store, job: IngestJob, batch: List[Record]) -> None:
+        grouped: Dict[str, Tuple[List[str], List[dict]]] = {}
+        for collection, content, metadata in batch:
+            if not content.strip():
+                job.skipped += 1
+                continue
+            docs, metas = grouped.setdefault(collection, ([], []))
+            docs.append(content)
+            metas.append(metadata)
+
+        for collection, (docs, metas) in grouped.items():
+            try:
+                await vector_store.add_documents(
+                    collection=collection, documents=docs, metadatas=metas
+                )
+                job.documents += len(docs)
+            except ValueError as e:
+                # 未知集合等输入错误只跳过这一组
+                job.add_error(str(e))
+                job.skipped += len(docs) - 1
+            except Exception as e:
+                # 存储错误同样只跳过这一组,任务继续处理后续批次
+                logger.warning("批量导入写入失败", job_id=job.id, collection=collection, error=str(e))
+                job.add_error(f"{collection}: {e}")
+                job.skipped += len(docs) - 1
+
+
+_manager: Optional[IngestJobManager] = None
+
+
+def get_ingest_jobs() -> IngestJobManager:
+    """获取批量导入任务管理器(单例)"""
+    global _manager
+    if _manager is None:
+        _manager = IngestJobManager(
+            max_concurrent=settings.knowledge_bulk_max_jobs,
+            batch_docs=settings.knowledge_bulk_batch_docs,
+            batch_chars=settings.knowledge_bulk_batch_chars,
+            max_file_bytes=settings.knowledge_bulk_max_file_bytes,
+        )
+    return _manager
@@ -0,0 +1,126 @@
+"""预置知识库清单(增量加载)"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from app.infrastructure.logger import get_logger
+
+logger = get_logger("tc_agent.knowledge_manifest")
+
+
+def file_sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class KnowledgeManifest:
+    """记录已入库文件的 path/size/mtime/sha256/doc_id
+
+    - fingerprint 包含 embedding 模型与切分参数,任一变化即视为整体失效(stale)
+    - 同一次同步中通过 mark_seen 记录仍存在的文件,未出现的即为已删除文件
+    """
+
+    VERSION = 1
+
+    def __init__(self, path: Path, root: Path, fingerprint: dict):
+        self.path = Path(path)
+        self.root = Path(root)
+        self.fingerprint = fingerprint
+        self.entries: Dict[str, dict] = {}
+        self.stale = False
+        self._seen: set[str] = set()
+
+    @classmethod
+    def load(cls, path: Path, root: Path, fingerprint: dict) -> "KnowledgeManifest":
+        """读取清单;指纹不一致时标记为stale并保留旧条目以便清理"""
+        manifest = cls(path, root, fingerprint)
+        if not manifest.path.exists():
+            return manifest
+        try:
+            data = json.loads(manifest.path.read_text(encoding="utf-8"))
+        except Exception as e:
+            logger.warning("清单读取失败,将全量重建", path=str(path), error=str(e))
+            manifest.stale = True
+            return manifest
+
+        manifest.entries = data.get("files", {})
+        if data.get("version") != cls.VERSION or data.get("fingerprint") != fingerprint:
+            manifest.stale = True
+        return manifest
+
+    def key_for(self, file_path: Path) -> str:
+        """清单键: 相对root的posix路径(root外的文件使用绝对路径)"""
+        try:
+            return file_path.resolve().relative_to(self.root.resolve()).as_posix()
+        except ValueError:
+            return file_path.resolve().as_posix()
+
+    def get(self, key: str) -> Optional[dict]:
+        return self.entries.get(key)
+
+    def set(
+        self,
+        key: str,
+        collection: str,
+        stat: os.stat_result,
+        sha256: str,
+        doc_id: Optional[str],
+    ) -> None:
+        self.entries[key] = {
+            "collection": collection,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": sha256,
+            "doc_id": doc_id,
+        }
+
+    def remove(self, key: str) -> Optional[dict]:
+        return self.entries.pop(key, None)
+
+    def is_unchanged(self, key: str, collection: str, stat: os.stat_result) -> bool:
+        """size与mtime均未变化时无需读取文件"""
+        entry = self.entries.get(key)
+        return bool(
+            entry
+            and entry.get("collection") == collection
+            and entry.get("size") == stat.st_size
+            and entry.get("mtime_ns") == stat.st_mtime_ns
+        )
+
+    def doc_id_in_use(self, doc_id: str, exclude: str) -> bool:
+        """内容相同的多个文件共享doc_id,删除前需确认无其他引用"""
+        return any(
+            k != exclude and e.get("doc_id") == doc_id for k, e in self.entries.items()
+        )
+
+    def mark_seen(self, key: str) -> None:
+        self._seen.add(key)
+
+    def unseen_keys(self) -> List[str]:
+        return [k for k in self.entries if k not in self._seen]
+
+    def drop_collection(self, collection: str) -> List[str]:
+        """移除某集合的全部条目(集合被重置时调用)"""
+        keys = [k for k, e in self.entries.items() if e.get("collection") == collection]
+        for k in keys:
+            del self.entries[k]
+        return keys
+
+    def reset(self) -> None:
+        self.entries.clear()
+        self.stale = False
+
+    def save(self) -> None:
+        """原子写入(临时文件 + rename)"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        payload = {
+            "version": self.VERSION,
+            "fingerprint": self.fingerprint,
+            "files": self.entries,
+        }
+        tmp = self.path.with_suffix(self.path.suffix + ".tmp")
+        tmp.write_text(json.dumps(payload, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, self.path)
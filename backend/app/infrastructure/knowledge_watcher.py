@@ -0,0 +1,257 @@
+"""预置知识目录监听: 文件变化后防抖,只重新索引受影响的文件
+
+- 事件来源: 安装了watchfiles时使用系统通知(Linux上为inotify),否则定期扫描size/mtime
+- 防抖: 最后一次事件后静默debounce才同步;持续有事件时最长等待 MAX_WAIT_FACTOR 倍debounce
+- 指标: 每个文件从修改到可检索的延迟(修改时间取文件mtime,删除取首次观察到的时间)
+"""
+from __future__ import annotations
+
+import asyncio
+import os
+import statistics
+import time
+from collections import deque
+from pathlib import Path
+from typing import Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from app.infrastructure.config import settings
+from app.infrastructure.logger import get_logger
+
+logger = get_logger("tc_agent.knowledge_watcher")
+
+WATCH_BACKENDS = ("auto", "watchfiles", "polling")
+MAX_WAIT_FACTOR = 10
+LATENCY_SAMPLES = 1024
+
+# (size, mtime_ns)
+_FileState = Tuple[int, int]
+
+
+def _watchfiles_available() -> bool:
+    try:
+        import watchfiles  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _scan(root: Path) -> Dict[str, _FileState]:
+    """轮询模式: 记录root下所有文件的size/mtime"""
+    states: Dict[str, _FileState] = {}
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            path = os.path.join(dirpath, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            states[path] = (stat.st_size, stat.st_mtime_ns)
+    return states
+
+
+class KnowledgeWatcher:
+    """监听预置知识目录并增量同步"""
+
+    def __init__(
+        self,
+        root: Optional[Path] = None,
+        sync: Optional[Callable[[list], Awaitable[dict]]] = None,
+        backend: str = "auto",
+        debounce_ms: float = 500,
+        poll_interval: float = 1.0,
+    ):
+        """
+        Args:
+            root: 监听目录(默认预置知识目录)
+            sync: 同步回调,接收变化的路径列表(默认调用向量库的sync_preset_files)
+            backend: auto | watchfiles | polling
+            debounce_ms: 防抖静默时间(毫秒)
+            poll_interval: 轮询模式的扫描间隔(秒)
+        """
+        if backend not in WATCH_BACKENDS:
+            raise ValueError(f"Unknown watch backend: {backend}")
+        if backend == "auto":
+            backend = "watchfiles" if _watchfiles_available() else "polling"
+        self.backend = backend
+        self._root = Path(root) if root else None
+        self._sync = sync
+        self.debounce = max(0.0, debounce_ms / 1000)
+        self.poll_interval = max(0.05, poll_interval)
+
+        self._events: asyncio.Queue = asyncio.Queue()
+        self._stop = asyncio.Event()
+        self._tasks: list = []
+        # 指标
+        self._latencies: Deque[float] = deque(maxlen=LATENCY_SAMPLES)
+        self.events = 0
+        self.batches = 0
+        self.files_synced = 0
+        self.files_indexed = 0
+        self.files_removed = 0
+        self.errors = 0
+        self.last_error: Optional[str] = None
+        self.last_sync_at: Optional[float] = None
+
+    @property
+    def root(self) -> Path:
+        if self._root is None:
+            from app.infrastructure.vector_store import PRESET_DIR
+
+            self._root = PRESET_DIR
+        return self._root
+
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+
+    async def _default_sync(self, paths: list) -> dict:
+        from app.infrastructure.vector_store import get_vector_store
+
+        vector_store = await get_vector_store()
+        return await vector_store.sync_preset_files(paths)
+
+    # ---- 事件来源 ----
+
+    def _notify(self, path: str) -> None:
+        self.events += 1
+        self._events.put_nowait((path, time.time()))
+
+    async def _watch_native(self) -> None:
+        from watchfiles import awatch
+
+        # watchfiles只做最小合并,防抖统一在_consume中处理
+        async for changes in awatch(self.root, stop_event=self._stop, debounce=50, step=20):
+            for _, path in changes:
+                self._notify(path)
+
+    async def _watch_polling(self) -> None:
+        previous = await asyncio.to_thread(_scan, self.root)
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.poll_interval)
+                return
+            except asyncio.TimeoutError:
+                pass
+            current = await asyncio.to_thread(_scan, self.root)
+            for path in previous.keys() - current.keys():
+                self._notify(path)
+            for path, state in current.items():
+                if previous.get(path) != state:
+                    self._notify(path)
+            previous = current
+
+    # ---- 防抖与同步 ----
+
+    async def _consume(self) -> None:
+        while True:
+            path, seen = await self._events.get()
+            pending: Dict[str, float] = {path: seen}
+            deadline = time.monotonic() + self.debounce * MAX_WAIT_FACTOR
+            while True:
+                timeout = min(self.debounce, deadline - time.monotonic())
+                if timeout <= 0:
+                    break
+                try:
+                    path, seen = await asyncio.wait_for(self._events.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.setdefault(path, seen)
+            await self._flush(pending)
+
+    def _edited_at(self, path: str, seen: float) -> float:
+        """修改时间: 文件mtime(不早于观察时间太多时),否则为首次观察到的时间
+
+        cp -p/解压等保留旧mtime的操作不会把延迟算成几小时。
+        """
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return seen
+        max_lag = self.poll_interval * 2 if self.backend == "polling" else 1.0
+        return mtime if 0 <= seen - mtime <= max_lag else seen
+
+    async def _flush(self, pending: Dict[str, float]) -> None:
+        edited = {path: self._edited_at(path, seen) for path, seen in pending.items()}
+        sync = self._sync or self._default_sync
+        try:
+            result = await sync(list(pending))
+        except Exception as e:
+            self.errors += 1
+            self.last_error = str(e)
+            logger.warning("知识库增量同步失败", files=len(pending), error=str(e))
+            return
+        now = time.time()
+        self.batches += 1
+        self.last_sync_at = now
+        self.files_indexed += result.get("indexed", 0)
+        self.files_removed += result.get("removed", 0)
+        for path in result.get("files", []):
+            self.files_synced += 1
+            if path in edited:
+                self._latencies.append(max(0.0, now - edited[path]))
+
+    # ---- 生命周期 ----
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        source = self._watch_native if self.backend == "watchfiles" else self._watch_polling
+        self._tasks = [asyncio.create_task(source()), asyncio.create_task(self._consume())]
+        logger.info("知识库目录监听已启动", root=str(self.root), backend=self.backend)
+
+    async def stop(self) -> None:
+        self._stop.set()
+        tasks, self._tasks = self._tasks, []
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def metrics(self) -> dict:
+        latencies = sorted(self._latencies)
+
+        def pct(q: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * q))], 3)
+
+        return {
+            "enabled": True,
+            "running": self.running,
+            "backend": self.backend,
+            "root": str(self.root),
+            "debounce_ms": self.debounce * 1000,
+            "pending_events": self._events.qsize(),
+            "events": self.events,
+            "batches": self.batches,
+            "files_synced": self.files_synced,
+            "files_indexed": self.files_indexed,
+            "files_removed": self.files_removed,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "last_sync_at": self.last_sync_at,
+            # 修改 -> 可检索 的延迟(秒)
+            "latency": {
+                "samples": len(latencies),
+                "p50": pct(0.5),
+                "p95": pct(0.95),
+                "max": round(latencies[-1], 3) if latencies else None,
+                "mean": round(statistics.fmean(latencies), 3) if latencies else None,
+                "last": round(self._latencies[-1], 3) if latencies else None,
+            },
+        }
+
+
+_watcher: Optional[KnowledgeWatcher] = None
+
+
+def get_knowledge_watcher() -> Optional[KnowledgeWatcher]:
+    """获取知识库目录监听器(未启用时返回None)"""
+    global _watcher
+    if _watcher is None and settings.knowledge_watch_enabled:
+        _watcher = KnowledgeWatcher(
+            backend=settings.knowledge_watch_backend,
+            debounce_ms=settings.knowledge_watch_debounce_ms,
+            poll_interval=settings.knowledge_watch_poll_interval,
+        )
+    return _watcher
@@ -0,0 +1,197 @@
+"""Parent文档持久化存储(SQLite + mmap读, 懒加载 + LRU热缓存)"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from pathlib import Path
+from typing import Dict, Iterable, Iterator
+
+from app.infrastructure.logger import get_logger
+
+logger = get_logger("tc_agent.parent_store")
+
+# SQLite读路径走内存映射,冷数据交给操作系统页缓存而不是进程堆
+_MMAP_SIZE = 256 * 1024 * 1024
+
+
+class SqliteParentStore(MutableMapping):
+    """以parent_id为键的parent文档存储
+
+    - 数据落盘在SQLite中,进程重启后无需重新embedding即可还原parent
+    - 内容按需读取,仅最近访问的条目保留在LRU热缓存中,常驻内存与知识库规模无关
+    - 实现MutableMapping接口,ParentDocumentRetriever可像dict一样读写
+    """
+
+    def __init__(self, path: Path, cache_size: int = 1024):
+        """
+        Args:
+            path: SQLite文件路径
+            cache_size: LRU热缓存条目数上限
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.cache_size = max(0, cache_size)
+        self._cache: "OrderedDict[str, dict]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._hits = 0
+        self._misses = 0
+
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(f"PRAGMA mmap_size={_MMAP_SIZE}")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS parents ("
+            "parent_id TEXT PRIMARY KEY, content TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+    # ---- 缓存 ----
+
+    def _cache_put(self, parent_id: str, value: dict) -> None:
+        if self.cache_size == 0:
+            return
+        self._cache[parent_id] = value
+        self._cache.move_to_end(parent_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    # ---- MutableMapping ----
+
+    def __getitem__(self, parent_id: str) -> dict:
+        with self._lock:
+            cached = self._cache.get(parent_id)
+            if cached is not None:
+                self._cache.move_to_end(parent_id)
+                self._hits += 1
+                return cached
+
+            self._misses += 1
+            row = self._conn.execute(
+                "SELECT content, metadata FROM parents WHERE parent_id = ?", (parent_id,)
+            ).fetchone()
+            if row is None:
+                raise KeyError(parent_id)
+            value = {"content": row[0], "metadata": json.loads(row[1])}
+            self._cache_put(parent_id, value)
+            return value
+
+    def __setitem__(self, parent_id: str, value: dict) -> None:
+        self.update_many({parent_id: value})
+
+    def __delitem__(self, parent_id: str) -> None:
+        with self._lock:
+            cur = self._conn.execute("DELETE FROM parents WHERE parent_id = ?", (parent_id,))
+            self._conn.commit()
+            self._cache.pop(parent_id, None)
+            if cur.rowcount == 0:
+                raise KeyError(parent_id)
+
+    def __contains__(self, parent_id: object) -> bool:
+        with self._lock:
+            if parent_id in self._cache:
+                return True
+            row = self._conn.execute(
+                "SELECT 1 FROM parents WHERE parent_id = ?", (parent_id,)
+            ).fetchone()
+            return row is not None
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT parent_id FROM parents").fetchall()
+        return iter([r[0] for r in rows])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM parents").fetchone()[0]
+
+    # ---- 批量操作 ----
+
+    def update_many(self, items: Dict[str, dict]) -> None:
+        """批量写入(单个事务)"""
+        if not items:
+            return
+        rows = [
+            (
+                parent_id,
+                value["content"],
+                json.dumps(value.get("metadata", {}), ensure_ascii=False),
+            )
+            for parent_id, value in items.items()
+        ]
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO parents (parent_id, content, metadata) "
+                    "VALUES (?, ?, ?)",
+                    rows,
+                )
+            # 只刷新已在热缓存中的条目,批量导入不冲掉热点
+            for parent_id, value in items.items():
+                if parent_id in self._cache:
+                    self._cache[parent_id] = value
+
+    def update(self, other=(), **kwargs) -> None:
+        """MutableMapping.update 的批量实现"""
+        self.update_many(dict(other, **kwargs))
+
+    def delete_many(self, parent_ids: Iterable[str]) -> int:
+        """批量删除,返回删除条数"""
+        ids = list(parent_ids)
+        if not ids:
+            return 0
+        with self._lock:
+            with self._conn:
+                cur = self._conn.executemany(
+                    "DELETE FROM parents WHERE parent_id = ?", [(i,) for i in ids]
+                )
+            for parent_id in ids:
+                self._cache.pop(parent_id, None)
+            return cur.rowcount
+
+    def clear(self) -> None:
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM parents")
+            self._cache.clear()
+
+    def cache_info(self) -> dict:
+        """热缓存统计"""
+        with self._lock:
+            return {
+                "size": len(self._cache),
+                "capacity": self.cache_size,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+    def backup(self, path: Path) -> None:
+        """在线备份到path(用于知识库快照)"""
+        with self._lock:
+            dest = sqlite3.connect(str(path))
+            try:
+                self._conn.backup(dest)
+            finally:
+                dest.close()
+
+    def restore(self, path: Path) -> None:
+        """用path处的备份整体替换当前内容"""
+        with self._lock:
+            src = sqlite3.connect(str(path))
+            try:
+                src.backup(self._conn)
+            finally:
+                src.close()
+            self._cache.clear()
+
+    def close(self) -> None:
+        with self._lock:
+            self._cache.clear()
+            try:
+                self._conn.close()
+            except Exception as e:
+                logger.warning("关闭parent store失败", path=str(self.path), error=str(e))
+
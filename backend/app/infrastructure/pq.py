@@ -0,0 +1,92 @@
+"""乘积量化(PQ): 把向量切成M段,每段用256个质心之一的编号(1字节)表示
+
+扁平索引先在PQ码上用查表(ADC)求近似内积筛出候选,再用原始向量精确重排。
+每行扫描字节数从 dim*4 降为 M。
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+CENTROIDS = 256
+_ENCODE_ROWS = 16384
+
+
+class ProductQuantizer:
+    """内积PQ: codebooks形状为 (M, 256, dim/M)"""
+
+    def __init__(self, codebooks: np.ndarray):
+        self.codebooks = np.ascontiguousarray(codebooks, dtype=np.float32)
+        self.subspaces, _, self.sub_dim = self.codebooks.shape
+        self.dimension = self.subspaces * self.sub_dim
+        self._half_norms = 0.5 * np.einsum("mkd,mkd->mk", self.codebooks, self.codebooks)
+
+    @classmethod
+    def train(
+        cls, sample: np.ndarray, subspaces: int, iterations: int = 10, seed: int = 0
+    ) -> "ProductQuantizer":
+        """在样本上逐段做k-means(样本行数应不少于256)"""
+        sample = np.asarray(sample, dtype=np.float32)
+        rows, dimension = sample.shape
+        if dimension % subspaces:
+            raise ValueError(f"Dimension {dimension} is not divisible by {subspaces} subspaces")
+        if rows < CENTROIDS:
+            raise ValueError(f"PQ training needs at least {CENTROIDS} rows, got {rows}")
+        sub_dim = dimension // subspaces
+        rng = np.random.default_rng(seed)
+        codebooks = np.empty((subspaces, CENTROIDS, sub_dim), dtype=np.float32)
+        for m in range(subspaces):
+            part = np.ascontiguousarray(sample[:, m * sub_dim : (m + 1) * sub_dim])
+            centroids = part[rng.choice(rows, CENTROIDS, replace=False)].copy()
+            for _ in range(iterations):
+                labels = _nearest(part, centroids)
+                counts = np.bincount(labels, minlength=CENTROIDS)
+                sums = np.stack(
+                    [np.bincount(labels, part[:, j], CENTROIDS) for j in range(sub_dim)], axis=1
+                )
+                empty = counts == 0
+                centroids[~empty] = sums[~empty] / counts[~empty, None]
+                # 空簇重新随机取点
+                if empty.any():
+                    centroids[empty] = part[rng.choice(rows, int(empty.sum()), replace=False)]
+            codebooks[m] = centroids
+        return cls(codebooks)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """向量 -> PQ码 (rows, M) uint8"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        codes = np.empty((vectors.shape[0], self.subspaces), dtype=np.uint8)
+        for start in range(0, vectors.shape[0], _ENCODE_ROWS):
+            block = vectors[start : start + _ENCODE_ROWS]
+            for m in range(self.subspaces):
+                part = block[:, m * self.sub_dim : (m + 1) * self.sub_dim]
+                codes[start : start + len(block), m] = _nearest(
+                    part, self.codebooks[m], self._half_norms[m]
+                )
+        return codes
+
+    def table(self, query: np.ndarray) -> np.ndarray:
+        """查询与各段质心的内积表 (M*256,)"""
+        parts = np.asarray(query, dtype=np.float32).reshape(self.subspaces, 1, self.sub_dim)
+        return (self.codebooks * parts).sum(axis=2).ravel()
+
+    def save(self, path: Path) -> None:
+        tmp = Path(path).with_suffix(".tmp")
+        with open(tmp, "wb") as f:
+            np.save(f, self.codebooks)
+        tmp.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "ProductQuantizer":
+        return cls(np.load(path))
+
+
+def _nearest(
+    part: np.ndarray, centroids: np.ndarray, half_norms: Optional[np.ndarray] = None
+) -> np.ndarray:
+    """每行最近质心编号(argmax x·c - |c|²/2 等价于最小欧氏距离)"""
+    if half_norms is None:
+        half_norms = 0.5 * np.einsum("kd,kd->k", centroids, centroids)
+    return np.argmax(part @ centroids.T - half_norms, axis=1)
@@ -0,0 +1,299 @@
+"""知识库快照文件: 单文件打包集合向量、文本、元数据与旁路索引,新节点导入后无需重新embedding
+
+文件布局:
+    MAGIC | 段 | 段 | ... | 目录(JSON) | 目录长度(u64 LE) | MAGIC
+
+- 向量段不压缩(float32 小端行主序,起始偏移按64字节对齐),读取时直接np.memmap
+- 其余段流式压缩: 安装了zstandard时用zstd,否则用zlib
+- 目录放在文件末尾,导出时无需预先知道各段长度
+"""
+from __future__ import annotations
+
+import json
+import struct
+import zlib
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, Iterator, Optional
+
+import numpy as np
+
+MAGIC = b"TCSNAP01"
+SNAPSHOT_SUFFIX = ".tcsnap"
+FORMAT_VERSION = 1
+ALIGN = 64
+VECTOR_DTYPE = "<f4"
+CODECS = ("zstd", "zlib", "none")
+
+_READ_CHUNK = 1024 * 1024
+_FOOTER = struct.Struct("<Q")
+
+
+class SnapshotError(ValueError):
+    """快照文件损坏或与当前知识库配置不兼容"""
+
+
+def _zstd():
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard
+
+
+def resolve_codec(codec: str = "auto") -> str:
+    """auto: 有zstandard时用zstd,否则zlib"""
+    if codec == "auto":
+        return "zstd" if _zstd() is not None else "zlib"
+    if codec not in CODECS:
+        raise ValueError(f"Unknown snapshot codec: {codec}")
+    if codec == "zstd" and _zstd() is None:
+        raise ValueError("zstd压缩需要安装zstandard")
+    return codec
+
+
+def _compressor(codec: str):
+    if codec == "zstd":
+        return _zstd().ZstdCompressor(level=3).compressobj()
+    if codec == "zlib":
+        return zlib.compressobj(6)
+    return None
+
+
+def _decompressor(codec: str):
+    if codec == "zstd":
+        module = _zstd()
+        if module is None:
+            raise SnapshotError("快照使用zstd压缩,需要安装zstandard")
+        return module.ZstdDecompressor().decompressobj()
+    if codec == "zlib":
+        return zlib.decompressobj()
+    if codec == "none":
+        return None
+    raise SnapshotError(f"未知的压缩格式: {codec}")
+
+
+def _decompress_errors() -> tuple:
+    module = _zstd()
+    return (zlib.error,) if module is None else (zlib.error, module.ZstdError)
+
+
+class _Section:
+    """正在写入的段(流式压缩)"""
+
+    def __init__(self, writer: "SnapshotWriter", name: str, codec: str):
+        self.writer = writer
+        self.name = name
+        self.codec = codec
+        self.offset = writer._f.tell()
+        self.raw_length = 0
+        self._compressor = _compressor(codec)
+        writer._open = self
+
+    def write(self, data: bytes) -> None:
+        self.raw_length += len(data)
+        if self._compressor is not None:
+            data = self._compressor.compress(data)
+        if data:
+            self.writer._f.write(data)
+
+    def close(self) -> None:
+        if self._compressor is not None:
+            self.writer._f.write(self._compressor.flush())
+        self.writer._sections[self.name] = {
+            "offset": self.offset,
+            "length": self.writer._f.tell() - self.offset,
+            "raw_length": self.raw_length,
+            "codec": self.codec,
+        }
+        self.writer._open = None
+
+    def __enter__(self) -> "_Section":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+
+
+class SnapshotWriter:
+    """快照写入器: 先写到临时文件,完成后原子替换目标文件"""
+
+    def __init__(self, path: Path, codec: str = "auto"):
+        self.path = Path(path)
+        self.codec = resolve_codec(codec)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp = self.path.with_name(self.path.name + ".tmp")
+        self._f: BinaryIO = open(self._tmp, "wb")
+        self._f.write(MAGIC)
+        self._sections: Dict[str, dict] = {}
+        self._open: Optional[_Section] = None
+
+    def section(self, name: str, compress: bool = True) -> _Section:
+        """打开一个段;不压缩的段起始偏移按ALIGN对齐,便于内存映射"""
+        if name in self._sections:
+            raise ValueError(f"Duplicate snapshot section: {name}")
+        if self._open is not None:
+            raise ValueError(f"Snapshot section {self._open.name} is still open")
+        if not compress:
+            pad = -self._f.tell() % ALIGN
+            self._f.write(b"\0" * pad)
+        return _Section(self, name, self.codec if compress else "none")
+
+    def write_bytes(self, name: str, data: bytes) -> None:
+        with self.section(name) as section:
+            section.write(data)
+
+    def write_file(self, name: str, path: Path) -> None:
+        with self.section(name) as section, open(path, "rb") as f:
+            while True:
+                chunk = f.read(_READ_CHUNK)
+                if not chunk:
+                    break
+                section.write(chunk)
+
+    def finish(self, meta: dict) -> None:
+        directory = {"format": FORMAT_VERSION, "meta": meta, "sections": self._sections}
+        payload = json.dumps(directory, ensure_ascii=False).encode("utf-8")
+        self._f.write(payload)
+        self._f.write(_FOOTER.pack(len(payload)))
+        self._f.write(MAGIC)
+        self._f.close()
+        self._tmp.replace(self.path)
+
+    def abort(self) -> None:
+        self._f.close()
+        self._tmp.unlink(missing_ok=True)
+
+    def __enter__(self) -> "SnapshotWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.abort()
+
+
+def _loads(name: str, data: bytes) -> Any:
+    try:
+        return json.loads(data.decode("utf-8"))
+    except (UnicodeDecodeError, json.JSONDecodeError) as e:
+        raise SnapshotError(f"快照段内容损坏: {name}: {e}") from e
+
+
+class SnapshotReader:
+    """快照读取器(只读取目录,各段按需读取;用完需close,或用with)"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        try:
+            size = self.path.stat().st_size
+            with open(self.path, "rb") as f:
+                head = f.read(len(MAGIC))
+                tail_size = _FOOTER.size + len(MAGIC)
+                if head != MAGIC or size < len(MAGIC) + tail_size:
+                    raise SnapshotError("不是知识库快照文件")
+                f.seek(size - tail_size)
+                tail = f.read(tail_size)
+                if tail[_FOOTER.size :] != MAGIC:
+                    raise SnapshotError("快照文件不完整")
+                (length,) = _FOOTER.unpack(tail[: _FOOTER.size])
+                if length > size - len(MAGIC) - tail_size:
+                    raise SnapshotError("快照目录损坏")
+                f.seek(size - tail_size - length)
+                directory = json.loads(f.read(length).decode("utf-8"))
+        except OSError as e:
+            raise SnapshotError(f"无法读取快照: {e}") from e
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise SnapshotError(f"快照目录损坏: {e}") from e
+        if directory.get("format") != FORMAT_VERSION:
+            raise SnapshotError(f"不支持的快照格式版本: {directory.get('format')}")
+        self.meta: dict = directory.get("meta", {})
+        self.sections: Dict[str, dict] = directory.get("sections", {})
+        self._f: BinaryIO = open(self.path, "rb")
+
+    def close(self) -> None:
+        self._f.close()
+
+    def __enter__(self) -> "SnapshotReader":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def _entry(self, name: str) -> dict:
+        entry = self.sections.get(name)
+        if entry is None:
+            raise SnapshotError(f"快照缺少段: {name}")
+        return entry
+
+    def has(self, name: str) -> bool:
+        return name in self.sections
+
+    def iter_chunks(self, name: str) -> Iterator[bytes]:
+        """流式读取并解压一个段"""
+        entry = self._entry(name)
+        decompressor = _decompressor(entry["codec"])
+        errors = _decompress_errors()
+        offset = entry["offset"]
+        remaining = entry["length"]
+        produced = 0
+        while remaining > 0:
+            # 多个段可交替读取,每次读取前重新定位
+            self._f.seek(offset)
+            chunk = self._f.read(min(_READ_CHUNK, remaining))
+            if not chunk:
+                break
+            offset += len(chunk)
+            remaining -= len(chunk)
+            try:
+                data = decompressor.decompress(chunk) if decompressor is not None else chunk
+            except errors as e:
+                raise SnapshotError(f"快照段解压失败: {name}: {e}") from e
+            produced += len(data)
+            if data:
+                yield data
+        if remaining or produced != entry["raw_length"]:
+            raise SnapshotError(f"快照段长度不符: {name}")
+
+    def read_bytes(self, name: str) -> bytes:
+        return b"".join(self.iter_chunks(name))
+
+    def verify(self, name: str) -> None:
+        """完整读取一个段,校验长度与压缩数据"""
+        for _ in self.iter_chunks(name):
+            pass
+
+    def read_json(self, name: str) -> Any:
+        return _loads(name, self.read_bytes(name))
+
+    def iter_json_lines(self, name: str) -> Iterator[Any]:
+        pending = b""
+        for chunk in self.iter_chunks(name):
+            pending += chunk
+            lines = pending.split(b"\n")
+            pending = lines.pop()
+            for line in lines:
+                if line:
+                    yield _loads(name, line)
+        if pending.strip():
+            yield _loads(name, pending)
+
+    def extract(self, name: str, path: Path) -> None:
+        """把段解压到文件(如SQLite旁路库)"""
+        with open(path, "wb") as f:
+            for chunk in self.iter_chunks(name):
+                f.write(chunk)
+
+    def vectors(self, name: str, dimension: int) -> Optional[np.memmap]:
+        """向量段的只读内存映射 (rows, dimension)"""
+        entry = self._entry(name)
+        if entry["codec"] != "none":
+            raise SnapshotError(f"向量段不应压缩: {name}")
+        itemsize = np.dtype(VECTOR_DTYPE).itemsize
+        if not entry["length"]:
+            return None
+        if dimension <= 0 or entry["length"] % (dimension * itemsize):
+            raise SnapshotError(f"向量段长度与维度不符: {name}")
+        rows = entry["length"] // (dimension * itemsize)
+        return np.memmap(
+            self.path, dtype=VECTOR_DTYPE, mode="r", offset=entry["offset"], shape=(rows, dimension)
+        )
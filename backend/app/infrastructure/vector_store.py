@@ -1,22 +1,117 @@
 """Chroma向量存储管理器"""
 import asyncio
-import chromadb
-from chromadb.config import Settings
+import fnmatch
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional, Dict
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
 
-from app.core.embedding import EmbeddingFactory, BaseEmbedding
-from app.core.rag.retriever import ParentDocumentRetriever
+import numpy as np
+
+from app.core.embedding import EmbeddingFactory, BaseEmbedding, CachedEmbedding
+from app.core.rag.lexical import BM25Index
+from app.core.rag.retriever import ParentDocumentRetriever, PreparedChunks, compute_doc_id
+from app.core.rag import chunker as chunker_module
 from app.core.rag.chunker import TextChunker, CodeChunker
 from app.schemas.models import RetrievedDoc
 from app.infrastructure.config import settings
 from app.infrastructure.logger import get_logger
+from app.infrastructure.async_store import get_store_executor
+from app.infrastructure.doc_index import DocumentIndex
+from app.infrastructure.flat_index import FlatVectorCollection
+from app.infrastructure.parent_store import SqliteParentStore
+from app.infrastructure.knowledge_manifest import KnowledgeManifest, file_sha256
+from app.infrastructure.snapshot import VECTOR_DTYPE, SnapshotError, SnapshotReader, SnapshotWriter
+
+if TYPE_CHECKING:
+    import chromadb
 
 logger = get_logger("tc_agent.vector_store")
 
+PRESET_DIR = Path(__file__).parent.parent.parent / "knowledge"
+
+# 预置知识来源: (相对目录, 集合, 文件模式, scope)
+PRESET_SOURCES = [
+    ("ask/docs", "text", ["*.md", "*.txt"], "ask"),
+    ("ask/code", "code", ["*.c", "*.h", "*.py"], "ask"),
+    ("plan/docs", "text", ["*.md", "*.txt"], "plan"),
+    ("plan/code", "code", ["*.c", "*.h", "*.py"], "plan"),
+]
+
+
+def preset_source_for(path: Path) -> Optional[Tuple[str, str, List[str], str]]:
+    """预置知识文件所属的来源 (相对目录, 集合, 文件模式, scope),不属于任何来源时返回None"""
+    path = Path(path).resolve()
+    for source in PRESET_SOURCES:
+        directory = (PRESET_DIR / source[0]).resolve()
+        if directory in path.parents and any(fnmatch.fnmatch(path.name, p) for p in source[2]):
+            return source
+    return None
+
+
+# 快照导出时每页读取的child数
+SNAPSHOT_PAGE_SIZE = 1000
+
+# 命名空间(工作区/租户)名称: 可作为目录名,workspace_id(uuid)可直接使用
+NAMESPACE_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+
+
+def validate_namespace(namespace: str) -> str:
+    if not isinstance(namespace, str) or not NAMESPACE_PATTERN.match(namespace):
+        raise ValueError(f"Invalid knowledge namespace: {namespace!r}")
+    return namespace
+
+
+# 加载进度回调: (相对目录, 已扫描文件数, 已可检索文件数)
+PresetProgress = Callable[[str, int, int], None]
+
+
+@dataclass
+class _LoadedFile:
+    """加载流水线中单个文件的读取/切分结果"""
+
+    file_path: Path
+    sha256: str
+    doc_id: Optional[str] = None  # 空文件为None
+    prepared: Optional[PreparedChunks] = None  # 需要embedding的chunks
+    content_unchanged: bool = False  # 与清单记录的sha256相同
+    key: Optional[str] = None
+    entry: Optional[dict] = None
+    stat: Optional[os.stat_result] = None
+
+
+@dataclass
+class KnowledgeNamespace:
+    """命名空间的私有知识: 独立的集合与旁路索引"""
+
+    name: str
+    retrievers: Dict[str, ParentDocumentRetriever]
+    stores: list  # 需要关闭的旁路库
+    last_used: float
+    active: int = 0  # 正在检索/写入的请求数,大于0时不会被淘汰
+
 
 class VectorStoreManager:
-    """Chroma向量存储管理器"""
+    """向量存储管理器
+
+    后端由 settings.vector_store_backend 选择:
+    - chroma: Chroma PersistentClient(HNSW近似检索)
+    - flat: FlatVectorCollection(内存映射矩阵上的精确top-k,启动快、无额外进程开销)
+
+    除全局集合外,每个命名空间(工作区/租户)有自己的一组小集合:
+    首次使用时打开,按LRU与空闲时间关闭,检索时与全局集合合并。
+    """
 
     COLLECTIONS = {
         "text": "tc_agent_text_knowledge",
@@ -24,82 +119,332 @@ class VectorStoreManager:
     }
 
     def __init__(self):
-        self.client: Optional[chromadb.Client] = None
+        self.backend = settings.vector_store_backend
+        self.client: Optional["chromadb.ClientAPI"] = None
         self.embedding: Optional[BaseEmbedding] = None
         self.retrievers: Dict[str, ParentDocumentRetriever] = {}
-        self._parent_stores: Dict[str, dict] = {"text": {}, "code": {}}
+        self._parent_stores: Dict[str, SqliteParentStore] = {}
+        self._doc_indexes: Dict[str, DocumentIndex] = {}
+        self._lexical_indexes: Dict[str, BM25Index] = {}
+        self._preset_lock = asyncio.Lock()
+        self._namespaces: "OrderedDict[str, KnowledgeNamespace]" = OrderedDict()
+        self._namespace_lock = asyncio.Lock()
+        self._namespace_reaper: Optional[asyncio.Task] = None
+        self.namespace_evictions = 0
+        # 命名空间写入计数(不随索引淘汰/重新打开重置),用于回答缓存等按知识版本失效的场景
+        self._namespace_versions: Dict[str, int] = {}
+        self.executor = get_store_executor()
         self._initialized = False
 
+    @staticmethod
+    def _collection_dir(key: str) -> Path:
+        """集合旁路数据(parent store等)所在目录"""
+        path = settings.data_dir / "rag" / key
+        path.mkdir(parents=True, exist_ok=True)
+        return path
+
     async def initialize(self) -> None:
         """初始化向量存储"""
         if self._initialized:
             return
 
-        # 初始化Chroma客户端(持久化存储)
-        db_path = settings.data_dir / "chroma_db"
-        db_path.mkdir(parents=True, exist_ok=True)
+        self.backend = settings.vector_store_backend
+        if self.backend not in ("chroma", "flat"):
+            raise ValueError(f"Unknown vector store backend: {self.backend}")
 
-        self.client = chromadb.PersistentClient(
-            path=str(db_path),
-            settings=Settings(anonymized_telemetry=False, allow_reset=True),
-        )
+        if self.backend == "chroma":
+            # chromadb导入较慢,只在使用chroma后端时加载
+            import chromadb
+            from chromadb.config import Settings
+
+            # 初始化Chroma客户端(持久化存储)
+            db_path = settings.data_dir / "chroma_db"
+            db_path.mkdir(parents=True, exist_ok=True)
 
-        # 初始化Embedding
+            self.client = await self.executor.write(
+                chromadb.PersistentClient,
+                path=str(db_path),
+                settings=Settings(anonymized_telemetry=False, allow_reset=True),
+            )
+
+        # 初始化Embedding(默认套一层查询缓存,重复查询与多集合检索不再重复计算)
         self.embedding = EmbeddingFactory.create_from_config()
+        if settings.embedding_query_cache_size > 0:
+            self.embedding = CachedEmbedding(
+                self.embedding,
+                max_entries=settings.embedding_query_cache_size,
+                max_bytes=settings.embedding_query_cache_max_bytes,
+                ttl_seconds=settings.embedding_query_cache_ttl,
+            )
 
         # 创建或获取collections并创建retrievers
         for key, name in self.COLLECTIONS.items():
-            collection = self.client.get_or_create_collection(
-                name=name, metadata={"hnsw:space": "cosine"}
-            )
+            collection = await self._open_collection(key, name)
+
+            # parent持久化在collection旁,重启后无需重新embedding
+            if key not in self._parent_stores:
+                self._parent_stores[key] = SqliteParentStore(
+                    self._collection_dir(key) / "parents.sqlite",
+                    cache_size=settings.rag_parent_cache_size,
+                )
+            if key not in self._doc_indexes:
+                self._doc_indexes[key] = DocumentIndex(
+                    self._collection_dir(key) / "doc_index.sqlite"
+                )
+            if settings.rag_hybrid_search and key not in self._lexical_indexes:
+                self._lexical_indexes[key] = BM25Index(
+                    self._collection_dir(key) / "bm25.sqlite",
+                    k1=settings.rag_bm25_k1,
+                    b=settings.rag_bm25_b,
+                )
 
             # 为每个collection创建retriever
-            chunker = CodeChunker() if key == "code" else TextChunker()
-            self.retrievers[key] = ParentDocumentRetriever(
-                collection=collection,
-                embedding=self.embedding,
-                chunker=chunker,
-                parent_store=self._parent_stores[key],
-                child_chunk_size=settings.rag_child_chunk_size,
-                parent_chunk_size=settings.rag_parent_chunk_size,
+            self.retrievers[key] = self._new_retriever(
+                key,
+                collection,
+                self._parent_stores[key],
+                self._doc_indexes[key],
+                self._lexical_indexes.get(key),
             )
 
         self._initialized = True
-        logger.info("向量存储初始化完成", db_path=str(db_path))
+        logger.info("向量存储初始化完成", backend=self.backend, data_dir=str(settings.data_dir))
 
-    async def load_preset_knowledge(self) -> None:
-        """加载预置知识库"""
-        preset_dir = Path(__file__).parent.parent.parent / "knowledge"
+    def _new_retriever(
+        self,
+        key: str,
+        collection,
+        parent_store: SqliteParentStore,
+        doc_index: DocumentIndex,
+        lexical_index: Optional[BM25Index],
+    ) -> ParentDocumentRetriever:
+        chunker = CodeChunker() if key == "code" else TextChunker()
+        return ParentDocumentRetriever(
+            collection=collection,
+            embedding=self.embedding,
+            chunker=chunker,
+            parent_store=parent_store,
+            child_chunk_size=settings.rag_child_chunk_size,
+            parent_chunk_size=settings.rag_parent_chunk_size,
+            embed_batch_size=settings.rag_embed_batch_size,
+            embed_batch_max_chars=settings.rag_embed_batch_max_chars,
+            write_batch_size=self._write_batch_size(),
+            executor=self.executor,
+            doc_index=doc_index,
+            lexical_index=lexical_index,
+            rrf_k=settings.rag_rrf_k,
+            dedup_max_distance=(
+                settings.rag_dedup_max_distance if settings.rag_dedup_max_distance >= 0 else None
+            ),
+            result_cache_size=settings.rag_result_cache_size,
+            result_cache_ttl=settings.rag_result_cache_ttl,
+        )
 
-        # Ask 知识
-        ask_docs = preset_dir / "ask" / "docs"
-        if ask_docs.exists():
-            count = await self._load_directory(
-                ask_docs, "text", ["*.md", "*.txt"], {"scope": "ask"}
+    async def _open_collection(self, key: str, name: str, directory: Optional[Path] = None):
+        if self.backend == "flat":
+            return await self.executor.write(
+                FlatVectorCollection,
+                (directory or self._collection_dir(key)) / "flat",
+                name=name,
+                dtype=settings.vector_store_flat_dtype,
+                pq_subspaces=settings.vector_store_flat_pq_subspaces,
+                rerank=settings.vector_store_flat_pq_rerank,
             )
-            logger.info("预置文本知识加载完成(ask)", count=count)
+        return await self.executor.write(
+            self.client.get_or_create_collection,
+            name=name,
+            metadata={"hnsw:space": "cosine"},
+        )
 
-        ask_code = preset_dir / "ask" / "code"
-        if ask_code.exists():
-            count = await self._load_directory(
-                ask_code, "code", ["*.c", "*.h", "*.py"], {"scope": "ask"}
-            )
-            logger.info("预置代码知识加载完成(ask)", count=count)
+    def _write_batch_size(self) -> int:
+        if self.client is None:
+            return settings.rag_write_batch_size
+        return min(settings.rag_write_batch_size, self.client.get_max_batch_size())
 
-        # Plan 知识
-        plan_docs = preset_dir / "plan" / "docs"
-        if plan_docs.exists():
-            count = await self._load_directory(
-                plan_docs, "text", ["*.md", "*.txt"], {"scope": "plan"}
-            )
-            logger.info("预置文本知识加载完成(plan)", count=count)
+    def _manifest_fingerprint(self) -> dict:
+        """影响向量内容的参数,任一变化都需要重建预置知识"""
+        return {
+            "embedding_model": self.embedding.model_id if self.embedding else "",
+            "chunker": chunker_module.CHUNKER_VERSION,
+            "child_chunk_size": settings.rag_child_chunk_size,
+            "parent_chunk_size": settings.rag_parent_chunk_size,
+            # 开启混合检索后需要重建,让预置知识进入BM25索引
+            "hybrid_search": settings.rag_hybrid_search,
+            "dedup_max_distance": settings.rag_dedup_max_distance,
+        }
+
+    def _open_manifest(self) -> KnowledgeManifest:
+        return KnowledgeManifest.load(
+            settings.data_dir / "knowledge_manifest.json",
+            PRESET_DIR,
+            self._manifest_fingerprint(),
+        )
+
+    async def load_preset_knowledge(self, progress: Optional[PresetProgress] = None) -> None:
+        """增量加载预置知识库(按清单跳过未变化文件,清理已删除文件)
+
+        Args:
+            progress: 可选进度回调,每扫描/写入一个文件调用一次
+        """
+        async with self._preset_lock:
+            manifest = self._open_manifest()
+
+            if manifest.stale:
+                # embedding模型或切分参数变化,集合中的旧向量全部失效
+                logger.warning("知识库清单失效,重建全部集合", fingerprint=manifest.fingerprint)
+                for key in self.COLLECTIONS:
+                    await self.delete_collection(key)
+                manifest.reset()
+            else:
+                # 集合被外部清空(如删除了chroma_db)时,对应清单条目作废
+                stats = await self.get_stats()
+                for key in self.COLLECTIONS:
+                    if stats[key].get("count", 0) == 0:
+                        manifest.drop_collection(key)
+
+            try:
+                for rel_dir, collection, patterns, scope in PRESET_SOURCES:
+                    directory = PRESET_DIR / rel_dir
+                    if not directory.exists():
+                        continue
+                    on_progress = (
+                        (lambda scanned, indexed, rel_dir=rel_dir: progress(rel_dir, scanned, indexed))
+                        if progress
+                        else None
+                    )
+                    count = await self._load_directory(
+                        directory,
+                        collection,
+                        patterns,
+                        {"scope": scope},
+                        manifest=manifest,
+                        on_progress=on_progress,
+                    )
+                    logger.info(
+                        "预置知识加载完成", dir=rel_dir, collection=collection, indexed=count
+                    )
+
+                # 清理已删除的文件
+                removed = 0
+                for key in manifest.unseen_keys():
+                    entry = manifest.remove(key)
+                    if entry and entry.get("doc_id"):
+                        await self._delete_manifest_doc(manifest, key, entry)
+                    removed += 1
+                if removed:
+                    logger.info("已清理删除的预置文件", count=removed)
+            finally:
+                manifest.save()
 
-        plan_code = preset_dir / "plan" / "code"
-        if plan_code.exists():
-            count = await self._load_directory(
-                plan_code, "code", ["*.c", "*.h", "*.py"], {"scope": "plan"}
+    async def sync_preset_files(self, paths: Iterable[Path]) -> dict:
+        """只同步指定的预置知识文件(文件监听触发的增量更新)
+
+        存在的文件按清单增量索引,不存在的路径(含被删除的目录)清理其下的清单条目与文档。
+        清单失效(模型/切分参数变化)时退化为全量加载。
+
+        Returns:
+            {"files": 已同步的文件路径, "indexed": 重新索引数, "removed": 删除数}
+        """
+        paths = list(dict.fromkeys(Path(p) for p in paths))
+        async with self._preset_lock:
+            manifest = self._open_manifest()
+            if not manifest.stale:
+                try:
+                    return await self._sync_files(manifest, paths)
+                finally:
+                    manifest.save()
+        logger.warning("知识库清单失效,改为全量加载")
+        await self.load_preset_knowledge()
+        return {"files": [str(p) for p in paths], "indexed": len(paths), "removed": 0, "full": True}
+
+    async def _sync_files(self, manifest: KnowledgeManifest, paths: List[Path]) -> dict:
+        sources: Dict[str, tuple] = {}
+        groups: Dict[str, List[Path]] = {}
+        deleted: List[Path] = []
+        for path in paths:
+            if not path.exists():
+                deleted.append(path)
+                continue
+            source = preset_source_for(path)
+            if source is not None and path.is_file():
+                sources[source[0]] = source
+                groups.setdefault(source[0], []).append(path)
+
+        synced: List[str] = []
+        indexed = 0
+        for rel_dir, files in groups.items():
+            _, collection, patterns, scope = sources[rel_dir]
+            indexed += await self._load_directory(
+                PRESET_DIR / rel_dir,
+                collection,
+                patterns,
+                {"scope": scope},
+                manifest=manifest,
+                files=files,
             )
-            logger.info("预置代码知识加载完成(plan)", count=count)
+            synced.extend(str(p) for p in files)
+
+        removed = 0
+        for path in deleted:
+            key = manifest.key_for(path)
+            # 删除目录时其下的文件不一定逐个产生事件,按前缀清理
+            keys = [k for k in list(manifest.entries) if k == key or k.startswith(key + "/")]
+            for k in keys:
+                entry = manifest.remove(k)
+                if entry and entry.get("doc_id"):
+                    await self._delete_manifest_doc(manifest, k, entry)
+                removed += 1
+            if keys:
+                synced.append(str(path))
+
+        if synced:
+            logger.info("预置知识增量同步完成", files=len(synced), indexed=indexed, removed=removed)
+        return {"files": synced, "indexed": indexed, "removed": removed}
+
+    async def _delete_manifest_doc(
+        self, manifest: KnowledgeManifest, key: str, entry: dict
+    ) -> None:
+        """删除清单条目对应的文档(内容仍被其他文件引用时保留)"""
+        doc_id = entry.get("doc_id")
+        if not doc_id or manifest.doc_id_in_use(doc_id, exclude=key):
+            return
+        retriever = self.retrievers.get(entry.get("collection"))
+        if retriever:
+            await retriever.delete_documents([doc_id])
+
+    @staticmethod
+    def _read_and_prepare(
+        retriever: ParentDocumentRetriever,
+        file_path: Path,
+        extra_metadata: Optional[dict],
+        known_sha256: Optional[str],
+    ) -> "_LoadedFile":
+        """读取并切分单个文件(在加载线程池中执行)"""
+        raw = file_path.read_bytes()
+        loaded = _LoadedFile(file_path=file_path, sha256=file_sha256(raw))
+        if loaded.sha256 == known_sha256:
+            # 仅mtime变化(如touch/checkout),内容相同
+            loaded.content_unchanged = True
+            return loaded
+
+        content = raw.decode("utf-8")
+        if not content.strip():
+            return loaded
+
+        loaded.doc_id = compute_doc_id(content)
+        if retriever.doc_index.contains(loaded.doc_id):
+            # 相同内容已入库(如文件改名/复制),无需重新embedding
+            return loaded
+
+        metadata = {
+            "source": str(file_path),
+            "filename": file_path.name,
+            "type": file_path.suffix,
+        }
+        if extra_metadata:
+            metadata.update(extra_metadata)
+        loaded.prepared = retriever.prepare_documents([content], [metadata])
+        return loaded
 
     async def _load_directory(
         self,
@@ -107,100 +452,779 @@ class VectorStoreManager:
         collection: str,
         patterns: List[str],
         extra_metadata: Optional[dict] = None,
+        manifest: Optional[KnowledgeManifest] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        files: Optional[List[Path]] = None,
     ) -> int:
-        """加载目录下的文件"""
+        """加载目录下的文件,返回实际(重新)索引的文件数
+
+        三段流水线:
+        1. 线程池并发读取、哈希、切分文件,结果进入有界队列
+        2. embedding阶段把多个文件的chunks攒成大批次统一embedding
+        3. 写入阶段写collection/parent store,成功后才更新清单
+        chunk id只由内容决定,与文件处理顺序无关。
+        提供manifest时按size/mtime/sha256跳过未变化文件;
+        变化的文件先写入新内容再删除旧文档,检索不会出现空窗。
+        on_progress(已扫描文件数, 已可检索文件数) 在扫描/写入每个文件后调用。
+        指定files时只处理这些文件(增量同步),否则处理目录下全部匹配的文件。
+        """
+        retriever = self.retrievers.get(collection)
+        if not retriever:
+            raise ValueError(f"Unknown collection: {collection}")
+
+        workers = max(1, settings.rag_load_workers)
+        batch_chunks = max(1, settings.rag_load_batch_chunks)
+        loaded_queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, settings.rag_load_queue_size))
+        write_queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+        loop = asyncio.get_running_loop()
         count = 0
-        for pattern in patterns:
-            for file_path in directory.rglob(pattern):
+        scanned = committed = 0
+
+        def report() -> None:
+            if on_progress is not None:
+                on_progress(scanned, committed)
+
+        async def produce(pool: ThreadPoolExecutor) -> None:
+            in_flight = asyncio.Semaphore(workers * 2)
+            tasks = []
+
+            async def load_one(file_path: Path, key, entry, stat) -> None:
                 try:
-                    content = file_path.read_text(encoding="utf-8")
-                    if content.strip():
-                        metadata = {
-                            "source": str(file_path),
-                            "filename": file_path.name,
-                            "type": file_path.suffix,
-                        }
-                        if extra_metadata:
-                            metadata.update(extra_metadata)
-                        await self.add_documents(
-                            collection=collection,
-                            documents=[content],
-                            metadatas=[metadata],
-                        )
-                        count += 1
+                    known = (
+                        entry.get("sha256")
+                        if entry and entry.get("collection") == collection
+                        else None
+                    )
+                    loaded = await loop.run_in_executor(
+                        pool, self._read_and_prepare, retriever, file_path, extra_metadata, known
+                    )
+                    loaded.key, loaded.entry, loaded.stat = key, entry, stat
+                    await loaded_queue.put(loaded)
                 except Exception as e:
                     logger.warning("文件加载失败", file=str(file_path), error=str(e))
+                finally:
+                    in_flight.release()
+
+            candidates = files if files is not None else (
+                p for pattern in patterns for p in sorted(directory.rglob(pattern))
+            )
+            nonlocal scanned, committed
+            for file_path in dict.fromkeys(candidates):
+                scanned += 1
+                key = entry = stat = None
+                if manifest is not None:
+                    key = manifest.key_for(file_path)
+                    manifest.mark_seen(key)
+                    try:
+                        stat = file_path.stat()
+                    except OSError as e:
+                        logger.warning("文件加载失败", file=str(file_path), error=str(e))
+                        continue
+                    if manifest.is_unchanged(key, collection, stat):
+                        committed += 1  # 未变化的文件本就可检索
+                        report()
+                        continue
+                    entry = manifest.get(key)
+                report()
+                await in_flight.acquire()
+                tasks.append(asyncio.create_task(load_one(file_path, key, entry, stat)))
+            await asyncio.gather(*tasks)
+            await loaded_queue.put(None)
+
+        # 写入失败的doc_id: 这些文件不更新清单,下次加载重新处理;
+        # 同一次加载中内容相同、未单独入库的文件也不能提交
+        failed: set = set()
+
+        async def embed() -> None:
+            batch = PreparedChunks()
+            files: List[_LoadedFile] = []
+            scheduled: set = set()
+
+            async def flush() -> None:
+                nonlocal batch, files
+                if not files:
+                    return
+                try:
+                    embeddings = await retriever.embed_prepared(batch)
+                except Exception as e:
+                    logger.warning("批量embedding失败", files=len(files), error=str(e))
+                    failed.update(batch.sources)
+                else:
+                    await write_queue.put((batch, embeddings, files))
+                batch, files = PreparedChunks(), []
+
+            while True:
+                loaded = await loaded_queue.get()
+                if loaded is None:
+                    break
+                if loaded.prepared is not None:
+                    if loaded.doc_id in scheduled:
+                        loaded.prepared = None  # 同一次加载中内容重复的文件
+                    else:
+                        scheduled.add(loaded.doc_id)
+                        batch.extend(loaded.prepared)
+                files.append(loaded)
+                if len(batch.child_ids) >= batch_chunks:
+                    await flush()
+            await flush()
+            await write_queue.put(None)
+
+        async def write() -> None:
+            nonlocal count, committed
+            while True:
+                item = await write_queue.get()
+                if item is None:
+                    break
+                batch, embeddings, files = item
+                try:
+                    # 失败时write_prepared回滚该批次(含doc_index登记),文件下次加载会重新embedding
+                    await retriever.write_prepared(batch, embeddings)
+                except Exception as e:
+                    logger.warning("批量写入失败", files=len(files), error=str(e))
+                    failed.update(batch.sources)
+                    continue
+                for loaded in files:
+                    if loaded.doc_id in failed:
+                        continue
+                    if not loaded.content_unchanged and loaded.doc_id:
+                        count += 1
+                    await self._commit_loaded(manifest, collection, loaded)
+                    committed += 1
+                report()
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="kb-load") as pool:
+            await asyncio.gather(produce(pool), embed(), write())
         return count
 
-    def get_retriever(self, collection_type: str = "all") -> ParentDocumentRetriever:
-        """获取检索器"""
+    async def _commit_loaded(
+        self, manifest: Optional[KnowledgeManifest], collection: str, loaded: "_LoadedFile"
+    ) -> None:
+        """文件内容已可检索后更新清单,并删除被替换的旧文档"""
+        if manifest is None:
+            return
+        entry = loaded.entry
+        if loaded.content_unchanged:
+            manifest.set(loaded.key, collection, loaded.stat, loaded.sha256, entry.get("doc_id"))
+            return
+        if entry and entry.get("doc_id") != loaded.doc_id:
+            await self._delete_manifest_doc(manifest, loaded.key, entry)
+        manifest.set(loaded.key, collection, loaded.stat, loaded.sha256, loaded.doc_id)
+
+    @property
+    def version(self) -> tuple:
+        """知识库整体版本(各集合版本号),任一集合增删/重置后变化"""
+        return tuple(sorted((key, r.version) for key, r in self.retrievers.items()))
+
+    def namespace_version(self, namespace: str) -> int:
+        """命名空间私有知识的版本,该命名空间增删文档或被删除后变化"""
+        return self._namespace_versions.get(namespace, 0)
+
+    def _bump_namespace(self, namespace: str) -> None:
+        self._namespace_versions[namespace] = self._namespace_versions.get(namespace, 0) + 1
+
+    def get_retriever(
+        self, collection_type: str = "all", namespace: Optional[str] = None
+    ) -> ParentDocumentRetriever:
+        """获取检索器;指定namespace时检索全局知识 + 该命名空间的私有知识"""
+        if namespace:
+            return NamespaceRetriever(self, validate_namespace(namespace), collection_type)
         if collection_type == "all":
-            return MultiCollectionRetriever(list(self.retrievers.values()))
+            return MultiCollectionRetriever(
+                list(self.retrievers.values()), timeout=settings.rag_collection_timeout
+            )
         return self.retrievers.get(collection_type, self.retrievers.get("text"))
 
     async def add_documents(
-        self, collection: str, documents: List[str], metadatas: List[dict]
+        self,
+        collection: str,
+        documents: List[str],
+        metadatas: List[dict],
+        namespace: Optional[str] = None,
     ) -> None:
-        """添加文档到知识库"""
-        retriever = self.retrievers.get(collection)
-        if not retriever:
+        """添加文档到知识库(指定namespace时写入该命名空间)"""
+        if collection not in self.COLLECTIONS:
             raise ValueError(f"Unknown collection: {collection}")
+        if namespace:
+            metadatas = [{**(m or {}), "namespace": namespace} for m in metadatas]
+            try:
+                async with self.namespace(namespace) as space:
+                    await space.retrievers[collection].add_documents(documents, metadatas)
+            finally:
+                self._bump_namespace(namespace)
+        else:
+            await self.retrievers[collection].add_documents(documents, metadatas)
+        logger.info("文档已添加", collection=collection, namespace=namespace, count=len(documents))
 
-        await retriever.add_documents(documents, metadatas)
-        logger.info("文档已添加", collection=collection, count=len(documents))
+    async def delete_document(
+        self, doc_id: str, collection: Optional[str] = None, namespace: Optional[str] = None
+    ) -> List[str]:
+        """按doc_id删除文档,返回实际删除所在的集合"""
+        keys = [collection] if collection else list(self.COLLECTIONS)
+        if any(key not in self.COLLECTIONS for key in keys):
+            raise ValueError(f"Unknown collection: {collection}")
+        if namespace:
+            if not self.has_namespace(namespace):
+                return []
+            try:
+                async with self.namespace(namespace) as space:
+                    deleted = await self._delete_from(space.retrievers, keys, doc_id)
+            finally:
+                self._bump_namespace(namespace)
+        else:
+            deleted = await self._delete_from(self.retrievers, keys, doc_id)
+        if deleted:
+            logger.info("文档已删除", doc_id=doc_id, namespace=namespace, collections=deleted)
+        return deleted
+
+    @staticmethod
+    async def _delete_from(
+        retrievers: Dict[str, ParentDocumentRetriever], keys: List[str], doc_id: str
+    ) -> List[str]:
+        deleted = []
+        for key in keys:
+            retriever = retrievers[key]
+            if await retriever.has_document(doc_id):
+                await retriever.delete_documents([doc_id])
+                deleted.append(key)
+        return deleted
 
     async def get_stats(self) -> dict:
         """获取知识库统计信息"""
         stats = {}
         for key, name in self.COLLECTIONS.items():
             try:
-                collection = self.client.get_collection(name)
-                stats[key] = {"name": name, "count": collection.count()}
+                retriever = self.retrievers[key]
+                count = await retriever.collection.count()
+                stats[key] = {
+                    "name": name,
+                    "count": count,
+                    "backend": self.backend,
+                    "dedup": dict(retriever.dedup_stats),
+                    "result_cache": retriever.cache_stats(),
+                }
+                raw = retriever.collection.raw
+                if isinstance(raw, FlatVectorCollection):
+                    # 向量精度与PQ压缩情况
+                    stats[key]["vectors"] = await self.executor.read(raw.stats)
             except Exception:
-                stats[key] = {"name": name, "count": 0}
+                stats[key] = {"name": name, "count": 0, "backend": self.backend}
+        if self.embedding is not None:
+            stats["embedding"] = self.embedding.metrics()
+        stats["namespaces"] = {
+            "open": self.open_namespaces,
+            "max_open": settings.knowledge_namespace_max_open,
+            "idle_seconds": settings.knowledge_namespace_idle_seconds,
+            "evictions": self.namespace_evictions,
+        }
         return stats
 
     async def delete_collection(self, collection: str) -> None:
         """删除并重建集合"""
         name = self.COLLECTIONS.get(collection)
         if name:
-            try:
-                self.client.delete_collection(name)
-            except Exception:
-                pass
-            # 重新创建空集合
-            self.client.get_or_create_collection(name)
-            # 清空parent store
-            self._parent_stores[collection] = {}
+            retriever = self.retrievers.get(collection)
+            if self.backend == "flat":
+                if retriever:
+                    await self.executor.write(retriever.collection.raw.reset)
+            else:
+                try:
+                    await self.executor.write(self.client.delete_collection, name)
+                except Exception:
+                    pass
+                # 重新创建空集合,并让retriever指向新集合
+                new_collection = await self._open_collection(collection, name)
+                if retriever:
+                    retriever.collection = new_collection
+            # 清空parent store(原地清空,retriever持有同一实例)
+            store = self._parent_stores.get(collection)
+            if store is not None:
+                await self.executor.write(store.clear)
+            doc_index = self._doc_indexes.get(collection)
+            if doc_index is not None:
+                await self.executor.write(doc_index.clear)
+            lexical_index = self._lexical_indexes.get(collection)
+            if lexical_index is not None:
+                await self.executor.write(lexical_index.clear)
+            if retriever:
+                retriever.invalidate()
+            # 预置知识清单中该集合的条目随之作废,下次加载时重新索引
+            manifest = self._open_manifest()
+            if not manifest.stale and manifest.drop_collection(collection):
+                manifest.save()
             logger.info("集合已重置", collection=collection)
 
+    # ------------------------------------------------------------------ 命名空间
+
+    @staticmethod
+    def _namespace_dir(namespace: str) -> Path:
+        return settings.data_dir / "rag" / "namespaces" / namespace
+
+    def _namespace_collection_name(self, namespace: str, key: str) -> str:
+        """Chroma集合名(长度与字符集受限,用命名空间的哈希)"""
+        digest = hashlib.sha1(namespace.encode("utf-8")).hexdigest()[:16]
+        return f"{self.COLLECTIONS[key]}_ns_{digest}"
+
+    def has_namespace(self, namespace: str) -> bool:
+        """命名空间是否有私有知识(没有时检索不会打开任何索引)"""
+        namespace = validate_namespace(namespace)
+        return namespace in self._namespaces or self._namespace_dir(namespace).exists()
+
+    @property
+    def open_namespaces(self) -> List[str]:
+        """当前打开的命名空间(最久未用在前)"""
+        return list(self._namespaces)
+
+    def list_namespaces(self) -> List[str]:
+        root = settings.data_dir / "rag" / "namespaces"
+        if not root.exists():
+            return []
+        return sorted(p.name for p in root.iterdir() if p.is_dir())
+
+    async def _open_namespace(self, namespace: str) -> KnowledgeNamespace:
+        root = self._namespace_dir(namespace)
+        retrievers: Dict[str, ParentDocumentRetriever] = {}
+        stores: list = []
+        try:
+            for key in self.COLLECTIONS:
+                directory = root / key
+                directory.mkdir(parents=True, exist_ok=True)
+                collection = await self._open_collection(
+                    key, self._namespace_collection_name(namespace, key), directory
+                )
+                if isinstance(collection, FlatVectorCollection):
+                    stores.append(collection)
+                parent_store = await self.executor.write(
+                    SqliteParentStore,
+                    directory / "parents.sqlite",
+                    cache_size=settings.rag_parent_cache_size,
+                )
+                doc_index = await self.executor.write(DocumentIndex, directory / "doc_index.sqlite")
+                lexical_index = None
+                if settings.rag_hybrid_search:
+                    lexical_index = await self.executor.write(
+                        BM25Index,
+                        directory / "bm25.sqlite",
+                        k1=settings.rag_bm25_k1,
+                        b=settings.rag_bm25_b,
+                    )
+                stores.extend(s for s in (parent_store, doc_index, lexical_index) if s is not None)
+                retrievers[key] = self._new_retriever(
+                    key, collection, parent_store, doc_index, lexical_index
+                )
+        except Exception:
+            await self.executor.write(_close_all, stores)
+            raise
+        return KnowledgeNamespace(namespace, retrievers, stores, last_used=time.monotonic())
+
+    async def _close_namespace(self, space: KnowledgeNamespace) -> None:
+        # 走写通道: 排在已提交的写入之后关闭
+        await self.executor.write(_close_all, space.stores)
+
+    async def _evict_namespaces_locked(self, idle_seconds: float = 0) -> List[str]:
+        """关闭超出max_open的最久未用命名空间,以及空闲超过idle_seconds的命名空间"""
+        now = time.monotonic()
+        evicted = []
+        for name, space in list(self._namespaces.items()):
+            if space.active:
+                continue
+            over = len(self._namespaces) > max(1, settings.knowledge_namespace_max_open)
+            idle = idle_seconds > 0 and now - space.last_used >= idle_seconds
+            if not (over or idle):
+                continue
+            del self._namespaces[name]
+            await self._close_namespace(space)
+            evicted.append(name)
+        if evicted:
+            self.namespace_evictions += len(evicted)
+            logger.info("命名空间索引已关闭", namespaces=evicted, open=len(self._namespaces))
+        return evicted
+
+    async def evict_idle_namespaces(self, idle_seconds: Optional[float] = None) -> List[str]:
+        """关闭空闲的命名空间索引,返回被关闭的命名空间"""
+        if idle_seconds is None:
+            idle_seconds = settings.knowledge_namespace_idle_seconds
+        async with self._namespace_lock:
+            return await self._evict_namespaces_locked(idle_seconds)
+
+    async def _reap_namespaces(self) -> None:
+        idle_seconds = settings.knowledge_namespace_idle_seconds
+        while self._namespaces:
+            await asyncio.sleep(max(1.0, idle_seconds / 4))
+            await self.evict_idle_namespaces(idle_seconds)
+
+    @asynccontextmanager
+    async def namespace(self, namespace: str) -> AsyncIterator[KnowledgeNamespace]:
+        """使用命名空间的索引(按需打开,使用期间不会被淘汰)"""
+        namespace = validate_namespace(namespace)
+        async with self._namespace_lock:
+            space = self._namespaces.get(namespace)
+            if space is None:
+                space = await self._open_namespace(namespace)
+                self._namespaces[namespace] = space
+                logger.info("命名空间索引已打开", namespace=namespace, open=len(self._namespaces))
+            self._namespaces.move_to_end(namespace)
+            space.active += 1
+            await self._evict_namespaces_locked()
+        if settings.knowledge_namespace_idle_seconds > 0 and (
+            self._namespace_reaper is None or self._namespace_reaper.done()
+        ):
+            self._namespace_reaper = asyncio.create_task(self._reap_namespaces())
+        try:
+            yield space
+        finally:
+            space.active -= 1
+            space.last_used = time.monotonic()
+
+    async def namespace_stats(self, namespace: str) -> dict:
+        """命名空间各集合的文档数"""
+        stats: dict = {"namespace": namespace, "open": namespace in self._namespaces}
+        if not self.has_namespace(namespace):
+            return {**stats, **{key: {"count": 0} for key in self.COLLECTIONS}}
+        async with self.namespace(namespace) as space:
+            for key, retriever in space.retrievers.items():
+                stats[key] = {"count": await retriever.collection.count()}
+        return stats
+
+    async def delete_namespace(self, namespace: str) -> bool:
+        """删除命名空间的全部私有知识"""
+        namespace = validate_namespace(namespace)
+        async with self._namespace_lock:
+            space = self._namespaces.get(namespace)
+            if space is not None:
+                if space.active:
+                    raise RuntimeError(f"命名空间 {namespace} 正在使用")
+                del self._namespaces[namespace]
+                await self._close_namespace(space)
+            root = self._namespace_dir(namespace)
+            if not root.exists():
+                return False
+            if self.backend == "chroma":
+                for key in self.COLLECTIONS:
+                    try:
+                        await self.executor.write(
+                            self.client.delete_collection,
+                            self._namespace_collection_name(namespace, key),
+                        )
+                    except Exception:
+                        pass
+            await self.executor.write(shutil.rmtree, root, True)
+            self._bump_namespace(namespace)
+        logger.info("命名空间已删除", namespace=namespace)
+        return True
+
+    def _sidecars(self, key: str) -> Dict[str, object]:
+        """集合旁路的SQLite存储(快照中原样打包)"""
+        sidecars = {
+            "parents": self._parent_stores.get(key),
+            "doc_index": self._doc_indexes.get(key),
+            "bm25": self._lexical_indexes.get(key),
+        }
+        return {name: store for name, store in sidecars.items() if store is not None}
+
+    def _export_collection(self, writer: SnapshotWriter, key: str, workdir: Path) -> dict:
+        """同步导出一个集合(在读线程中执行)"""
+        raw = self.retrievers[key].collection.raw
+        total = raw.count()
+        count = 0
+        dimension = 0
+        # 段在文件中连续存放: 向量直接写入,记录先落到临时文件再压缩写入
+        records_path = workdir / f"{key}-records.ndjson"
+        with writer.section(f"{key}/vectors", compress=False) as vectors, open(
+            records_path, "wb"
+        ) as records:
+            for offset in range(0, total, SNAPSHOT_PAGE_SIZE):
+                page = raw.get(
+                    limit=SNAPSHOT_PAGE_SIZE,
+                    offset=offset,
+                    include=["embeddings", "documents", "metadatas"],
+                )
+                ids = page["ids"]
+                if not ids:
+                    break
+                matrix = np.asarray(page["embeddings"], dtype=VECTOR_DTYPE)
+                dimension = int(matrix.shape[1])
+                vectors.write(matrix.tobytes())
+                records.write(
+                    "".join(
+                        json.dumps([id_, doc, meta or {}], ensure_ascii=False) + "\n"
+                        for id_, doc, meta in zip(ids, page["documents"], page["metadatas"])
+                    ).encode("utf-8")
+                )
+                count += len(ids)
+        writer.write_file(f"{key}/records", records_path)
+        records_path.unlink()
+
+        sidecars = []
+        for name, store in self._sidecars(key).items():
+            path = workdir / f"{key}-{name}.sqlite"
+            store.backup(path)
+            writer.write_file(f"{key}/{name}", path)
+            path.unlink()
+            sidecars.append(name)
+        return {"count": count, "dimension": dimension, "sidecars": sidecars}
+
+    async def export_snapshot(
+        self, path: Path, collections: Optional[List[str]] = None, codec: Optional[str] = None
+    ) -> dict:
+        """把集合的向量、文本、元数据、parent store、旁路索引与清单导出为单个快照文件
+
+        导出期间持有预置知识锁;其他接口的并发写入可能只部分包含在快照中。
+        """
+        keys = list(collections or self.COLLECTIONS)
+        unknown = [key for key in keys if key not in self.retrievers]
+        if unknown:
+            raise ValueError(f"Unknown collection: {', '.join(unknown)}")
+
+        start = time.perf_counter()
+        async with self._preset_lock:
+            manifest = self._open_manifest()
+            entries = {}
+            if not manifest.stale:
+                entries = {k: e for k, e in manifest.entries.items() if e.get("collection") in keys}
+
+            def export() -> dict:
+                with SnapshotWriter(path, codec or settings.knowledge_snapshot_codec) as writer:
+                    with tempfile.TemporaryDirectory(dir=settings.data_dir) as workdir:
+                        info = {
+                            key: self._export_collection(writer, key, Path(workdir))
+                            for key in keys
+                        }
+                    writer.write_bytes(
+                        "manifest", json.dumps(entries, ensure_ascii=False).encode("utf-8")
+                    )
+                    meta = {
+                        "created_at": time.time(),
+                        "embedding_model": self.embedding.model_id,
+                        "fingerprint": self._manifest_fingerprint(),
+                        "backend": self.backend,
+                        "collections": info,
+                    }
+                    writer.finish(meta)
+                return meta
+
+            meta = await self.executor.read(export)
+
+        result = {
+            "path": str(path),
+            "bytes": Path(path).stat().st_size,
+            "collections": meta["collections"],
+            "embedding_model": meta["embedding_model"],
+            "elapsed": round(time.perf_counter() - start, 3),
+        }
+        logger.info("知识库快照已导出", **result)
+        return result
+
+    def _check_snapshot(self, reader: SnapshotReader) -> None:
+        meta = reader.meta
+        if meta.get("embedding_model") != self.embedding.model_id:
+            raise SnapshotError(
+                f"快照的embedding模型 {meta.get('embedding_model')} 与当前 {self.embedding.model_id} 不一致"
+            )
+        fingerprint = meta.get("fingerprint") or {}
+        current = self._manifest_fingerprint()
+        diff = sorted(k for k in set(fingerprint) | set(current) if fingerprint.get(k) != current.get(k))
+        if diff:
+            raise SnapshotError(f"快照的切分/索引参数与当前配置不一致: {', '.join(diff)}")
+        unknown = [key for key in meta.get("collections", {}) if key not in self.retrievers]
+        if unknown:
+            raise SnapshotError(f"快照包含未知集合: {', '.join(unknown)}")
+
+    def _import_collection(self, reader: SnapshotReader, key: str, info: dict, workdir: Path) -> int:
+        """同步导入一个集合(在写线程中执行,集合已清空)"""
+        raw = self.retrievers[key].collection.raw
+        count = int(info.get("count", 0))
+        vectors = reader.vectors(f"{key}/vectors", int(info.get("dimension", 0))) if count else None
+        if count and (vectors is None or len(vectors) != count):
+            raise SnapshotError(f"快照向量数与记录数不符: {key}")
+
+        batch_size = max(1, self._write_batch_size())
+        records = reader.iter_json_lines(f"{key}/records")
+        written = 0
+        while written < count:
+            batch = list(itertools.islice(records, batch_size))
+            if not batch:
+                break
+            ids, documents, metadatas = (list(column) for column in zip(*batch))
+            # 向量直接来自内存映射,不经过Python列表
+            raw.upsert(
+                ids=ids,
+                embeddings=np.asarray(vectors[written : written + len(ids)]),
+                documents=documents,
+                metadatas=metadatas,
+            )
+            written += len(ids)
+        if written != count:
+            raise SnapshotError(f"快照记录数不符: {key}")
+
+        for name, store in self._sidecars(key).items():
+            if not reader.has(f"{key}/{name}"):
+                raise SnapshotError(f"快照缺少 {key} 的 {name}")
+            path = workdir / f"{key}-{name}.sqlite"
+            reader.extract(f"{key}/{name}", path)
+            store.restore(path)
+            path.unlink()
+        return written
+
+    def _verify_snapshot(self, reader: SnapshotReader, collections: dict) -> dict:
+        """导入前完整校验快照(段长度、解压、向量数与记录数),返回清单条目
+
+        校验通过之前不删除任何已有集合,损坏的快照不会清空知识库。
+        """
+        for key, info in collections.items():
+            count = int(info.get("count", 0))
+            if count:
+                vectors = reader.vectors(f"{key}/vectors", int(info.get("dimension", 0)))
+                if vectors is None or len(vectors) != count:
+                    raise SnapshotError(f"快照向量数与记录数不符: {key}")
+            records = 0
+            for record in reader.iter_json_lines(f"{key}/records"):
+                if not isinstance(record, list) or len(record) != 3:
+                    raise SnapshotError(f"快照记录格式错误: {key}")
+                records += 1
+            if records != count:
+                raise SnapshotError(f"快照记录数不符: {key}")
+            for name in self._sidecars(key):
+                if not reader.has(f"{key}/{name}"):
+                    raise SnapshotError(f"快照缺少 {key} 的 {name}")
+                reader.verify(f"{key}/{name}")
+        entries = reader.read_json("manifest")
+        if not isinstance(entries, dict):
+            raise SnapshotError("快照清单格式错误")
+        return entries
+
+    async def import_snapshot(self, path: Path) -> dict:
+        """从快照文件导入集合(覆盖快照中包含的集合),无需重新embedding
+
+        embedding模型与切分/索引参数必须与当前配置一致;清单条目一并导入,
+        之后的预置知识同步只会校验文件哈希而不会重新索引。
+        """
+        start = time.perf_counter()
+        with SnapshotReader(path) as reader:
+            self._check_snapshot(reader)
+            collections = reader.meta.get("collections", {})
+
+            imported = {}
+            async with self._preset_lock:
+                entries = await self.executor.read(self._verify_snapshot, reader, collections)
+                for key, info in collections.items():
+                    await self.delete_collection(key)
+                    try:
+                        with tempfile.TemporaryDirectory(dir=settings.data_dir) as workdir:
+                            imported[key] = await self.executor.write(
+                                self._import_collection, reader, key, info, Path(workdir)
+                            )
+                    finally:
+                        self.retrievers[key].invalidate()
+
+                manifest = self._open_manifest()
+                if manifest.stale:
+                    manifest.reset()
+                for key in collections:
+                    manifest.drop_collection(key)
+                manifest.entries.update(entries)
+                manifest.save()
+
+            result = {
+                "collections": imported,
+                "manifest_entries": len(entries),
+                "embedding_model": reader.meta.get("embedding_model"),
+                "elapsed": round(time.perf_counter() - start, 3),
+            }
+        logger.info("知识库快照已导入", path=str(path), **result)
+        return result
+
     async def close(self) -> None:
         """关闭资源"""
+        if self._namespace_reaper is not None:
+            self._namespace_reaper.cancel()
+            self._namespace_reaper = None
+        for space in self._namespaces.values():
+            _close_all(space.stores)
+        self._namespaces.clear()
+        if self.embedding is not None:
+            await self.embedding.aclose()
+        for store in self._parent_stores.values():
+            store.close()
+        self._parent_stores.clear()
+        for doc_index in self._doc_indexes.values():
+            doc_index.close()
+        self._doc_indexes.clear()
+        for lexical_index in self._lexical_indexes.values():
+            lexical_index.close()
+        self._lexical_indexes.clear()
+        for retriever in self.retrievers.values():
+            raw = retriever.collection.raw
+            if isinstance(raw, FlatVectorCollection):
+                raw.close()
+        self.retrievers.clear()
         self._initialized = False
 
 
 class MultiCollectionRetriever:
-    """多集合联合检索器"""
+    """多集合联合检索器
+
+    - query embedding只计算一次,各集合并发检索
+    - 单个集合超时或失败只丢弃该集合的结果,不拖慢整体响应
+    - 按分数用堆合并top_k
+    """
 
-    def __init__(self, retrievers: List[ParentDocumentRetriever]):
+    def __init__(
+        self, retrievers: List[ParentDocumentRetriever], timeout: Optional[float] = None
+    ):
         self.retrievers = retrievers
+        self.timeout = timeout
+
+    async def _retrieve_one(
+        self,
+        retriever: ParentDocumentRetriever,
+        query: str,
+        query_embedding: Optional[List[float]],
+        model_id: str,
+        top_k: int,
+        where: Optional[dict],
+    ) -> List[RetrievedDoc]:
+        if retriever.embedding.model_id == model_id:
+            coro = retriever.retrieve_with_embedding(query, query_embedding, top_k, where)
+        else:
+            coro = retriever.retrieve(query, top_k=top_k, where=where)
+        try:
+            return await asyncio.wait_for(coro, self.timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "集合检索超时,已跳过", collection=retriever.collection.name, timeout=self.timeout
+            )
+        except Exception as e:
+            logger.warning("检索失败", collection=retriever.collection.name, error=str(e))
+        return []
 
     async def retrieve(
         self, query: str, top_k: int = 5, where: Optional[dict] = None
     ) -> List[RetrievedDoc]:
         """从所有集合检索并合并结果"""
-        all_results = []
+        if not query or not query.strip() or not self.retrievers:
+            return []
 
-        for retriever in self.retrievers:
-            try:
-                results = await retriever.retrieve(query, top_k=top_k, where=where)
-                all_results.extend(results)
-            except Exception as e:
-                logger.warning("检索失败", error=str(e))
+        # 共享的query embedding(各集合使用同一模型时);失败或超时时各集合退化为BM25检索或返回空
+        embedding = self.retrievers[0].embedding
+        query_embedding: Optional[List[float]] = None
+        try:
+            query_embedding = await asyncio.wait_for(embedding.embed(query), self.timeout)
+        except asyncio.TimeoutError:
+            logger.warning("query embedding超时,退化为关键词检索", timeout=self.timeout)
+        except Exception as e:
+            logger.warning("query embedding失败,退化为关键词检索", error=str(e))
 
-        # 按分数排序,取top_k
-        all_results.sort(key=lambda x: x.score, reverse=True)
-        return all_results[:top_k]
+        results = await asyncio.gather(
+            *(
+                self._retrieve_one(r, query, query_embedding, embedding.model_id, top_k, where)
+                for r in self.retrievers
+            )
+        )
+
+        # 按分数取top_k
+        return heapq.nlargest(
+            top_k, itertools.chain.from_iterable(results), key=lambda x: x.score
+        )
 
     async def add_documents(
         self, documents: List[str], metadatas: List[dict]
@@ -215,6 +1239,44 @@ class MultiCollectionRetriever:
             await retriever.delete_documents(ids)
 
 
+class NamespaceRetriever:
+    """全局知识 + 命名空间私有知识的合并检索
+
+    命名空间的索引在检索时才打开(被淘汰后下次检索重新打开);
+    命名空间没有私有知识时只检索全局集合。
+    """
+
+    def __init__(self, manager: VectorStoreManager, namespace: str, collection_type: str = "all"):
+        self.manager = manager
+        self.namespace = namespace
+        self.collection_type = collection_type
+
+    def _pick(self, retrievers: Dict[str, ParentDocumentRetriever]) -> List[ParentDocumentRetriever]:
+        if self.collection_type == "all":
+            return list(retrievers.values())
+        retriever = retrievers.get(self.collection_type, retrievers.get("text"))
+        return [retriever] if retriever is not None else []
+
+    async def retrieve(
+        self, query: str, top_k: int = 5, where: Optional[dict] = None
+    ) -> List[RetrievedDoc]:
+        retrievers = self._pick(self.manager.retrievers)
+        timeout = settings.rag_collection_timeout
+        if not self.manager.has_namespace(self.namespace):
+            return await MultiCollectionRetriever(retrievers, timeout).retrieve(query, top_k, where)
+        async with self.manager.namespace(self.namespace) as space:
+            merged = MultiCollectionRetriever(retrievers + self._pick(space.retrievers), timeout)
+            return await merged.retrieve(query, top_k, where)
+
+
+def _close_all(stores: list) -> None:
+    for store in stores:
+        try:
+            store.close()
+        except Exception as e:
+            logger.warning("关闭索引失败", error=str(e))
+
+
 # 全局实例
 _vector_store: Optional[VectorStoreManager] = None
 _vector_store_lock = asyncio.Lock()
@@ -234,3 +1296,12 @@ async def get_vector_store() -> VectorStoreManager:
         elif not _vector_store._initialized:
             await _vector_store.initialize()
     return _vector_store
+
+
+async def close_vector_store() -> None:
+    """关闭全局向量存储实例(连同其embedding的连接池)"""
+    global _vector_store
+    async with _vector_store_lock:
+        if _vector_store is not None:
+            manager, _vector_store = _vector_store, None
+            await manager.close()
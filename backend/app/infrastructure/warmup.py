@@ -0,0 +1,214 @@
+"""启动预热: 向量库初始化、Embedding模型加载、预置知识同步
+
+预热在后台任务中执行,服务启动后立即可接收请求;/ready 报告各阶段进度,
+Ask在向量库就绪前跳过检索直接回答。
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Optional
+
+from app.infrastructure.config import settings
+from app.infrastructure.logger import get_logger
+
+logger = get_logger("tc_agent.warmup")
+
+STAGES = ("vector_store", "model", "snapshot", "knowledge")
+
+
+@dataclass
+class WarmupStage:
+    """单个预热阶段状态"""
+
+    name: str
+    status: str = "pending"  # pending | running | done | failed | skipped
+    error: Optional[str] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "failed", "skipped")
+
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        if self.started_at:
+            end = self.finished_at or time.time()
+            data["elapsed"] = round(end - self.started_at, 3)
+        return data
+
+
+@dataclass
+class KnowledgeProgress:
+    """预置知识同步进度(按目录)"""
+
+    current: Optional[str] = None
+    directories: Dict[str, dict] = field(default_factory=dict)
+
+    def update(self, rel_dir: str, scanned: int, indexed: int) -> None:
+        self.current = rel_dir
+        self.directories[rel_dir] = {"scanned": scanned, "searchable": indexed}
+
+    def to_dict(self) -> dict:
+        return {
+            "current": self.current,
+            "files_scanned": sum(d["scanned"] for d in self.directories.values()),
+            "files_searchable": sum(d["searchable"] for d in self.directories.values()),
+            "directories": dict(self.directories),
+        }
+
+
+class Warmup:
+    """预热任务
+
+    - vector_store: 打开集合与旁路索引(失败时Ask退回到请求时初始化)
+    - model: 本地Embedding模型加载(远程模式跳过)
+    - snapshot: 配置了快照且知识库为空时从快照导入(新节点免重新embedding)
+    - knowledge: 增量同步预置知识库,同步期间已入库的内容即可检索
+    """
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+        self._reset()
+
+    def _reset(self) -> None:
+        self.stages: Dict[str, WarmupStage] = {name: WarmupStage(name) for name in STAGES}
+        self.knowledge = KnowledgeProgress()
+        self.started_at: Optional[float] = None
+
+    @property
+    def started(self) -> bool:
+        return self.started_at is not None
+
+    @property
+    def ready(self) -> bool:
+        """所有阶段已结束(含失败)"""
+        return self.started and all(stage.finished for stage in self.stages.values())
+
+    @property
+    def initializing(self) -> bool:
+        """预热已开始但向量库尚未初始化完成,此时获取向量库会阻塞"""
+        return self.started and not self.stages["vector_store"].finished
+
+    @property
+    def syncing(self) -> bool:
+        """预置知识仍在同步,检索结果可能不完整"""
+        return self.started and not self.stages["knowledge"].finished
+
+    def status(self) -> str:
+        if not self.started:
+            return "not_started"
+        if not self.ready:
+            return "warming"
+        failed = any(stage.status == "failed" for stage in self.stages.values())
+        return "degraded" if failed else "ready"
+
+    def to_dict(self) -> dict:
+        return {
+            "status": self.status(),
+            "ready": self.ready,
+            "elapsed": round(time.time() - self.started_at, 3) if self.started else 0.0,
+            "stages": {name: stage.to_dict() for name, stage in self.stages.items()},
+            "knowledge": self.knowledge.to_dict(),
+        }
+
+    async def _stage(self, name: str, coro) -> bool:
+        stage = self.stages[name]
+        stage.status = "running"
+        stage.started_at = time.time()
+        try:
+            await coro
+        except Exception as e:
+            stage.status = "failed"
+            stage.error = str(e)
+            logger.warning("预热阶段失败", stage=name, error=str(e))
+            return False
+        else:
+            stage.status = "done"
+            return True
+        finally:
+            stage.finished_at = time.time()
+
+    def _skip(self, name: str) -> None:
+        self.stages[name].status = "skipped"
+
+    async def run(self) -> None:
+        """依次执行各阶段;向量库失败时后续阶段跳过"""
+        self._reset()
+        self.started_at = time.time()
+        # 调用时再导入,便于测试替换get_vector_store
+        from app.infrastructure.vector_store import get_vector_store
+
+        holder = {}
+
+        async def open_store() -> None:
+            holder["store"] = await get_vector_store()
+
+        if not await self._stage("vector_store", open_store()):
+            self._skip("model")
+            self._skip("snapshot")
+            self._skip("knowledge")
+            return
+        vector_store = holder["store"]
+
+        embedding = getattr(vector_store, "embedding", None)
+        if embedding is not None and settings.embedding_mode == "local":
+            # 首个查询不再承担模型加载耗时
+            await self._stage("model", embedding.embed("warmup"))
+        else:
+            self._skip("model")
+
+        snapshot = settings.knowledge_snapshot_bootstrap
+        if snapshot is not None and snapshot.exists():
+            await self._stage("snapshot", self._bootstrap(vector_store, snapshot))
+        else:
+            self._skip("snapshot")
+
+        await self._stage("knowledge", vector_store.load_preset_knowledge(progress=self.knowledge.update))
+        try:
+            stats = await vector_store.get_stats()
+        except Exception as e:
+            stats = {"error": str(e)}
+        logger.info("预热完成", status=self.status(), elapsed=self.to_dict()["elapsed"], stats=stats)
+
+    async def _bootstrap(self, vector_store, snapshot) -> None:
+        stats = await vector_store.get_stats()
+        if any(stats.get(key, {}).get("count", 0) for key in vector_store.COLLECTIONS):
+            logger.info("知识库非空,跳过快照导入", snapshot=str(snapshot))
+            return
+        await vector_store.import_snapshot(snapshot)
+
+    def start(self) -> asyncio.Task:
+        """在后台启动预热"""
+        if self._task is None or self._task.done():
+            self._reset()
+            self.started_at = time.time()  # 任务开始前/ready即报告warming
+            self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self) -> None:
+        """关闭服务时取消未完成的预热"""
+        task, self._task = self._task, None
+        if task is None or task.done():
+            return
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        # 中断的阶段不会再结束,恢复为未启动状态
+        self._reset()
+        logger.info("预热已取消")
+
+
+_warmup: Optional[Warmup] = None
+
+
+def get_warmup() -> Warmup:
+    """获取预热状态(单例)"""
+    global _warmup
+    if _warmup is None:
+        _warmup = Warmup()
+    return _warmup
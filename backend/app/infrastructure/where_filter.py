@@ -0,0 +1,63 @@
+"""Chroma风格where过滤条件的本地求值"""
+from __future__ import annotations
+
+import operator
+from typing import Any, Callable, Dict, Optional
+
+_COMPARE: Dict[str, Callable[[Any, Any], bool]] = {
+    "$eq": operator.eq,
+    "$ne": operator.ne,
+    "$gt": operator.gt,
+    "$gte": operator.ge,
+    "$lt": operator.lt,
+    "$lte": operator.le,
+    "$in": lambda value, options: value in options,
+    "$nin": lambda value, options: value not in options,
+}
+
+_NEGATIVE = ("$ne", "$nin")
+
+
+def value_matcher(op: str, operand: Any) -> Callable[[Any], bool]:
+    """单个字段条件 -> 取值判定函数"""
+    compare = _COMPARE.get(op)
+    if compare is None:
+        raise ValueError(f"Unsupported where operator: {op}")
+    if op in ("$in", "$nin"):
+        operand = set(operand)
+
+    def check(value: Any) -> bool:
+        if value is None:
+            # 缺失字段只满足否定条件(与Chroma一致)
+            return op in _NEGATIVE
+        try:
+            return bool(compare(value, operand))
+        except TypeError:
+            return False
+
+    return check
+
+
+def field_conditions(cond: Any) -> Dict[str, Any]:
+    """字段条件规范化: 裸值视为$eq"""
+    return cond if isinstance(cond, dict) else {"$eq": cond}
+
+
+def match_where(metadata: Optional[dict], where: Optional[dict]) -> bool:
+    """判断一条元数据是否满足where条件"""
+    if not where:
+        return True
+    metadata = metadata or {}
+    for key, cond in where.items():
+        if key == "$and":
+            if not all(match_where(metadata, sub) for sub in cond):
+                return False
+        elif key == "$or":
+            if not any(match_where(metadata, sub) for sub in cond):
+                return False
+        else:
+            value = metadata.get(key)
+            for op, operand in field_conditions(cond).items():
+                if not value_matcher(op, operand)(value):
+                    return False
+    return True
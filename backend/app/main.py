@@ -1,12 +1,15 @@
 """TC Agent Backend - FastAPI入口"""
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 
 from app.api import ask, plan, code, knowledge, workspace
+from app.infrastructure.async_store import shutdown_store_executor
 from app.infrastructure.config import settings
 from app.infrastructure.logger import get_logger
-from app.infrastructure.vector_store import get_vector_store
+from app.infrastructure.knowledge_watcher import get_knowledge_watcher
+from app.infrastructure.warmup import get_warmup
 
 logger = get_logger("tc_agent.main")
 
@@ -16,23 +19,35 @@ async def lifespan(app: FastAPI):
     """应用生命周期管理"""
     logger.info("TC Agent后端启动中...", host=settings.host, port=settings.port)
 
-    # 初始化向量存储
-    try:
-        vector_store = await get_vector_store()
-        logger.info("向量存储初始化完成")
-
-        # 加载预置知识库
-        await vector_store.load_preset_knowledge()
-        stats = await vector_store.get_stats()
-        logger.info("预置知识库加载完成", stats=stats)
-    except Exception as e:
-        logger.warning("向量存储初始化失败(可继续使用)", error=str(e))
-
-    logger.info("TC Agent后端启动完成")
+    # 初始化向量存储、加载模型、同步预置知识库(各阶段失败均可继续使用)
+    warmup = get_warmup()
+    if settings.startup_background_warmup:
+        warmup.start()
+        logger.info("TC Agent后端启动完成,知识库在后台预热")
+    else:
+        await warmup.run()
+        logger.info("TC Agent后端启动完成")
+
+    # 监听预置知识目录,变化的文件增量重新索引
+    watcher = get_knowledge_watcher()
+    if watcher is not None:
+        watcher.start()
     yield
 
     # 清理资源
     logger.info("TC Agent后端关闭中...")
+    if watcher is not None:
+        await watcher.stop()
+    await warmup.stop()
+    # 向量库关闭时一并关闭embedding(远程模式的httpx连接池),最后释放读写线程
+    try:
+        from app.infrastructure.vector_store import close_vector_store
+
+        await close_vector_store()
+    except Exception as e:
+        logger.warning("关闭向量库失败", error=str(e))
+    finally:
+        shutdown_store_executor()
 
 
 CORS_ALLOW_ORIGIN_REGEX = r"^vscode-webview://.*$|^https?://(localhost|127\.0\.0\.1)(:\d+)?$"
@@ -72,6 +87,16 @@ async def health_check():
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """就绪检查: 预热完成(含部分阶段失败)返回200,否则503并附带进度"""
+    warmup = get_warmup()
+    state = warmup.to_dict()
+    if not warmup.ready:
+        return JSONResponse(state, status_code=503)
+    return state
+
+
 @app.get("/config")
 async def get_config():
     """获取当前配置(不含敏感信息)"""
@@ -55,6 +55,7 @@ class AskRequest(BaseModel):
     query: str
     knowledge_type: Optional[str] = "all"  # all, text, code
     model: Optional[str] = None
+    workspace_id: Optional[str] = None  # 同时检索该工作区命名空间的私有知识
 
 
 # Plan模式
@@ -83,6 +84,7 @@ class AddDocumentRequest(BaseModel):
     content: str
     metadata: dict = Field(default_factory=dict)
     collection: str = "text"
+    namespace: Optional[str] = None  # 工作区/租户命名空间,为空时写入全局知识库
 
 
 class WorkspaceInitResponse(BaseModel):
@@ -0,0 +1,117 @@
+"""C切分器基准: 在真实源码树(如 OP-TEE optee_os)上测吞吐与chunk尺寸分布
+
+对比:
+- lexer:   当前基于c_lexer的CChunker(顶层函数/结构体/宏块 + 前导注释)
+- lines:   改造前按行计数花括号的 CodeChunker._chunk_c_code(从git历史加载)
+
+指标: 吞吐(MB/s)、chunk数、超出预算的chunk数、chunk长度 p50/p95/max
+
+用法(在 backend 目录下):
+    git clone --depth 1 https://github.com/OP-TEE/optee_os /tmp/optee_os
+    python scripts/bench_c_chunker.py --root /tmp/optee_os
+    python scripts/bench_c_chunker.py --root /tmp/optee_os/core --chunk-size 1000
+不指定 --root 时使用仓库内置的预置知识代码目录。
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+import types
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.rag.chunker import CChunker  # noqa: E402
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+
+def load_sources(root: Path, limit_mb: float) -> list:
+    sources = []
+    total = 0
+    for path in sorted(root.rglob("*")):
+        if path.suffix not in (".c", ".h") or not path.is_file():
+            continue
+        try:
+            text = path.read_text(encoding="utf-8", errors="replace")
+        except OSError:
+            continue
+        sources.append(text)
+        total += len(text.encode("utf-8"))
+        if limit_mb and total >= limit_mb * 1024 * 1024:
+            break
+    return sources
+
+
+def load_baseline(rev: str):
+    """从git历史加载按行计数括号的旧实现"""
+    try:
+        source = subprocess.run(
+            ["git", "show", f"{rev}:backend/app/core/rag/chunker.py"],
+            cwd=BACKEND,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    module = types.ModuleType("baseline_chunker")
+    exec(compile(source, "baseline_chunker.py", "exec"), module.__dict__)
+    chunker = module.CodeChunker()
+    return lambda text, size: chunker._chunk_c_code(text, size)
+
+
+def measure(chunk, sources: list, chunk_size: int, repeat: int) -> dict:
+    best = float("inf")
+    lengths = []
+    for _ in range(repeat):
+        lengths = []
+        start = time.perf_counter()
+        for text in sources:
+            lengths.extend(len(c) for c in chunk(text, chunk_size))
+        best = min(best, time.perf_counter() - start)
+    lengths.sort()
+    return {
+        "seconds": best,
+        "chunks": len(lengths),
+        "over": sum(1 for n in lengths if n > chunk_size),
+        "p50": int(statistics.median(lengths)) if lengths else 0,
+        "p95": lengths[int(len(lengths) * 0.95) - 1] if lengths else 0,
+        "max": lengths[-1] if lengths else 0,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--root", type=Path, default=BACKEND / "knowledge", help="C源码树根目录")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="parent chunk预算(字符)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--limit-mb", type=float, default=0, help="最多读取的源码量(0不限)")
+    parser.add_argument("--baseline-rev", default="2abf011", help="旧实现所在的git revision")
+    args = parser.parse_args()
+
+    sources = load_sources(args.root, args.limit_mb)
+    if not sources:
+        sys.exit(f"{args.root} 下没有 .c/.h 文件")
+    size_mb = sum(len(t.encode("utf-8")) for t in sources) / 1024 / 1024
+    print(f"{len(sources)} files, {size_mb:.1f} MB, chunk budget {args.chunk_size}")
+
+    impls = [("lexer", CChunker().chunk)]
+    baseline = load_baseline(args.baseline_rev)
+    if baseline is not None:
+        impls.append(("lines", baseline))
+
+    print(f"{'impl':<6} {'seconds':>8} {'MB/s':>7} {'chunks':>8} {'>budget':>8} {'p50':>6} {'p95':>6} {'max':>8}")
+    for label, chunk in impls:
+        r = measure(chunk, sources, args.chunk_size, args.repeat)
+        print(
+            f"{label:<6} {r['seconds']:>8.3f} {size_mb / r['seconds']:>7.1f} {r['chunks']:>8} "
+            f"{r['over']:>8} {r['p50']:>6} {r['p95']:>6} {r['max']:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""切分器基准: 多MB输入上的吞吐(MB/s)与chunk数
+
+对比当前切分器与改造前的实现(从git历史中加载,需在仓库内运行):
+- text: Markdown/中英文混合文档(短段落)
+- long: 无空行的长段落(按句子切分路径)
+- c:    OP-TEE风格C源码
+- py:   Python源码
+
+用法(在 backend 目录下):
+    python scripts/bench_chunkers.py                    # 默认每种输入 8MB
+    python scripts/bench_chunkers.py --mb 32 --chunk-size 1000
+    python scripts/bench_chunkers.py --baseline-rev HEAD~5
+"""
+from __future__ import annotations
+
+import argparse
+import subprocess
+import sys
+import time
+import types
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.rag.chunker import CodeChunker, TextChunker  # noqa: E402
+
+TEXT_SAMPLE = (
+    "## 安全存储\n\n"
+    "OP-TEE 的安全存储通过 TEE_CreatePersistentObject 创建持久化对象。数据使用 TA 专属密钥加密! "
+    "Objects are stored in the REE file system. The hash tree protects integrity (see fs_htree.c).\n\n"
+    "- 支持原子写入\n- 支持对象重命名\n\n"
+)
+LONG_SAMPLE = (
+    "可信应用通过 TEEC_InvokeCommand 接收命令。每条命令携带最多四个参数! "
+    "The secure world validates param_types before touching buffers. Shared memory must be registered first? "
+) * 40 + "\n\n"
+C_SAMPLE = (
+    "/*\n * Copyright (c) 2014, Linaro Limited\n */\n"
+    "#include <tee_internal_api.h>\n\n"
+    "static TEE_Result cmd_inc(uint32_t param_types, TEE_Param params[4])\n{\n"
+    "\tuint32_t exp = TEE_PARAM_TYPES(TEE_PARAM_TYPE_VALUE_INOUT, TEE_PARAM_TYPE_NONE,\n"
+    "\t\t\t\t\t   TEE_PARAM_TYPE_NONE, TEE_PARAM_TYPE_NONE);\n\n"
+    "\tif (param_types != exp)\n\t\treturn TEE_ERROR_BAD_PARAMETERS;\n"
+    "\tparams[0].value.a++;\n\treturn TEE_SUCCESS;\n}\n\n"
+)
+PY_SAMPLE = (
+    "import os\n\n\n"
+    "@dataclass\nclass Entry:\n    name: str\n    size: float = 0\n\n    def describe(self) -> str:\n"
+    "        return f\"{self.name}: {self.size}\"\n\n\n"
+    "def load(path):\n    with open(path) as f:\n        return [Entry(line.strip()) for line in f]\n\n\n"
+)
+
+
+def make_input(sample: str, mb: float) -> str:
+    return sample * max(1, int(mb * 1024 * 1024 / len(sample.encode("utf-8"))))
+
+
+def load_baseline(rev: str):
+    """从git历史加载旧版chunker模块"""
+    root = Path(__file__).resolve().parents[1]
+    try:
+        source = subprocess.run(
+            ["git", "show", f"{rev}:backend/app/core/rag/chunker.py"],
+            cwd=root,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    module = types.ModuleType("baseline_chunker")
+    exec(compile(source, "baseline_chunker.py", "exec"), module.__dict__)
+    return module
+
+
+def measure(chunker, text: str, chunk_size: int, repeat: int) -> tuple:
+    best = float("inf")
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = len(chunker.chunk(text, chunk_size))
+        best = min(best, time.perf_counter() - start)
+    return best, count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--mb", type=float, default=8.0, help="每种输入的大小(MB)")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline-rev", default="2abf011", help="对比的旧版本(git revision)")
+    args = parser.parse_args()
+
+    inputs = {
+        "text": make_input(TEXT_SAMPLE, args.mb),
+        "long": make_input(LONG_SAMPLE, args.mb),
+        "c": make_input(C_SAMPLE, args.mb),
+        "py": make_input(PY_SAMPLE, args.mb),
+    }
+    current = {"text": TextChunker(), "long": TextChunker(), "c": CodeChunker(), "py": CodeChunker()}
+    baseline_module = load_baseline(args.baseline_rev)
+    baseline = (
+        {
+            "text": baseline_module.TextChunker(),
+            "long": baseline_module.TextChunker(),
+            "c": baseline_module.CodeChunker(),
+            "py": baseline_module.CodeChunker(),
+        }
+        if baseline_module
+        else {}
+    )
+
+    print(f"{'input':<6} {'impl':<9} {'MB':>7} {'seconds':>9} {'MB/s':>8} {'chunks':>9}")
+    for kind, text in inputs.items():
+        size_mb = len(text.encode("utf-8")) / 1024 / 1024
+        impls = [("current", current[kind])]
+        if kind in baseline:
+            impls.append(("baseline", baseline[kind]))
+        for label, chunker in impls:
+            seconds, count = measure(chunker, text, args.chunk_size, args.repeat)
+            print(f"{kind:<6} {label:<9} {size_mb:>7.1f} {seconds:>9.3f} {size_mb / seconds:>8.1f} {count:>9}")
+    if not baseline:
+        print(f"(未能从git加载 {args.baseline_rev} 的旧版chunker,只测当前实现)")
+
+
+if __name__ == "__main__":
+    main()
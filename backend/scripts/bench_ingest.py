@@ -0,0 +1,110 @@
+"""入库吞吐基准: ParentDocumentRetriever.add_documents 的 chunks/sec
+
+用法(在 backend 目录下):
+    python scripts/bench_ingest.py                      # 模拟embedding(固定调用开销)
+    python scripts/bench_ingest.py --local BAAI/bge-small-zh-v1.5
+    python scripts/bench_ingest.py --docs 2000 --embed-batch-size 1 --write-batch-size 1
+
+模拟embedding按 "每次调用固定开销 + 每条文本开销" 计时,
+用 --embed-batch-size 1 --write-batch-size 1 可近似旧的逐parent写入路径做对比。
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.core.embedding.base import BaseEmbedding  # noqa: E402
+from app.core.rag.retriever import ParentDocumentRetriever  # noqa: E402
+
+SAMPLE = (
+    "TEE_AllocateOperation 为加密操作分配句柄, 之后需调用 TEE_SetOperationKey 设置密钥。"
+    "可信应用(TA)运行在安全世界, 通过 TEEC_InvokeCommand 接收来自CA的命令。\n\n"
+    "static TEE_Result hmac_compute(uint32_t param_types, TEE_Param params[4])\n"
+    "{\n    TEE_OperationHandle op = TEE_HANDLE_NULL;\n    return TEE_SUCCESS;\n}\n\n"
+)
+
+
+class SimulatedEmbedding(BaseEmbedding):
+    """模拟embedding: 每次调用有固定开销(模型前向/网络往返)"""
+
+    def __init__(self, dimension: int, call_ms: float, per_text_ms: float):
+        self._dimension = dimension
+        self.call_ms = call_ms
+        self.per_text_ms = per_text_ms
+        self.calls = 0
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    async def embed(self, text: str) -> List[float]:
+        return (await self.embed_batch([text]))[0]
+
+    async def embed_batch(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        await asyncio.sleep((self.call_ms + self.per_text_ms * len(texts)) / 1000)
+        return [[(hash(t) >> (i % 32) & 0xFF) / 255.0 for i in range(self._dimension)] for t in texts]
+
+
+def make_docs(count: int) -> List[str]:
+    return [f"# 文档 {i}\n\n" + SAMPLE * (1 + i % 6) for i in range(count)]
+
+
+async def run(args: argparse.Namespace) -> None:
+    import chromadb
+
+    if args.local:
+        from app.core.embedding.local import LocalEmbedding
+
+        embedding: BaseEmbedding = LocalEmbedding(model_name=args.local)
+        embedding._get_model()
+    else:
+        embedding = SimulatedEmbedding(args.dim, args.call_ms, args.per_text_ms)
+
+    client = chromadb.EphemeralClient()
+    collection = client.get_or_create_collection(
+        name=f"bench_ingest_{int(time.time())}", metadata={"hnsw:space": "cosine"}
+    )
+    retriever = ParentDocumentRetriever(
+        collection=collection,
+        embedding=embedding,
+        child_chunk_size=200,
+        parent_chunk_size=1000,
+        embed_batch_size=args.embed_batch_size,
+        write_batch_size=min(args.write_batch_size, client.get_max_batch_size()),
+    )
+
+    docs = make_docs(args.docs)
+    metas = [{"source": f"doc_{i}.md", "scope": "ask"} for i in range(len(docs))]
+
+    start = time.perf_counter()
+    await retriever.add_documents(docs, metas)
+    elapsed = time.perf_counter() - start
+
+    chunks = collection.count()
+    print(f"docs={len(docs)} parents={len(retriever.parent_store)} chunks={chunks}")
+    if isinstance(embedding, SimulatedEmbedding):
+        print(f"embed_calls={embedding.calls}")
+    print(f"elapsed={elapsed:.2f}s throughput={chunks / elapsed:.1f} chunks/sec")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--docs", type=int, default=500)
+    parser.add_argument("--embed-batch-size", type=int, default=64)
+    parser.add_argument("--write-batch-size", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--call-ms", type=float, default=5.0, help="模拟每次embedding调用的固定开销")
+    parser.add_argument("--per-text-ms", type=float, default=0.2, help="模拟每条文本的开销")
+    parser.add_argument("--local", help="使用本地sentence-transformers模型代替模拟embedding")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
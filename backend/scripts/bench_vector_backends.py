@@ -0,0 +1,191 @@
+"""向量库后端基准: Chroma vs FlatVectorCollection
+
+对比三项指标:
+- 启动时间: 新进程中打开持久化集合并完成第一次查询的耗时
+- 查询延迟: 单条查询 p50/p95(无过滤 / 带where过滤)
+- 常驻内存: 打开集合并查询后的进程RSS(相对导入依赖后的增量)
+
+用法(在 backend 目录下):
+    python scripts/bench_vector_backends.py                      # 默认 50k 条, 512 维
+    python scripts/bench_vector_backends.py --rows 200000 --dim 512 --flat-dtype float16
+    python scripts/bench_vector_backends.py --data /tmp/vs_bench --skip-build   # 复用已建好的数据
+
+每个后端在独立子进程中测量,互不影响启动时间与RSS。
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+COLLECTION = "bench_vectors"
+
+
+def rss_mb() -> float:
+    """当前进程RSS(MB),读取/proc,非Linux时回退ru_maxrss"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    import resource
+
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_data(rows: int, dim: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(rows, dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    ids = [f"c{i}" for i in range(rows)]
+    metas = [{"scope": "ask" if i % 2 else "plan", "kb": f"kb{i % 8}"} for i in range(rows)]
+    docs = [f"chunk {i}" for i in range(rows)]
+    return ids, vectors, docs, metas
+
+
+def build(args: argparse.Namespace, data_dir: Path) -> None:
+    import chromadb
+    from chromadb.config import Settings
+
+    from app.infrastructure.flat_index import FlatVectorCollection
+
+    ids, vectors, docs, metas = make_data(args.rows, args.dim)
+
+    start = time.perf_counter()
+    client = chromadb.PersistentClient(
+        path=str(data_dir / "chroma"), settings=Settings(anonymized_telemetry=False)
+    )
+    col = client.get_or_create_collection(COLLECTION, metadata={"hnsw:space": "cosine"})
+    step = client.get_max_batch_size()
+    for i in range(0, args.rows, step):
+        col.add(
+            ids=ids[i : i + step],
+            embeddings=vectors[i : i + step].tolist(),
+            documents=docs[i : i + step],
+            metadatas=metas[i : i + step],
+        )
+    print(f"[build] chroma  rows={col.count()} {time.perf_counter() - start:.1f}s")
+
+    start = time.perf_counter()
+    flat = FlatVectorCollection(data_dir / "flat", name=COLLECTION, dtype=args.flat_dtype)
+    for i in range(0, args.rows, 5000):
+        flat.add(
+            ids=ids[i : i + 5000],
+            embeddings=vectors[i : i + 5000],
+            documents=docs[i : i + 5000],
+            metadatas=metas[i : i + 5000],
+        )
+    print(f"[build] flat    rows={flat.count()} {time.perf_counter() - start:.1f}s")
+    flat.close()
+
+
+def measure(backend: str, args: argparse.Namespace, data_dir: Path) -> dict:
+    """子进程内执行: 打开集合、测启动/延迟/RSS"""
+    if backend == "chroma":
+        import chromadb
+        from chromadb.config import Settings
+    else:
+        from app.infrastructure.flat_index import FlatVectorCollection
+
+    baseline_rss = rss_mb()
+    rng = np.random.default_rng(1)
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32).tolist()
+
+    start = time.perf_counter()
+    if backend == "chroma":
+        client = chromadb.PersistentClient(
+            path=str(data_dir / "chroma"), settings=Settings(anonymized_telemetry=False)
+        )
+        col = client.get_collection(COLLECTION)
+    else:
+        col = FlatVectorCollection(data_dir / "flat", name=COLLECTION, dtype=args.flat_dtype)
+    col.query(query_embeddings=[queries[0]], n_results=args.top_k)
+    startup = time.perf_counter() - start
+
+    def latencies(where):
+        samples = []
+        for q in queries:
+            t0 = time.perf_counter()
+            col.query(
+                query_embeddings=[q],
+                n_results=args.top_k,
+                where=where,
+                include=["documents", "metadatas", "distances"],
+            )
+            samples.append((time.perf_counter() - t0) * 1000)
+        samples.sort()
+        return {
+            "p50_ms": round(statistics.median(samples), 3),
+            "p95_ms": round(samples[int(len(samples) * 0.95) - 1], 3),
+        }
+
+    return {
+        "backend": backend,
+        "startup_s": round(startup, 3),
+        "query": latencies(None),
+        "query_where": latencies({"$and": [{"scope": "ask"}, {"kb": {"$in": ["kb1", "kb3"]}}]}),
+        "rss_mb": round(rss_mb() - baseline_rss, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=15)
+    parser.add_argument("--flat-dtype", default="float32", choices=["float16", "float32"])
+    parser.add_argument("--data", help="数据目录(默认临时目录)")
+    parser.add_argument("--skip-build", action="store_true", help="复用--data中已建好的数据")
+    parser.add_argument("--child", choices=["chroma", "flat"], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child, args, Path(args.data))))
+        return
+
+    tmp = None
+    if args.data:
+        data_dir = Path(args.data)
+    else:
+        tmp = tempfile.TemporaryDirectory(prefix="vs_bench_")
+        data_dir = Path(tmp.name)
+    if not args.skip_build:
+        build(args, data_dir)
+
+    forwarded = [
+        "--rows", str(args.rows), "--dim", str(args.dim), "--queries", str(args.queries),
+        "--top-k", str(args.top_k), "--flat-dtype", args.flat_dtype, "--data", str(data_dir),
+    ]
+    print(f"{'backend':<8} {'startup':>9} {'p50':>9} {'p95':>9} {'p50(where)':>11} {'p95(where)':>11} {'rss':>9}")
+    for backend in ("chroma", "flat"):
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", backend, *forwarded],
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        r = json.loads(out.strip().splitlines()[-1])
+        print(
+            f"{r['backend']:<8} {r['startup_s']:>8.3f}s {r['query']['p50_ms']:>7.2f}ms "
+            f"{r['query']['p95_ms']:>7.2f}ms {r['query_where']['p50_ms']:>9.2f}ms "
+            f"{r['query_where']['p95_ms']:>9.2f}ms {r['rss_mb']:>7.1f}MB"
+        )
+
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""向量压缩基准: float32基线 vs float16 vs PQ(+精确重排)
+
+对每种存储方式报告:
+- recall@k: 与float32精确检索top-k的重合率(无过滤 / 带where过滤)
+- 查询延迟 p50/p95
+- 扫描内存: 查询时需要常驻的数据量(精确扫描为全部向量,PQ为PQ码,向量只读取候选行)
+- 磁盘: 集合目录中向量相关文件的大小
+
+用法(在 backend 目录下):
+    python scripts/bench_vector_compression.py                          # 默认 50k 条, 1536 维
+    python scripts/bench_vector_compression.py --rows 100000 --pq 96,192,384 --rerank 4,8,16
+    python scripts/bench_vector_compression.py --vectors embeddings.npy  # 使用真实embedding
+
+默认数据为低内在维度、带簇结构的合成向量(各向同性随机向量对PQ是最坏情况,不代表真实embedding)。
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+WHERE = {"scope": "ask"}
+VECTOR_FILES = ("vectors.bin", "codes.bin", "pq_codebooks.npy")
+
+
+def make_data(args: argparse.Namespace):
+    rng = np.random.default_rng(0)
+    if args.vectors:
+        vectors = np.load(args.vectors).astype(np.float32)[: args.rows]
+        order = rng.permutation(len(vectors))
+        queries = vectors[order[: args.queries]] + 0.05 * rng.normal(
+            size=(args.queries, vectors.shape[1])
+        ).astype(np.float32)
+    else:
+        # embedding的内在维度远低于向量维度: 低维簇结构经随机投影到dim维,再加少量噪声
+        centers = rng.normal(size=(args.clusters, args.latent)).astype(np.float32)
+        labels = rng.integers(0, args.clusters, args.rows + args.queries)
+        latent = centers[labels] + args.spread * rng.normal(
+            size=(len(labels), args.latent)
+        ).astype(np.float32)
+        projection = rng.normal(size=(args.latent, args.dim)).astype(np.float32)
+        noise = rng.normal(size=(len(labels), args.dim)).astype(np.float32)
+        points = latent @ projection + args.noise * np.sqrt(args.latent) * noise
+        vectors, queries = points[: args.rows], points[args.rows :]
+    metas = [{"scope": "ask" if i % 2 else "plan"} for i in range(len(vectors))]
+    return vectors, queries, metas
+
+
+def build(path: Path, vectors, metas, dtype: str, pq: int, rerank: int):
+    from app.infrastructure.flat_index import FlatVectorCollection
+
+    col = FlatVectorCollection(path, dtype=dtype, pq_subspaces=pq, rerank=rerank)
+    ids = [f"c{i}" for i in range(len(vectors))]
+    start = time.perf_counter()
+    for i in range(0, len(vectors), 5000):
+        col.add(ids=ids[i : i + 5000], embeddings=vectors[i : i + 5000], metadatas=metas[i : i + 5000])
+    return col, time.perf_counter() - start
+
+
+def run(col, queries, top_k: int, where):
+    results, samples = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        out = col.query(query_embeddings=[q], n_results=top_k, where=where, include=["distances"])
+        samples.append((time.perf_counter() - t0) * 1000)
+        results.append(out["ids"][0])
+    samples.sort()
+    return results, {
+        "p50_ms": statistics.median(samples),
+        "p95_ms": samples[max(0, int(len(samples) * 0.95) - 1)],
+    }
+
+
+def recall(results, truth) -> float:
+    return statistics.fmean(len(set(r) & set(t)) / max(1, len(t)) for r, t in zip(results, truth))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=15)
+    parser.add_argument("--clusters", type=int, default=256, help="合成数据的簇数")
+    parser.add_argument("--latent", type=int, default=64, help="合成数据的内在维度")
+    parser.add_argument("--spread", type=float, default=0.6, help="合成数据的簇内离散度")
+    parser.add_argument("--noise", type=float, default=0.1, help="合成数据的各向同性噪声")
+    parser.add_argument("--vectors", help="使用.npy中的真实向量(rows, dim)")
+    parser.add_argument("--pq", default="96,192", help="PQ段数(逗号分隔,需整除维度)")
+    parser.add_argument("--rerank", default="4,8", help="候选倍数(逗号分隔)")
+    parser.add_argument("--pq-dtype", default="float16", choices=["float16", "float32"], help="重排向量精度")
+    args = parser.parse_args()
+
+    vectors, queries, metas = make_data(args)
+    rows, dim = vectors.shape
+    queries = queries.tolist()
+    print(f"rows={rows} dim={dim} queries={len(queries)} top_k={args.top_k}")
+
+    variants = [("float32", "float32", 0, 1), ("float16", "float16", 0, 1)]
+    for m in (int(x) for x in args.pq.split(",") if x):
+        for r in (int(x) for x in args.rerank.split(",") if x):
+            variants.append((f"pq{m}x{r}", args.pq_dtype, m, r))
+
+    header = (
+        f"{'variant':<12} {'build':>7} {'recall':>7} {'recall(w)':>9} {'p50':>8} {'p95':>8} "
+        f"{'p50(w)':>8} {'scan MB':>8} {'disk MB':>8} {'scan x':>7} {'disk x':>7}"
+    )
+    print(header)
+    truth = truth_where = None
+    base_scan = base_disk = None
+    with tempfile.TemporaryDirectory(prefix="vs_compress_") as tmp:
+        for name, dtype, pq, rerank in variants:
+            path = Path(tmp) / name
+            col, build_s = build(path, vectors, metas, dtype, pq, rerank)
+            results, lat = run(col, queries, args.top_k, None)
+            results_w, lat_w = run(col, queries, args.top_k, WHERE)
+            if truth is None:
+                truth, truth_where = results, results_w
+            stats = col.stats()
+            scan = stats["scan_bytes_per_row"] * stats["rows"] / 1e6
+            disk = sum((path / f).stat().st_size for f in VECTOR_FILES if (path / f).exists()) / 1e6
+            base_scan = base_scan or scan
+            base_disk = base_disk or disk
+            print(
+                f"{name:<12} {build_s:>6.1f}s {recall(results, truth):>7.3f} "
+                f"{recall(results_w, truth_where):>9.3f} {lat['p50_ms']:>6.2f}ms {lat['p95_ms']:>6.2f}ms "
+                f"{lat_w['p50_ms']:>6.2f}ms {scan:>8.1f} {disk:>8.1f} "
+                f"{base_scan / scan:>6.1f}x {base_disk / disk:>6.1f}x"
+            )
+            col.close()
+
+
+if __name__ == "__main__":
+    main()
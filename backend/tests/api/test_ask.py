@@ -54,3 +54,82 @@ def test_ask_stream_basic(app_client, dummy_vector_store, monkeypatch):
     # 来源中应包含文档 source
     assert "docA.md" in body
     assert "docB.md" in body
+
+
+class CountingLLM:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    async def stream(self, prompt: str):
+        self.calls += 1
+        yield "OP-TEE 是"
+        yield "开源的可信执行环境。"
+
+
+def _contents(body: str) -> str:
+    events = [json.loads(line[6:]) for line in body.splitlines() if line.startswith("data: ")]
+    return "".join(e["data"] for e in events if e["type"] == "content")
+
+
+def test_ask_stream_semantic_cache(app_client, dummy_vector_store, hash_embedding, monkeypatch):
+    doc_a = DummyDoc(content="参考内容A", metadata={"source": "docA.md", "parent_id": "a_p0"}, score=0.9)
+    doc_b = DummyDoc(content="参考内容B", metadata={"source": "docB.md", "parent_id": "b_p0"}, score=0.8)
+    dummy_vector_store.retriever = DummyRetriever([doc_a])
+    dummy_vector_store.embedding = hash_embedding
+    dummy_vector_store.version = (("text", 1),)
+
+    async def _get_vector_store():
+        return dummy_vector_store
+
+    llm = CountingLLM()
+    monkeypatch.setattr(ask_module, "get_vector_store", _get_vector_store)
+    monkeypatch.setattr(LLMFactory, "create_from_config", lambda: llm)
+    monkeypatch.setattr(ask_module.settings, "ask_answer_cache_enabled", True)
+    monkeypatch.setattr(ask_module.settings, "ask_answer_cache_threshold", 0.9)
+    monkeypatch.setattr(ask_module, "_answer_cache", None)
+
+    first = app_client.post("/ask/stream", json={"query": "OP-TEE 是什么？请简单介绍一下"})
+    assert llm.calls == 1
+
+    # 措辞略有不同的同一问题直接回放缓存
+    second = app_client.post("/ask/stream", json={"query": "OP-TEE 是什么?请简单介绍一下"})
+    assert llm.calls == 1
+    assert _contents(second.text) == _contents(first.text) == "OP-TEE 是开源的可信执行环境。"
+    assert '"cached": true' in second.text
+    assert "docA.md" in second.text
+
+    # 无关问题、来源不同、知识库变化都不命中
+    app_client.post("/ask/stream", json={"query": "如何编写TA的Makefile"})
+    assert llm.calls == 2
+    dummy_vector_store.retriever = DummyRetriever([doc_a, doc_b])
+    app_client.post("/ask/stream", json={"query": "OP-TEE 是什么？请简单介绍一下"})
+    assert llm.calls == 3
+    dummy_vector_store.version = (("text", 2),)
+    app_client.post("/ask/stream", json={"query": "OP-TEE 是什么？请简单介绍一下"})
+    assert llm.calls == 4
+
+    # 命名空间写入只改变该命名空间的版本,同样使其缓存的回答失效
+    namespace_versions = {"team-a": 0}
+    dummy_vector_store.namespace_version = namespace_versions.get
+    scoped = {"query": "OP-TEE 是什么？请简单介绍一下", "workspace_id": "team-a"}
+    app_client.post("/ask/stream", json=scoped)
+    app_client.post("/ask/stream", json=scoped)
+    assert llm.calls == 5
+    namespace_versions["team-a"] = 1
+    app_client.post("/ask/stream", json=scoped)
+    assert llm.calls == 6
+
+
+def test_semantic_answer_cache_ttl_and_limits(monkeypatch):
+    cache = ask_module.SemanticAnswerCache(threshold=0.99, max_entries=1, ttl_seconds=10)
+    cache.set(("v", "a"), [1.0, 0.0], "回答A")
+    assert cache.get(("v", "a"), [2.0, 0.0]) == "回答A"
+    assert cache.get(("v", "a"), [0.0, 1.0]) is None
+
+    # 超出条目上限时淘汰最久未用的桶
+    cache.set(("v", "b"), [1.0, 0.0], "回答B")
+    assert cache.get(("v", "a"), [1.0, 0.0]) is None
+
+    now = ask_module.time.monotonic()
+    monkeypatch.setattr(ask_module.time, "monotonic", lambda: now + 11)
+    assert cache.get(("v", "b"), [1.0, 0.0]) is None
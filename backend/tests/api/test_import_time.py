@@ -0,0 +1,61 @@
+"""启动导入耗时测试（python -X importtime）：重依赖不得在导入 app.main 时加载。"""
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parents[2]
+
+# 只在选用对应后端/提供商时才允许导入
+LAZY_MODULES = ("chromadb", "dashscope", "zhipuai", "sentence_transformers", "torch", "httpx")
+
+# app.main 的累计导入耗时不超过 fastapi 本身的倍数
+# (改为懒加载前约4.5倍,之后约2倍;用相对值抵消机器快慢差异)
+MAX_RATIO_TO_FASTAPI = 3.0
+
+
+def _importtime(module: str) -> dict:
+    """{模块名: (自身耗时us, 累计耗时us)}"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not self_us.strip().isdigit():
+            continue  # 表头
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def _slowest(times: dict, n: int = 10) -> str:
+    top = sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:n]
+    return ", ".join(f"{name}={us / 1000:.1f}ms" for name, (us, _) in top)
+
+
+def test_heavy_dependencies_are_lazy():
+    times = _importtime("app.main")
+    loaded = sorted(
+        name for name in times if name.split(".")[0] in LAZY_MODULES
+    )
+    assert not loaded, f"导入app.main时加载了重依赖: {loaded[:10]}"
+
+
+def test_startup_import_time_budget():
+    # 取多次中最好的一次,减少磁盘缓存/调度抖动
+    ratios = []
+    for _ in range(3):
+        times = _importtime("app.main")
+        ratio = times["app.main"][1] / max(1, times["fastapi"][1])
+        ratios.append(ratio)
+        if ratio <= MAX_RATIO_TO_FASTAPI:
+            return
+    raise AssertionError(
+        f"app.main导入耗时为fastapi的{min(ratios):.1f}倍(上限{MAX_RATIO_TO_FASTAPI}),"
+        f"最慢的模块: {_slowest(times)}"
+    )
@@ -1,4 +1,4 @@
-"""知识库 API 测试（添加文档）。"""
+"""知识库 API 测试（添加/删除文档）。"""
 
 from app.api import knowledge as knowledge_module
 
@@ -23,3 +23,79 @@ def test_add_document(app_client, dummy_vector_store, monkeypatch):
     assert collection == "text"
     assert docs == ["测试文档内容"]
     assert metas[0]["source"] == "test.md"
+    assert dummy_vector_store.namespaces[-1] is None
+
+    resp = app_client.post("/knowledge/add-document", json={**payload, "namespace": "team-a"})
+    assert resp.status_code == 200
+    assert dummy_vector_store.namespaces[-1] == "team-a"
+
+
+def test_delete_document(app_client, dummy_vector_store, monkeypatch):
+    async def _get_vector_store():
+        return dummy_vector_store
+
+    monkeypatch.setattr(knowledge_module, "get_vector_store", _get_vector_store)
+
+    resp = app_client.delete("/knowledge/document/known", params={"collection": "text"})
+    assert resp.status_code == 200
+    assert resp.json()["collections"] == ["text"]
+    assert dummy_vector_store.deleted[-1] == ("known", "text")
+
+    resp = app_client.delete("/knowledge/document/missing")
+    assert resp.status_code == 404
+
+
+class SnapshotStore:
+    """只实现快照接口的向量库桩"""
+
+    def __init__(self) -> None:
+        self.imported: list[bytes] = []
+
+    async def export_snapshot(self, path, collections=None, codec=None):
+        if collections and "bad" in collections:
+            raise ValueError("Unknown collection: bad")
+        path.write_bytes(b"snapshot:" + ",".join(collections or ["text", "code"]).encode())
+        return {"collections": {key: {"count": 1} for key in collections or ["text", "code"]}}
+
+    async def import_snapshot(self, path):
+        data = path.read_bytes()
+        if not data.startswith(b"snapshot:"):
+            raise ValueError("不是知识库快照文件")
+        self.imported.append(data)
+        return {"collections": {"text": 1}}
+
+
+def test_snapshot_export_and_import(app_client, monkeypatch, tmp_path):
+    from app.infrastructure.config import settings
+
+    store = SnapshotStore()
+
+    async def _get_vector_store():
+        return store
+
+    monkeypatch.setattr(knowledge_module, "get_vector_store", _get_vector_store)
+    monkeypatch.setattr(settings, "data_dir", tmp_path)
+
+    resp = app_client.get("/knowledge/snapshot", params={"collection": "code"})
+    assert resp.status_code == 200
+    assert resp.content == b"snapshot:code"
+    assert resp.headers["x-snapshot-collections"] == "code"
+    assert app_client.get("/knowledge/snapshot", params={"collection": "bad"}).status_code == 400
+
+    # 小的写盘阈值: 上传内容分多次在线程中写入,拼接结果不变
+    monkeypatch.setattr(knowledge_module, "_UPLOAD_FLUSH_BYTES", 4)
+    resp = app_client.post("/knowledge/snapshot", content=b"snapshot:code")
+    assert resp.status_code == 200
+    assert resp.json()["collections"] == {"text": 1}
+    assert store.imported == [b"snapshot:code"]
+
+    assert app_client.post("/knowledge/snapshot", content=b"garbage").status_code == 400
+    monkeypatch.setattr(settings, "knowledge_snapshot_max_bytes", 8)
+    assert app_client.post("/knowledge/snapshot", content=b"snapshot:code").status_code == 413
+    # 导出与上传的临时文件都已清理
+    assert list((tmp_path / "snapshots").iterdir()) == []
+
+
+def test_watch_status(app_client, monkeypatch):
+    monkeypatch.setattr(knowledge_module, "get_knowledge_watcher", lambda: None)
+    assert app_client.get("/knowledge/watch").json() == {"enabled": False}
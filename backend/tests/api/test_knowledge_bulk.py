@@ -0,0 +1,160 @@
+"""知识库批量导入测试（NDJSON / zip / tar 上传，后台任务进度）。"""
+import io
+import json
+import tarfile
+import time
+import zipfile
+
+import pytest
+
+from app.infrastructure import ingest_jobs as ingest_module
+from app.infrastructure.ingest_jobs import IngestJobManager
+
+
+@pytest.fixture
+def jobs(tmp_path, monkeypatch):
+    manager = IngestJobManager(upload_dir=tmp_path / "uploads", batch_docs=2)
+    monkeypatch.setattr(ingest_module, "_manager", manager)
+    return manager
+
+
+def _wait_done(client, job_id: str) -> dict:
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        data = client.get(f"/knowledge/jobs/{job_id}").json()
+        if data["status"] in ("done", "failed"):
+            return data
+        time.sleep(0.02)
+    raise AssertionError("job did not finish")
+
+
+def test_bulk_ndjson(app_client, dummy_vector_store, jobs):
+    lines = [
+        json.dumps({"content": f"文档{i}", "metadata": {"source": f"{i}.md"}}, ensure_ascii=False)
+        for i in range(5)
+    ]
+    lines.append(json.dumps({"content": "int main(void);", "collection": "code"}))
+    lines.append("not json")
+    body = ("\n".join(lines) + "\n").encode()
+
+    with app_client as client:
+        resp = client.post(
+            "/knowledge/bulk?scope=ask",
+            content=body,
+            headers={"Content-Type": "application/x-ndjson"},
+        )
+        assert resp.status_code == 202
+        job = _wait_done(client, resp.json()["id"])
+
+    assert job["status"] == "done"
+    assert job["records_total"] == 7
+    assert job["documents"] == 6
+    assert job["skipped"] == 1 and job["errors"]
+    # 按批次(2条)入库,集合按记录区分
+    assert all(len(docs) <= 2 for _, docs, _ in dummy_vector_store.added)
+    assert ("code", ["int main(void);"], [{"scope": "ask"}]) in dummy_vector_store.added
+    assert all(m["scope"] == "ask" for _, _, metas in dummy_vector_store.added for m in metas)
+    # 上传文件在任务结束后清理
+    assert not list(jobs.upload_dir.iterdir())
+
+
+def _zip_bytes() -> bytes:
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as archive:
+        archive.writestr("optee/core/tee.c", "TEE_Result tee_entry(void) { return 0; }")
+        archive.writestr("optee/docs/readme.md", "# OP-TEE")
+        archive.writestr("optee/bin/blob.bin", b"\x00\x01")
+        archive.writestr("optee/core/bad.h", b"\xff\xfe\x00bad")
+    return buf.getvalue()
+
+
+def _tar_bytes() -> bytes:
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w:gz") as archive:
+        for name, data in [("ta/main.c", b"int ta_main(void);"), ("ta/notes.txt", b"notes")]:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+    return buf.getvalue()
+
+
+def test_bulk_archives(app_client, dummy_vector_store, jobs):
+    with app_client as client:
+        resp = client.post(
+            "/knowledge/bulk", content=_zip_bytes(), headers={"Content-Type": "application/zip"}
+        )
+        zip_job = _wait_done(client, resp.json()["id"])
+
+        resp = client.post("/knowledge/bulk?format=tar&collection=code", content=_tar_bytes())
+        tar_job = _wait_done(client, resp.json()["id"])
+
+        listed = client.get("/knowledge/jobs").json()["jobs"]
+
+    assert zip_job["status"] == "done"
+    assert zip_job["documents"] == 2
+    assert zip_job["skipped"] == 1  # bad.h 非UTF-8; blob.bin 按扩展名忽略
+    assert tar_job["status"] == "done" and tar_job["documents"] == 2
+
+    sources = {m["source"]: c for c, _, metas in dummy_vector_store.added for m in metas}
+    assert sources["optee/core/tee.c"] == "code"
+    assert sources["optee/docs/readme.md"] == "text"
+    assert sources["ta/notes.txt"] == "code"  # collection参数覆盖扩展名映射
+    assert [j["id"] for j in listed] == [tar_job["id"], zip_job["id"]]
+
+
+def test_bulk_rejects_unknown_format(app_client, jobs):
+    resp = app_client.post("/knowledge/bulk", content=b"abc", headers={"Content-Type": "text/plain"})
+    assert resp.status_code == 400
+    assert app_client.get("/knowledge/jobs/missing").status_code == 404
+
+
+def test_bulk_upload_limits(app_client, jobs, monkeypatch):
+    from app.api import knowledge as knowledge_api
+    from app.infrastructure.config import settings
+
+    # 小的写盘阈值,覆盖多次线程写入
+    monkeypatch.setattr(knowledge_api, "_UPLOAD_FLUSH_BYTES", 16)
+    monkeypatch.setattr(settings, "knowledge_bulk_max_bytes", 256)
+    too_big = app_client.post("/knowledge/bulk?format=ndjson", content=b"x" * 257)
+    assert too_big.status_code == 413
+    empty = app_client.post("/knowledge/bulk?format=ndjson", content=b"")
+    assert empty.status_code == 400
+    # 失败的上传不留下临时文件
+    assert not any(jobs.upload_dir.iterdir())
+
+    lines = [json.dumps({"content": f"TEE_Panic 终止TA {i}。"}, ensure_ascii=False) for i in range(2)]
+    with app_client as client:
+        resp = client.post("/knowledge/bulk?format=ndjson", content="\n".join(lines).encode())
+        assert resp.status_code == 202
+        job = _wait_done(client, resp.json()["id"])
+    assert job["status"] == "done" and job["documents"] == 2
+
+
+def test_bulk_storage_error_skips_only_that_group(app_client, dummy_vector_store, jobs, monkeypatch):
+    import sqlite3
+
+    original = dummy_vector_store.add_documents
+
+    async def _add(collection, documents, metadatas, namespace=None):
+        # 模拟存储层对重复内容的主键冲突
+        if len(set(documents)) < len(documents):
+            raise sqlite3.IntegrityError("UNIQUE constraint failed: chunks.child_id")
+        await original(collection, documents, metadatas, namespace)
+
+    monkeypatch.setattr(dummy_vector_store, "add_documents", _add)
+    buf = io.BytesIO()
+    with tarfile.open(fileobj=buf, mode="w") as archive:
+        for name, data in [("a.md", b"# dup"), ("copy/a.md", b"# dup"), ("ta/main.c", b"int main;")]:
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            archive.addfile(info, io.BytesIO(data))
+
+    with app_client as client:
+        resp = client.post("/knowledge/bulk?format=tar", content=buf.getvalue())
+        job = _wait_done(client, resp.json()["id"])
+
+    # text组失败被记录,code组照常入库,任务整体完成
+    assert job["status"] == "done"
+    assert job["documents"] == 1 and job["skipped"] == 2
+    assert "UNIQUE constraint" in job["errors"][0]
+    assert [c for c, _, _ in dummy_vector_store.added] == ["code"]
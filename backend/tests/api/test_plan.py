@@ -23,7 +23,7 @@ def test_plan_flow(app_client, monkeypatch):
     # 替换工作流管理器与存储
     store = MemoryWorkflowStore()
 
-    async def _get_manager():
+    async def _get_manager(workspace_id=None):
         return DummyWorkflowManager()
 
     monkeypatch.setattr(plan_module, "get_workflow_manager", _get_manager)
@@ -49,3 +49,22 @@ def test_plan_flow(app_client, monkeypatch):
     resp = app_client.post("/plan/confirm", json={"workflow_id": workflow_id})
     assert resp.status_code == 200
     assert resp.json()["status"] == "confirmed"
+
+
+def test_plan_rejects_invalid_workspace_id(app_client, dummy_vector_store, monkeypatch):
+    async def _get_vector_store():
+        return dummy_vector_store
+
+    monkeypatch.setattr(plan_module, "get_vector_store", _get_vector_store)
+    monkeypatch.setattr(plan_module.LLMFactory, "create_from_config", lambda: object())
+
+    # 非法的工作区id直接返回400,而不是静默地不做检索
+    resp = app_client.post("/plan/init", json={"task": "创建TA", "workspace_id": "../etc"})
+    assert resp.status_code == 400
+    assert "namespace" in resp.json()["detail"]
+
+    import asyncio
+
+    manager = asyncio.run(plan_module.get_workflow_manager("team-a"))
+    assert manager.retriever is dummy_vector_store.retriever
+    assert dummy_vector_store.namespaces[-1] == "team-a"
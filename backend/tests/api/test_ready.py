@@ -0,0 +1,121 @@
+"""后台预热与 /ready 就绪检查测试。"""
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from app.api import ask as ask_module
+from app.core.llm import LLMFactory
+from app.infrastructure import warmup as warmup_module
+
+
+class DummyLLM:
+    def __init__(self) -> None:
+        self.prompts = []
+
+    async def stream(self, prompt: str):
+        self.prompts.append(prompt)
+        yield "直接回答"
+
+
+@pytest.fixture
+def warmup(monkeypatch):
+    state = warmup_module.Warmup()
+    monkeypatch.setattr(warmup_module, "_warmup", state)
+    return state
+
+
+def _wait_ready(client, timeout: float = 5.0) -> dict:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        resp = client.get("/ready")
+        if resp.status_code == 200:
+            return resp.json()
+        time.sleep(0.02)
+    raise AssertionError(f"预热未完成: {resp.json()}")
+
+
+def test_ready_after_background_warmup(app_client, warmup):
+    with app_client as client:
+        data = _wait_ready(client)
+    assert data["status"] == "ready"
+    assert data["stages"]["vector_store"]["status"] == "done"
+    assert data["stages"]["knowledge"]["status"] == "done"
+    # 桩向量库没有embedding,模型阶段跳过
+    assert data["stages"]["model"]["status"] == "skipped"
+    assert data["knowledge"]["directories"]["ask/docs"] == {"scanned": 1, "searchable": 1}
+
+
+def test_ask_degrades_while_vector_store_loading(app_client, dummy_vector_store, warmup, monkeypatch):
+    import app.infrastructure.vector_store as vector_store_module
+
+    release = threading.Event()
+
+    async def slow_get_vector_store():
+        while not release.is_set():
+            await asyncio.sleep(0.01)
+        return dummy_vector_store
+
+    async def fail_get_vector_store():
+        raise AssertionError("预热期间Ask不应等待向量库")
+
+    monkeypatch.setattr(vector_store_module, "get_vector_store", slow_get_vector_store)
+    monkeypatch.setattr(ask_module, "get_vector_store", fail_get_vector_store)
+    llm = DummyLLM()
+    monkeypatch.setattr(LLMFactory, "create_from_config", lambda: llm)
+
+    with app_client as client:
+        resp = client.get("/ready")
+        assert resp.status_code == 503
+        assert resp.json()["status"] == "warming"
+        assert resp.json()["stages"]["vector_store"]["status"] == "running"
+
+        resp = client.post("/ask/stream", json={"query": "什么是OP-TEE？"})
+        events = [json.loads(line[6:]) for line in resp.text.splitlines() if line.startswith("data: ")]
+        assert events[0] == {"type": "status", "data": "知识库正在加载,本次回答未使用参考资料"}
+        assert {"type": "sources", "data": []} in events
+        assert events[-1] == {"type": "done"}
+        assert llm.prompts and "未找到相关参考资料" in llm.prompts[0]
+
+        release.set()
+        assert _wait_ready(client)["status"] == "ready"
+
+
+def test_vector_store_failure_is_degraded(app_client, warmup, monkeypatch):
+    import app.infrastructure.vector_store as vector_store_module
+
+    async def broken_get_vector_store():
+        raise RuntimeError("磁盘不可用")
+
+    monkeypatch.setattr(vector_store_module, "get_vector_store", broken_get_vector_store)
+    with app_client as client:
+        data = _wait_ready(client)
+    assert data["status"] == "degraded"
+    assert data["stages"]["vector_store"]["status"] == "failed"
+    assert data["stages"]["vector_store"]["error"] == "磁盘不可用"
+    assert data["stages"]["knowledge"]["status"] == "skipped"
+
+
+def test_shutdown_releases_vector_store_and_executor(app_client, warmup, monkeypatch):
+    import app.infrastructure.async_store as async_store_module
+    import app.infrastructure.vector_store as vector_store_module
+
+    closed = []
+
+    class ClosingManager:
+        async def close(self):
+            closed.append("vector_store")
+
+    executor = async_store_module.StoreExecutor(read_workers=1, write_workers=1)
+    monkeypatch.setattr(vector_store_module, "_vector_store", ClosingManager())
+    monkeypatch.setattr(async_store_module, "_executor", executor)
+    with app_client as client:
+        _wait_ready(client)
+    # 关闭时释放向量库(含embedding连接池)与读写线程
+    assert closed == ["vector_store"]
+    assert vector_store_module._vector_store is None
+    assert async_store_module._executor is None
+    with pytest.raises(RuntimeError):
+        executor._write_pool.submit(print)
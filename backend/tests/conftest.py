@@ -4,6 +4,7 @@ from __future__ import annotations
 from typing import Any, List
 
 import sys
+import zlib
 from pathlib import Path
 
 # 确保 tests 能导入 backend/app
@@ -12,8 +13,11 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 import pytest
+import pytest_asyncio
 from fastapi.testclient import TestClient
 
+from app.core.embedding.base import BaseEmbedding
+
 
 class DummyDoc:
     """简化的检索结果对象"""
@@ -40,20 +44,83 @@ class DummyVectorStore:
     def __init__(self, retriever: DummyRetriever | None = None) -> None:
         self.retriever = retriever or DummyRetriever()
         self.added: list[tuple[str, list[str], list[dict]]] = []
+        self.deleted: list[tuple[str, str | None]] = []
+        self.namespaces: list[str | None] = []
 
-    def get_retriever(self, collection_type: str = "all"):
+    def get_retriever(self, collection_type: str = "all", namespace: str | None = None):
+        self.namespaces.append(namespace)
         return self.retriever
 
-    async def add_documents(self, collection: str, documents: list[str], metadatas: list[dict]) -> None:
+    async def add_documents(
+        self, collection: str, documents: list[str], metadatas: list[dict], namespace: str | None = None
+    ) -> None:
         self.added.append((collection, documents, metadatas))
+        self.namespaces.append(namespace)
+
+    async def load_preset_knowledge(self, progress=None) -> None:
+        if progress is not None:
+            progress("ask/docs", 1, 1)
 
-    async def load_preset_knowledge(self) -> None:
-        return None
+    async def delete_document(
+        self, doc_id: str, collection: str | None = None, namespace: str | None = None
+    ) -> list[str]:
+        self.deleted.append((doc_id, collection))
+        return ["text"] if doc_id == "known" else []
 
     async def get_stats(self) -> dict:
         return {"text": {"name": "text", "count": 0}, "code": {"name": "code", "count": 0}}
 
 
+class HashEmbedding(BaseEmbedding):
+    """确定性的假Embedding（按字符n-gram哈希到固定维度，无需加载模型）"""
+
+    def __init__(self, dimension: int = 32) -> None:
+        self._dimension = dimension
+        self.calls: list[int] = []
+
+    @property
+    def dimension(self) -> int:
+        return self._dimension
+
+    def _vector(self, text: str) -> list[float]:
+        vec = [0.0] * self._dimension
+        for i in range(max(1, len(text) - 2)):
+            vec[zlib.crc32(text[i : i + 3].encode()) % self._dimension] += 1.0
+        norm = sum(v * v for v in vec) ** 0.5 or 1.0
+        return [v / norm for v in vec]
+
+    async def embed(self, text: str) -> list[float]:
+        self.calls.append(1)
+        return self._vector(text)
+
+    async def embed_batch(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append(len(texts))
+        return [self._vector(t) for t in texts]
+
+
+@pytest.fixture
+def hash_embedding():
+    """确定性的假Embedding"""
+    return HashEmbedding()
+
+
+@pytest_asyncio.fixture
+async def tmp_vector_store(request, tmp_path, monkeypatch, hash_embedding):
+    """使用临时数据目录与假Embedding的真实VectorStoreManager(可用indirect参数指定后端)"""
+    from app.core.embedding import EmbeddingFactory
+    from app.infrastructure import vector_store as vector_store_module
+    from app.infrastructure.config import settings
+
+    monkeypatch.setattr(settings, "data_dir", tmp_path)
+    monkeypatch.setattr(settings, "vector_store_backend", getattr(request, "param", "chroma"))
+    monkeypatch.setattr(EmbeddingFactory, "create_from_config", lambda: hash_embedding)
+
+    manager = vector_store_module.VectorStoreManager()
+    await manager.initialize()
+    yield manager
+    await manager.close()
+
+
 @pytest.fixture
 def dummy_vector_store():
     """默认向量库桩"""
@@ -66,12 +133,10 @@ def app_client(monkeypatch, dummy_vector_store):
     async def _get_vector_store():
         return dummy_vector_store
 
-    # 主模块里导入的是局部引用，需要双重打桩
+    # 启动预热在调用时才从向量库模块取get_vector_store
     import app.infrastructure.vector_store as vector_store_module
-    import app.main as main_module
 
     monkeypatch.setattr(vector_store_module, "get_vector_store", _get_vector_store)
-    monkeypatch.setattr(main_module, "get_vector_store", _get_vector_store)
 
     from app.main import app
 
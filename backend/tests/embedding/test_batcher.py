@@ -0,0 +1,115 @@
+"""LocalEmbedding 请求合并测试（假模型，无需加载 sentence-transformers）。"""
+import asyncio
+
+import pytest
+
+from app.core.embedding.local import LocalEmbedding
+
+
+class _Array(list):
+    def tolist(self):
+        return list(self)
+
+
+class FakeModel:
+    def __init__(self) -> None:
+        self.calls: list[int] = []
+
+    def encode(self, texts, normalize_embeddings=True):
+        self.calls.append(len(texts))
+        return _Array([[float(len(t)), 1.0] for t in texts])
+
+
+def _embedding(**kwargs) -> tuple[LocalEmbedding, FakeModel]:
+    emb = LocalEmbedding(model_name="fake", **kwargs)
+    model = FakeModel()
+    emb._model = model
+    return emb, model
+
+
+@pytest.mark.asyncio
+async def test_concurrent_embeds_are_coalesced():
+    emb, model = _embedding(max_batch_size=64, batch_window_ms=20)
+    texts = ["q" * (i + 1) for i in range(50)]
+
+    results = await asyncio.gather(*(emb.embed(t) for t in texts))
+
+    assert results == [[float(len(t)), 1.0] for t in texts]
+    assert len(model.calls) == 1 and model.calls[0] == 50
+
+    metrics = emb.metrics()["batching"]
+    assert metrics["requests"] == 50
+    assert metrics["avg_batch_size"] == 50
+    assert metrics["max_queue_delay_ms"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_max_batch_size_flushes_early_and_large_requests_bypass():
+    emb, model = _embedding(max_batch_size=8, batch_window_ms=1000)
+
+    single = [emb.embed(f"t{i}") for i in range(8)]
+    batch = emb.embed_batch([f"b{i}" for i in range(10)])
+    results = await asyncio.wait_for(asyncio.gather(*single, batch), timeout=1)
+
+    assert len(results[-1]) == 10
+    # 凑满 8 条立即发出,10 条的大请求单独执行,均不等待 1s 窗口
+    assert sorted(model.calls) == [8, 10]
+
+
+@pytest.mark.asyncio
+async def test_encode_error_propagates_to_all_waiters():
+    emb, model = _embedding(batch_window_ms=5)
+
+    def _boom(texts, normalize_embeddings=True):
+        raise RuntimeError("model crashed")
+
+    model.encode = _boom
+    results = await asyncio.gather(emb.embed("a"), emb.embed("b"), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+
+@pytest.mark.asyncio
+async def test_pending_batch_never_exceeds_max_batch_size():
+    emb, model = _embedding(max_batch_size=8, batch_window_ms=20)
+
+    # 5 + 5 会超过上限: 第二个请求到来前先发出已累积的 5 条
+    results = await asyncio.gather(
+        emb.embed_batch([f"a{i}" for i in range(5)]),
+        emb.embed_batch([f"b{i}" for i in range(5)]),
+        emb.embed("c"),
+    )
+    assert [len(r) for r in results[:2]] == [5, 5] and results[2] == [1.0, 1.0]
+    assert max(model.calls) <= 8 and sum(model.calls) == 11
+    assert not emb._batcher._tasks
+
+
+def test_concurrent_first_requests_load_model_once(monkeypatch):
+    import sys
+    import threading
+    import types
+
+    loads = []
+    gate = threading.Barrier(4)
+
+    class _CountingModel(FakeModel):
+        def __init__(self, name):
+            super().__init__()
+            loads.append(name)
+
+    module = types.ModuleType("sentence_transformers")
+    module.SentenceTransformer = _CountingModel
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+    monkeypatch.setattr(LocalEmbedding, "_model_cache", {})
+
+    emb = LocalEmbedding(model_name="fake-once")
+
+    def _worker():
+        gate.wait()
+        emb._encode(["x"])
+
+    threads = [threading.Thread(target=_worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert loads == ["fake-once"]
@@ -0,0 +1,44 @@
+"""持久化内容寻址 embedding 缓存测试。"""
+import pytest
+
+from app.core.embedding.cache import PersistentCachedEmbedding
+from app.infrastructure.embedding_store import EmbeddingDiskCache
+
+
+@pytest.mark.asyncio
+async def test_reingest_hits_disk_cache_after_reopen(tmp_path, hash_embedding):
+    texts = ["TEE_AllocateOperation", "TEE_SetOperationKey", "TEE_AllocateOperation"]
+
+    store = EmbeddingDiskCache(tmp_path, hash_embedding.model_id, dtype="float16")
+    cached = PersistentCachedEmbedding(hash_embedding, store)
+    first = await cached.embed_batch(texts)
+    # 批内重复文本只计算一次
+    assert hash_embedding.calls == [2]
+    store.close()
+
+    # 重新打开(模拟重启/重新入库): 不再调用模型
+    store = EmbeddingDiskCache(tmp_path, hash_embedding.model_id, dtype="float16")
+    cached = PersistentCachedEmbedding(hash_embedding, store)
+    second = await cached.embed_batch(texts)
+    assert hash_embedding.calls == [2]
+    assert store.stats()["rows"] == 2
+    for a, b in zip(first, second):
+        assert max(abs(x - y) for x, y in zip(a, b)) < 1e-3
+
+    # 新文本只计算缺失部分
+    await cached.embed_batch(["TEE_SetOperationKey", "TEE_CipherInit"])
+    assert hash_embedding.calls == [2, 1]
+    store.close()
+
+
+def test_models_are_isolated_and_dtype_change_resets(tmp_path):
+    a = EmbeddingDiskCache(tmp_path, "local:model-a", dtype="float32")
+    b = EmbeddingDiskCache(tmp_path, "remote:model/b", dtype="float32")
+    a.put_many({"k": [1.0, 0.0]})
+    assert b.get_many(["k"]) == {}
+    assert a.get_many(["k"]) == {"k": [1.0, 0.0]}
+    a.close()
+
+    reopened = EmbeddingDiskCache(tmp_path, "local:model-a", dtype="float16")
+    assert reopened.get_many(["k"]) == {}
+    reopened.close()
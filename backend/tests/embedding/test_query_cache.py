@@ -0,0 +1,87 @@
+"""查询 embedding LRU 缓存测试。"""
+import asyncio
+
+import pytest
+
+from app.core.embedding.cache import CachedEmbedding
+from app.infrastructure.cache import LRUCache
+
+
+@pytest.mark.asyncio
+async def test_repeated_queries_hit_cache(hash_embedding):
+    cached = CachedEmbedding(hash_embedding, max_entries=8)
+
+    first = await cached.embed("什么是 TEE_AllocateOperation？")
+    second = await cached.embed("  什么是   TEE_AllocateOperation？ ")
+    assert first == second
+    assert hash_embedding.calls == [1]
+
+    stats = cached.metrics()["query_cache"]
+    assert stats["hits"] == 1 and stats["misses"] == 1
+
+
+@pytest.mark.asyncio
+async def test_concurrent_misses_computed_once(hash_embedding):
+    cached = CachedEmbedding(hash_embedding)
+    results = await asyncio.gather(*(cached.embed("fan-out query") for _ in range(5)))
+    assert all(r == results[0] for r in results)
+    assert hash_embedding.calls == [1]
+
+
+@pytest.mark.asyncio
+async def test_cancelled_first_caller_does_not_strand_waiters(hash_embedding):
+    started = asyncio.Event()
+    release = asyncio.Event()
+    inner_embed = hash_embedding.embed
+
+    async def _slow_embed(text):
+        started.set()
+        await release.wait()
+        return await inner_embed(text)
+
+    hash_embedding.embed = _slow_embed
+    cached = CachedEmbedding(hash_embedding)
+
+    first = asyncio.create_task(cached.embed("断开的查询"))
+    await started.wait()
+    waiter = asyncio.create_task(cached.embed("断开的查询"))
+    await asyncio.sleep(0)
+    first.cancel()
+    release.set()
+
+    # 等待者不会挂起,而是自行重新计算
+    vector = await asyncio.wait_for(waiter, timeout=2)
+    assert vector == await inner_embed("断开的查询")
+    assert first.cancelled()
+    assert not cached._inflight
+
+
+@pytest.mark.asyncio
+async def test_embed_batch_bypasses_cache(hash_embedding):
+    cached = CachedEmbedding(hash_embedding)
+    await cached.embed_batch(["a", "b"])
+    assert len(cached.cache) == 0
+
+
+def test_lru_bounds_and_ttl(monkeypatch):
+    cache = LRUCache(max_entries=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+    sized = LRUCache(max_entries=0, max_bytes=10, sizeof=lambda v: v)
+    sized.set("x", 6)
+    sized.set("y", 6)
+    assert sized.get("x") is None and sized.stats()["bytes"] == 6
+
+    import app.infrastructure.cache as cache_module
+
+    now = [100.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    ttl = LRUCache(ttl_seconds=5)
+    ttl.set("k", "v")
+    now[0] += 6
+    assert ttl.get("k") is None
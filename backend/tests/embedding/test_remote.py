@@ -0,0 +1,132 @@
+"""远程 Embedding 客户端测试（httpx.MockTransport，无真实网络）。"""
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from app.core.embedding.remote import RemoteEmbedding
+
+
+def _zhipu_handler(log: list, fail_first: int = 0, in_flight: list | None = None):
+    state = {"failures": fail_first, "active": 0}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        log.append(body["input"])
+        if state["failures"] > 0:
+            state["failures"] -= 1
+            return httpx.Response(429, headers={"Retry-After": "0"})
+        state["active"] += 1
+        if in_flight is not None:
+            in_flight.append(state["active"])
+        await asyncio.sleep(0.01)
+        state["active"] -= 1
+        data = [
+            {"index": i, "embedding": [float(len(t)), float(i)]}
+            for i, t in reversed(list(enumerate(body["input"])))
+        ]
+        return httpx.Response(200, json={"data": data})
+
+    return handler
+
+
+@pytest.mark.asyncio
+async def test_embed_batch_uses_multi_input_requests():
+    log: list = []
+    emb = RemoteEmbedding(
+        provider="zhipu", api_key="k", transport=httpx.MockTransport(_zhipu_handler(log))
+    )
+    texts = [f"t{i}" * (i + 1) for i in range(150)]
+    vectors = await emb.embed_batch(texts)
+
+    # 150 条 / 每批 64 条 = 3 次请求,顺序按 index 还原
+    assert len(log) == 3
+    assert [v[0] for v in vectors] == [float(len(t)) for t in texts]
+    # 连接池在多次调用间复用
+    client = emb._client
+    await emb.embed("q")
+    assert emb._client is client
+    await emb.aclose()
+
+
+@pytest.mark.asyncio
+async def test_concurrency_is_capped():
+    log: list = []
+    in_flight: list = []
+    emb = RemoteEmbedding(
+        provider="zhipu",
+        api_key="k",
+        max_concurrency=2,
+        transport=httpx.MockTransport(_zhipu_handler(log, in_flight=in_flight)),
+    )
+    await emb.embed_batch([f"t{i}" for i in range(64 * 6)])
+    assert len(log) == 6
+    assert max(in_flight) <= 2
+    await emb.aclose()
+
+
+@pytest.mark.asyncio
+async def test_retries_on_429():
+    log: list = []
+    emb = RemoteEmbedding(
+        provider="zhipu",
+        api_key="k",
+        max_retries=3,
+        transport=httpx.MockTransport(_zhipu_handler(log, fail_first=2)),
+    )
+    vec = await emb.embed("hello")
+    assert vec[0] == 5.0
+    assert len(log) == 3
+    assert emb.metrics()["remote"]["retries"] == 2
+
+    failing = RemoteEmbedding(
+        provider="zhipu",
+        api_key="k",
+        max_retries=1,
+        transport=httpx.MockTransport(_zhipu_handler([], fail_first=5)),
+    )
+    with pytest.raises(httpx.HTTPStatusError):
+        await failing.embed("hello")
+    await emb.aclose()
+    await failing.aclose()
+
+
+@pytest.mark.asyncio
+async def test_qwen_batch_payload_and_order():
+    seen: list = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content)
+        seen.append(body)
+        texts = body["input"]["texts"]
+        embeddings = [{"text_index": i, "embedding": [float(i)]} for i in range(len(texts))]
+        return httpx.Response(200, json={"output": {"embeddings": embeddings[::-1]}})
+
+    emb = RemoteEmbedding(provider="qwen", api_key="k", transport=httpx.MockTransport(handler))
+    vectors = await emb.embed_batch([str(i) for i in range(30)])
+    assert [len(b["input"]["texts"]) for b in seen] == [25, 5]
+    assert seen[0]["parameters"]["text_type"] == "document"
+    assert vectors[:3] == [[0.0], [1.0], [2.0]]
+    await emb.aclose()
+
+
+def test_loop_change_closes_previous_client():
+    log: list = []
+    emb = RemoteEmbedding(
+        provider="zhipu", api_key="k", transport=httpx.MockTransport(_zhipu_handler(log))
+    )
+    clients = []
+
+    async def _use():
+        await emb.embed("q")
+        clients.append(emb._client)
+
+    # 每次asyncio.run都是新的事件循环: 换循环时旧连接池被关闭而不是直接丢弃
+    asyncio.run(_use())
+    asyncio.run(_use())
+    assert clients[0] is not clients[1]
+    assert clients[0].is_closed and not clients[1].is_closed
+
+    asyncio.run(emb.aclose())
+    assert clients[1].is_closed and emb._client is None
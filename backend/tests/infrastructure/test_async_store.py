@@ -0,0 +1,119 @@
+"""向量库异步适配测试：入库期间事件循环与 SSE 首包延迟保持平稳。"""
+import asyncio
+import time
+
+import pytest
+
+from app.api import ask as ask_module
+from app.core.llm import LLMFactory
+from app.core.rag.retriever import ParentDocumentRetriever
+from app.infrastructure.async_store import StoreExecutor
+from app.schemas.models import AskRequest
+
+
+class SlowCollection:
+    """写入缓慢（模拟 HNSW 构建 / SQLite 提交）的同步集合桩"""
+
+    def __init__(self, write_delay: float) -> None:
+        self.write_delay = write_delay
+        self.rows: dict[str, dict] = {}
+
+    def add(self, ids, embeddings, documents, metadatas):
+        time.sleep(self.write_delay)
+        rows = dict(self.rows)
+        for i, doc, meta in zip(ids, documents, metadatas):
+            rows[i] = {"document": doc, "metadata": meta}
+        self.rows = rows
+
+    def query(self, query_embeddings, n_results, include, where=None):
+        items = list(self.rows.items())[:n_results]
+        return {
+            "ids": [[i for i, _ in items]],
+            "documents": [[r["document"] for _, r in items]],
+            "metadatas": [[r["metadata"] for _, r in items]],
+            "distances": [[0.1 for _ in items]],
+        }
+
+    def count(self):
+        return len(self.rows)
+
+
+class DummyLLM:
+    async def stream(self, prompt: str):
+        yield "回答"
+
+
+@pytest.fixture
+def executor():
+    ex = StoreExecutor(read_workers=2, write_workers=1)
+    yield ex
+    ex.shutdown()
+
+
+async def _measure_loop_lag(stop: asyncio.Event) -> float:
+    worst = 0.0
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.01)
+        worst = max(worst, time.perf_counter() - start - 0.01)
+    return worst
+
+
+@pytest.mark.asyncio
+async def test_event_loop_not_blocked_during_ingest(executor, hash_embedding):
+    retriever = ParentDocumentRetriever(
+        collection=SlowCollection(write_delay=0.3),
+        embedding=hash_embedding,
+        write_batch_size=5,
+        executor=executor,
+    )
+    docs = [f"文档{i}: 安全存储对象的创建与读取。" * 3 for i in range(10)]
+
+    stop = asyncio.Event()
+    lag_task = asyncio.create_task(_measure_loop_lag(stop))
+    await retriever.add_documents(docs, [{"source": f"{i}.md"} for i in range(10)])
+    stop.set()
+
+    assert await lag_task < 0.1
+
+
+@pytest.mark.asyncio
+async def test_sse_first_event_latency_flat_during_ingest(executor, hash_embedding, monkeypatch):
+    collection = SlowCollection(write_delay=0.5)
+    retriever = ParentDocumentRetriever(
+        collection=collection, embedding=hash_embedding, write_batch_size=2, executor=executor
+    )
+    await retriever.add_documents(["预置文档: OP-TEE 会话管理。"], [{"source": "seed.md"}])
+
+    class _Store:
+        def get_retriever(self, collection_type="all", namespace=None):
+            return retriever
+
+    async def _get_vector_store():
+        return _Store()
+
+    monkeypatch.setattr(ask_module, "get_vector_store", _get_vector_store)
+    monkeypatch.setattr(LLMFactory, "create_from_config", lambda: DummyLLM())
+
+    async def _ask_latency() -> float:
+        start = time.perf_counter()
+        resp = await ask_module.ask_question_stream(AskRequest(query="会话管理"))
+        first_sources = None
+        async for chunk in resp.body_iterator:
+            if '"sources"' in chunk and first_sources is None:
+                first_sources = time.perf_counter() - start
+        return first_sources
+
+    idle = await _ask_latency()
+
+    docs = [f"批量文档{i}: TEE_OpenPersistentObject 用法。" * 4 for i in range(8)]
+    ingest = asyncio.create_task(
+        retriever.add_documents(docs, [{"source": f"{i}.md"} for i in range(8)])
+    )
+    await asyncio.sleep(0.05)
+    busy = await _ask_latency()
+    assert not ingest.done()
+    await ingest
+
+    # 写通道被慢写入占满时,读请求仍走读通道,首个 sources 事件不被拖慢
+    assert busy < idle + 0.2
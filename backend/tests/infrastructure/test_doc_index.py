@@ -0,0 +1,79 @@
+"""文档索引测试：按 doc_id 直接删除/替换，重启后索引仍可用。"""
+import pytest
+
+from app.core.rag.retriever import compute_doc_id
+from app.infrastructure.doc_index import DocumentIndex
+
+
+def test_doc_index_roundtrip(tmp_path):
+    path = tmp_path / "doc_index.sqlite"
+    index = DocumentIndex(path)
+    index.add({"d1": "a.md"}, [("d1_p0_c0", "d1_p0", "d1"), ("d1_p0_c1", "d1_p0", "d1")])
+    index.close()
+
+    index = DocumentIndex(path)
+    assert index.contains("d1")
+    assert index.existing(["d1", "d2"]) == {"d1"}
+    parents, children = index.lookup("d1")
+    assert parents == ["d1_p0"]
+    assert sorted(children) == ["d1_p0_c0", "d1_p0_c1"]
+
+    index.remove("d1")
+    assert not index.contains("d1")
+    assert index.lookup("d1") == ([], [])
+    index.close()
+
+
+@pytest.mark.asyncio
+async def test_delete_document_by_id(tmp_vector_store):
+    keep = "可信应用与安全存储的使用说明。" * 5
+    drop = "REE 侧客户端通过 TEEC 接口打开会话。" * 5
+    await tmp_vector_store.add_documents("text", [keep, drop], [{"source": "keep.md"}, {"source": "drop.md"}])
+    retriever = tmp_vector_store.retrievers["text"]
+    before = await retriever.collection.count()
+
+    drop_id = compute_doc_id(drop)
+    _, children = retriever.doc_index.lookup(drop_id)
+    assert children
+
+    deleted = await tmp_vector_store.delete_document(drop_id)
+    assert deleted == ["text"]
+    assert not await retriever.has_document(drop_id)
+    assert await retriever.collection.count() == before - len(children)
+    assert await retriever.has_document(compute_doc_id(keep))
+
+    # 再次删除不存在的文档返回空
+    assert await tmp_vector_store.delete_document(drop_id) == []
+
+    # 重新添加同内容文档可再次入库(替换)
+    await tmp_vector_store.add_documents("text", [drop], [{"source": "drop.md"}])
+    assert await retriever.has_document(drop_id)
+    assert await retriever.collection.count() == before
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tmp_vector_store", ["chroma", "flat"], indirect=True)
+async def test_failed_write_is_rolled_back_and_retryable(tmp_vector_store, monkeypatch):
+    doc = "TEE_OpenTASession 打开到另一个TA的会话。" * 5
+    retriever = tmp_vector_store.retrievers["text"]
+    original = retriever.collection.add
+    failures = [RuntimeError("磁盘已满")]
+
+    async def _flaky_add(**kwargs):
+        if failures:
+            raise failures.pop()
+        return await original(**kwargs)
+
+    monkeypatch.setattr(retriever.collection, "add", _flaky_add)
+    with pytest.raises(RuntimeError):
+        await tmp_vector_store.add_documents("text", [doc], [{"source": "a.md"}])
+    # 失败的写入不留下索引登记、parent与BM25条目
+    assert not retriever.doc_index.contains(compute_doc_id(doc))
+    assert len(tmp_vector_store._parent_stores["text"]) == 0
+    if retriever.lexical_index is not None:
+        assert retriever.lexical_index.count() == 0
+
+    # 重试可以正常入库
+    await tmp_vector_store.add_documents("text", [doc], [{"source": "a.md"}])
+    assert retriever.doc_index.contains(compute_doc_id(doc))
+    assert await retriever.collection.count() > 0
@@ -0,0 +1,159 @@
+"""扁平向量索引测试：精确 top-k、where 过滤、删除压缩与重启恢复。"""
+import numpy as np
+import pytest
+
+from app.core.rag.retriever import compute_doc_id
+from app.infrastructure.flat_index import FlatVectorCollection
+
+
+def _data(n: int = 200, dim: int = 16, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, dim)).astype(np.float32)
+    ids = [f"c{i}" for i in range(n)]
+    metas = [{"scope": "ask" if i % 2 else "plan", "kb": f"kb{i % 3}", "n": i} for i in range(n)]
+    docs = [f"doc {i}" for i in ids]
+    return ids, vectors, docs, metas
+
+
+def _brute_force(vectors, query, allowed, k):
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = normed @ (query / np.linalg.norm(query))
+    order = [i for i in np.argsort(-scores) if i in allowed]
+    return [f"c{i}" for i in order[:k]]
+
+
+@pytest.mark.parametrize("dtype", ["float32", "float16"])
+def test_query_matches_brute_force(tmp_path, dtype):
+    ids, vectors, docs, metas = _data()
+    col = FlatVectorCollection(tmp_path / "flat", dtype=dtype)
+    col.BLOCK_ROWS = 64  # 覆盖分块路径
+    col.add(ids=ids, embeddings=vectors.tolist(), documents=docs, metadatas=metas)
+    assert col.count() == 200
+
+    query = vectors[7] + 0.1
+    result = col.query(query_embeddings=[query.tolist()], n_results=10)
+    expected = _brute_force(vectors, query, set(range(200)), 10)
+    if dtype == "float32":
+        assert result["ids"][0] == expected
+    else:
+        assert len(set(result["ids"][0]) & set(expected)) >= 9
+    assert result["documents"][0][0] == f"doc {result['ids'][0][0]}"
+    assert result["distances"][0] == sorted(result["distances"][0])
+
+
+def test_where_filters(tmp_path):
+    ids, vectors, docs, metas = _data()
+    col = FlatVectorCollection(tmp_path / "flat")
+    col.add(ids=ids, embeddings=vectors.tolist(), documents=docs, metadatas=metas)
+    query = vectors[3].tolist()
+
+    def allowed(pred):
+        return {i for i in range(200) if pred(metas[i])}
+
+    cases = [
+        ({"scope": "ask"}, lambda m: m["scope"] == "ask"),
+        ({"kb": {"$in": ["kb0", "kb2"]}}, lambda m: m["kb"] in ("kb0", "kb2")),
+        ({"$and": [{"scope": "plan"}, {"n": {"$gte": 100}}]}, lambda m: m["scope"] == "plan" and m["n"] >= 100),
+        ({"$or": [{"kb": "kb1"}, {"n": {"$lt": 10}}]}, lambda m: m["kb"] == "kb1" or m["n"] < 10),
+        ({"scope": {"$ne": "ask"}}, lambda m: m["scope"] != "ask"),
+    ]
+    for where, pred in cases:
+        result = col.query(query_embeddings=[query], n_results=8, where=where)
+        assert result["ids"][0] == _brute_force(vectors, np.asarray(query), allowed(pred), 8)
+
+    assert col.query(query_embeddings=[query], n_results=5, where={"scope": "none"})["ids"] == [[]]
+    assert len(col.get(where={"kb": "kb0"})["ids"]) == len(allowed(lambda m: m["kb"] == "kb0"))
+
+
+def test_delete_compact_and_reopen(tmp_path):
+    ids, vectors, docs, metas = _data()
+    path = tmp_path / "flat"
+    col = FlatVectorCollection(path, dtype="float16")
+    col.add(ids=ids, embeddings=vectors.tolist(), documents=docs, metadatas=metas)
+    # 重复id被忽略
+    col.add(ids=["c0"], embeddings=[vectors[1].tolist()], documents=["dup"], metadatas=[{}])
+    assert col.count() == 200
+
+    col.delete(ids=[f"c{i}" for i in range(0, 200, 2)])
+    col.delete(where={"n": {"$gte": 190}})
+    assert col.count() == 95
+    assert col.stats()["rows"] == 100  # 第一次删除墓碑过半触发压缩,第二次只打墓碑
+    col.close()
+
+    col = FlatVectorCollection(path, dtype="float16")
+    assert col.count() == 95
+    got = col.get(ids=["c1", "c2", "c3"])
+    assert got["ids"] == ["c1", "c3"]
+    assert got["documents"] == ["doc c1", "doc c3"]
+    result = col.query(query_embeddings=[vectors[5].tolist()], n_results=1)
+    assert result["ids"][0] == ["c5"]
+
+    col.reset()
+    assert col.count() == 0
+    assert col.query(query_embeddings=[vectors[5].tolist()], n_results=3)["ids"] == [[]]
+    col.close()
+
+
+def test_pq_shortlist_reranked_exactly(tmp_path):
+    ids, vectors, docs, metas = _data(n=600)
+    path = tmp_path / "flat"
+    col = FlatVectorCollection(path, dtype="float16", pq_subspaces=4, rerank=4)
+    col.PQ_MIN_ROWS = 500
+    col.add(ids=ids[:400], embeddings=vectors[:400].tolist(), documents=docs[:400], metadatas=metas[:400])
+    assert col.stats()["pq_subspaces"] == 0  # 行数不足时精确扫描
+    col.add(ids=ids[400:], embeddings=vectors[400:].tolist(), documents=docs[400:], metadatas=metas[400:])
+    assert col.stats()["pq_subspaces"] == 4
+    assert col.stats()["scan_bytes_per_row"] == 4
+    assert (path / "codes.bin").stat().st_size == 600 * 4
+
+    query = vectors[7] + 0.1
+    result = col.query(query_embeddings=[query.tolist()], n_results=10)
+    expected = _brute_force(vectors, query, set(range(600)), 10)
+    assert len(set(result["ids"][0]) & set(expected)) >= 8
+    # 候选按原始向量重排,返回的是精确距离
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    cosine = normed @ (query / np.linalg.norm(query))
+    for id_, distance in zip(result["ids"][0], result["distances"][0]):
+        assert distance == pytest.approx(1 - cosine[int(id_[1:])], abs=2e-3)
+    ask = col.query(query_embeddings=[query.tolist()], n_results=10, where={"scope": "ask"})
+    assert all(metas[int(i[1:])]["scope"] == "ask" for i in ask["ids"][0])
+
+    col.delete(ids=ids[:400])  # 触发压缩,PQ码随向量重写
+    assert (path / "codes.bin").stat().st_size == 200 * 4
+    after = col.query(query_embeddings=[query.tolist()], n_results=5)["ids"][0]
+    col.close()
+
+    # 重启后复用码本与PQ码
+    col = FlatVectorCollection(path, dtype="float16", pq_subspaces=4, rerank=4)
+    assert col.stats()["pq_subspaces"] == 4
+    assert col.query(query_embeddings=[query.tolist()], n_results=5)["ids"][0] == after
+    col.close()
+
+    # 关闭PQ后丢弃码本,回到精确扫描
+    col = FlatVectorCollection(path, dtype="float16")
+    assert not (path / "codes.bin").exists() and not (path / "pq_codebooks.npy").exists()
+    assert col.count() == 200
+    col.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tmp_vector_store", ["flat"], indirect=True)
+async def test_manager_with_flat_backend(tmp_vector_store):
+    assert tmp_vector_store.client is None
+    text = "可信应用通过 TEE_OpenPersistentObject 访问安全存储。" * 4
+    await tmp_vector_store.add_documents("text", [text], [{"source": "a.md", "scope": "ask"}])
+
+    docs = await tmp_vector_store.get_retriever("all").retrieve(
+        "安全存储", top_k=3, where={"scope": "ask"}
+    )
+    assert docs and docs[0].metadata["source"] == "a.md"
+    stats = await tmp_vector_store.get_stats()
+    assert stats["text"]["backend"] == "flat" and stats["text"]["count"] > 0
+    assert stats["text"]["vectors"]["pq_subspaces"] == 0
+
+    assert await tmp_vector_store.delete_document(compute_doc_id(text)) == ["text"]
+    assert (await tmp_vector_store.get_stats())["text"]["count"] == 0
+
+    await tmp_vector_store.add_documents("code", ["int main(void) { return 0; }"], [{"source": "m.c"}])
+    await tmp_vector_store.delete_collection("code")
+    assert (await tmp_vector_store.get_stats())["code"]["count"] == 0
@@ -0,0 +1,94 @@
+"""预置知识增量加载（清单）测试。"""
+import pytest
+
+from app.infrastructure import vector_store as vector_store_module
+
+
+@pytest.fixture
+def preset_dir(tmp_path, monkeypatch):
+    root = tmp_path / "knowledge"
+    (root / "ask" / "docs").mkdir(parents=True)
+    monkeypatch.setattr(vector_store_module, "PRESET_DIR", root)
+    monkeypatch.setattr(
+        vector_store_module, "PRESET_SOURCES", [("ask/docs", "text", ["*.md"], "ask")]
+    )
+    return root / "ask" / "docs"
+
+
+def _count_adds(manager, monkeypatch):
+    """记录被重新embedding写入的文件名"""
+    calls = []
+    retriever = manager.retrievers["text"]
+    original = retriever.write_prepared
+
+    async def _write(prepared, embeddings):
+        for parent in prepared.parents.values():
+            if parent["metadata"]["filename"] not in calls:
+                calls.append(parent["metadata"]["filename"])
+        await original(prepared, embeddings)
+
+    monkeypatch.setattr(retriever, "write_prepared", _write)
+    return calls
+
+
+@pytest.mark.asyncio
+async def test_unchanged_files_are_skipped(tmp_vector_store, preset_dir, monkeypatch):
+    (preset_dir / "a.md").write_text("OP-TEE 概述。TA 运行在安全世界。", encoding="utf-8")
+    (preset_dir / "b.md").write_text("TrustZone 基础。", encoding="utf-8")
+    calls = _count_adds(tmp_vector_store, monkeypatch)
+
+    await tmp_vector_store.load_preset_knowledge()
+    assert sorted(calls) == ["a.md", "b.md"]
+
+    calls.clear()
+    await tmp_vector_store.load_preset_knowledge()
+    assert calls == []
+
+
+@pytest.mark.asyncio
+async def test_changed_and_deleted_files(tmp_vector_store, preset_dir, monkeypatch):
+    a = preset_dir / "a.md"
+    b = preset_dir / "b.md"
+    a.write_text("旧内容: TEE_AllocateOperation 用法。", encoding="utf-8")
+    b.write_text("将被删除的文档。", encoding="utf-8")
+    await tmp_vector_store.load_preset_knowledge()
+    text_store = tmp_vector_store._parent_stores["text"]
+    assert len(text_store) == 2
+
+    calls = _count_adds(tmp_vector_store, monkeypatch)
+    a.write_text("新内容: TEE_AsymmetricSignDigest 用法。", encoding="utf-8")
+    b.unlink()
+    await tmp_vector_store.load_preset_knowledge()
+
+    assert calls == ["a.md"]
+    contents = [text_store[k]["content"] for k in text_store]
+    assert contents == ["新内容: TEE_AsymmetricSignDigest 用法。"]
+    stats = await tmp_vector_store.get_stats()
+    assert stats["text"]["count"] == 1
+
+
+@pytest.mark.asyncio
+async def test_fingerprint_change_rebuilds(tmp_vector_store, preset_dir, monkeypatch):
+    (preset_dir / "a.md").write_text("OP-TEE 概述。", encoding="utf-8")
+    await tmp_vector_store.load_preset_knowledge()
+
+    from app.infrastructure.config import settings
+
+    monkeypatch.setattr(settings, "rag_child_chunk_size", settings.rag_child_chunk_size + 1)
+    calls = _count_adds(tmp_vector_store, monkeypatch)
+    await tmp_vector_store.load_preset_knowledge()
+    assert calls == ["a.md"]
+
+
+@pytest.mark.asyncio
+async def test_chunker_version_change_rebuilds(tmp_vector_store, preset_dir, monkeypatch):
+    (preset_dir / "a.md").write_text("OP-TEE 概述。", encoding="utf-8")
+    await tmp_vector_store.load_preset_knowledge()
+
+    from app.core.rag import chunker
+
+    # 切分算法升级后,即使文件未变也要重新切分入库
+    monkeypatch.setattr(chunker, "CHUNKER_VERSION", chunker.CHUNKER_VERSION + 1)
+    calls = _count_adds(tmp_vector_store, monkeypatch)
+    await tmp_vector_store.load_preset_knowledge()
+    assert calls == ["a.md"]
@@ -0,0 +1,124 @@
+"""预置知识目录监听测试：新增/修改/删除文件后增量同步、防抖合并、延迟指标。"""
+import asyncio
+import inspect
+import time
+
+import pytest
+
+from app.infrastructure import vector_store as vector_store_module
+from app.infrastructure.knowledge_watcher import KnowledgeWatcher, _watchfiles_available
+
+BACKENDS = ["polling"] + (["watchfiles"] if _watchfiles_available() else [])
+
+
+@pytest.fixture
+def preset_dir(tmp_path, monkeypatch):
+    root = tmp_path / "knowledge"
+    (root / "ask" / "docs").mkdir(parents=True)
+    monkeypatch.setattr(vector_store_module, "PRESET_DIR", root)
+    monkeypatch.setattr(
+        vector_store_module, "PRESET_SOURCES", [("ask/docs", "text", ["*.md"], "ask")]
+    )
+    return root / "ask" / "docs"
+
+
+async def _wait_for(predicate, timeout: float = 10.0) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        result = predicate()
+        if inspect.isawaitable(result):
+            result = await result
+        if result:
+            return
+        assert time.monotonic() < deadline, "等待同步超时"
+        await asyncio.sleep(0.05)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", BACKENDS)
+async def test_watcher_reindexes_changed_files(tmp_vector_store, preset_dir, backend):
+    kept = preset_dir / "kept.md"
+    kept.write_text("TrustZone 基础。", encoding="utf-8")
+    await tmp_vector_store.load_preset_knowledge()
+    retriever = tmp_vector_store.get_retriever("text")
+
+    watcher = KnowledgeWatcher(
+        root=preset_dir.parent.parent,
+        sync=tmp_vector_store.sync_preset_files,
+        backend=backend,
+        debounce_ms=100,
+        poll_interval=0.1,
+    )
+    synced = []
+    original = tmp_vector_store.sync_preset_files
+
+    async def _sync(paths):
+        synced.append(sorted(paths))
+        return await original(paths)
+
+    watcher._sync = _sync
+    watcher.start()
+    try:
+        await asyncio.sleep(0.3)  # 等待监听建立
+        new = preset_dir / "storage.md"
+        new.write_text("TEE_CreatePersistentObject 创建持久化对象。", encoding="utf-8")
+
+        async def searchable():
+            docs = await retriever.retrieve("持久化对象", top_k=5)
+            return "storage.md" in {d.metadata.get("filename") for d in docs}
+
+        await _wait_for(searchable)
+        # 只同步了变化的文件
+        assert all(str(kept) not in batch for batch in synced)
+        metrics = watcher.metrics()
+        assert metrics["backend"] == backend
+        assert metrics["files_indexed"] >= 1
+        assert metrics["latency"]["samples"] >= 1
+        assert 0 <= metrics["latency"]["max"] < 10
+
+        new.unlink()
+
+        async def removed():
+            return tmp_vector_store._open_manifest().entries.keys() == {"ask/docs/kept.md"}
+
+        await _wait_for(removed)
+        await _wait_for(lambda: watcher.metrics()["files_removed"] == 1)
+        assert len(tmp_vector_store._parent_stores["text"]) == 1
+    finally:
+        await watcher.stop()
+    assert not watcher.running
+
+
+@pytest.mark.asyncio
+async def test_watcher_debounces_bursts(tmp_path):
+    batches = []
+
+    async def _sync(paths):
+        batches.append(sorted(paths))
+        return {"files": paths, "indexed": len(paths), "removed": 0}
+
+    watcher = KnowledgeWatcher(root=tmp_path, sync=_sync, backend="polling", debounce_ms=200)
+    consumer = asyncio.create_task(watcher._consume())
+    try:
+        for i in range(5):
+            watcher._notify(str(tmp_path / f"{i % 2}.md"))
+            await asyncio.sleep(0.02)
+        await _wait_for(lambda: batches)
+        await asyncio.sleep(0.3)
+    finally:
+        consumer.cancel()
+    # 连续修改合并为一次同步,同一文件只出现一次
+    assert batches == [[str(tmp_path / "0.md"), str(tmp_path / "1.md")]]
+    metrics = watcher.metrics()
+    assert metrics["events"] == 5
+    assert metrics["batches"] == 1
+    assert metrics["latency"]["samples"] == 2
+    assert metrics["latency"]["p50"] >= 0.2
+
+
+@pytest.mark.asyncio
+async def test_sync_ignores_files_outside_sources(tmp_vector_store, preset_dir):
+    other = preset_dir.parent / "notes.txt"
+    other.write_text("不属于任何预置来源", encoding="utf-8")
+    result = await tmp_vector_store.sync_preset_files([other])
+    assert result == {"files": [], "indexed": 0, "removed": 0}
@@ -0,0 +1,64 @@
+"""Parent store 持久化与热缓存测试。"""
+import chromadb
+import pytest
+
+from app.core.rag.retriever import ParentDocumentRetriever
+from app.infrastructure.parent_store import SqliteParentStore
+
+
+def test_parent_store_roundtrip_and_reopen(tmp_path):
+    path = tmp_path / "parents.sqlite"
+    store = SqliteParentStore(path, cache_size=2)
+    store["d_p0"] = {"content": "parent-0", "metadata": {"source": "a.md"}}
+    store.update_many({f"d_p{i}": {"content": f"parent-{i}", "metadata": {}} for i in (1, 2)})
+    assert len(store) == 3
+    assert "d_p1" in store
+    store.close()
+
+    # 重新打开后数据仍在
+    reopened = SqliteParentStore(path, cache_size=2)
+    assert reopened["d_p0"]["content"] == "parent-0"
+    assert reopened["d_p0"]["metadata"]["source"] == "a.md"
+    assert sorted(reopened) == ["d_p0", "d_p1", "d_p2"]
+
+    del reopened["d_p2"]
+    assert reopened.get("d_p2") is None
+    with pytest.raises(KeyError):
+        del reopened["d_p2"]
+    reopened.close()
+
+
+def test_parent_store_lru_is_bounded(tmp_path):
+    store = SqliteParentStore(tmp_path / "parents.sqlite", cache_size=2)
+    store.update_many({f"p{i}": {"content": str(i), "metadata": {}} for i in range(5)})
+
+    for i in range(5):
+        assert store[f"p{i}"]["content"] == str(i)
+    info = store.cache_info()
+    assert info["size"] == 2
+    assert info["misses"] == 5
+
+    store["p4"]
+    assert store.cache_info()["hits"] == 1
+    store.close()
+
+
+@pytest.mark.asyncio
+async def test_retriever_survives_restart(tmp_path, hash_embedding):
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    collection = client.get_or_create_collection("kb_test", metadata={"hnsw:space": "cosine"})
+    store = SqliteParentStore(tmp_path / "parents.sqlite")
+    retriever = ParentDocumentRetriever(
+        collection=collection, embedding=hash_embedding, parent_store=store
+    )
+    await retriever.add_documents(["OP-TEE 可信应用开发指南。TA 运行在安全世界。"], [{"source": "a.md"}])
+    store.close()
+
+    # 模拟重启: 新的 parent store 实例从磁盘读取
+    reopened = SqliteParentStore(tmp_path / "parents.sqlite")
+    retriever = ParentDocumentRetriever(
+        collection=client.get_collection("kb_test"), embedding=hash_embedding, parent_store=reopened
+    )
+    docs = await retriever.retrieve("可信应用开发", top_k=1)
+    assert docs and "OP-TEE" in docs[0].content
+    reopened.close()
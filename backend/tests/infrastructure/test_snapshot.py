@@ -0,0 +1,157 @@
+"""知识库快照测试：单文件导出/导入往返、向量段内存映射、不兼容快照拒绝导入。"""
+import numpy as np
+import pytest
+import pytest_asyncio
+
+from app.infrastructure import vector_store as vector_store_module
+from app.infrastructure.config import settings
+from app.infrastructure.snapshot import ALIGN, SnapshotError, SnapshotReader, SnapshotWriter
+
+DOCS = {
+    "text": [
+        ("OP-TEE 的安全存储使用 TEE_CreatePersistentObject 创建持久化对象。\n\n" * 3, "storage.md"),
+        ("可信应用通过 TEEC_InvokeCommand 接收来自普通世界的命令。", "invoke.md"),
+    ],
+    "code": [
+        ("TEE_Result TA_CreateEntryPoint(void)\n{\n    return TEE_SUCCESS;\n}\n", "entry.c"),
+    ],
+}
+
+
+async def _fill(manager) -> None:
+    for collection, docs in DOCS.items():
+        await manager.add_documents(
+            collection=collection,
+            documents=[content for content, _ in docs],
+            metadatas=[{"source": source, "scope": "ask"} for _, source in docs],
+        )
+
+
+async def _new_manager(data_dir, monkeypatch):
+    monkeypatch.setattr(settings, "data_dir", data_dir)
+    manager = vector_store_module.VectorStoreManager()
+    await manager.initialize()
+    return manager
+
+
+@pytest_asyncio.fixture
+async def target(tmp_path, monkeypatch, tmp_vector_store):
+    """另一个数据目录下的空知识库(模拟新节点)"""
+    source_dir = settings.data_dir
+    manager = await _new_manager(tmp_path / "node2", monkeypatch)
+    monkeypatch.setattr(settings, "data_dir", source_dir)
+    yield manager
+    await manager.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tmp_vector_store", ["chroma", "flat"], indirect=True)
+async def test_snapshot_round_trip(tmp_vector_store, target, tmp_path, hash_embedding, monkeypatch):
+    await _fill(tmp_vector_store)
+    query = "如何创建持久化对象"
+    expected = await tmp_vector_store.get_retriever("all").retrieve(query, top_k=3)
+
+    manifest = tmp_vector_store._open_manifest()
+    entry = {"collection": "text", "size": 1, "mtime_ns": 1, "sha256": "x", "doc_id": "d"}
+    manifest.entries["ask/docs/storage.md"] = entry
+    manifest.save()
+
+    path = tmp_path / "kb.tcsnap"
+    exported = await tmp_vector_store.export_snapshot(path)
+    assert exported["collections"]["text"]["count"] > 0
+    assert set(exported["collections"]["text"]["sidecars"]) >= {"parents", "doc_index"}
+
+    monkeypatch.setattr(settings, "data_dir", tmp_path / "node2")
+    embedded = len(hash_embedding.calls)
+    result = await target.import_snapshot(path)
+    # 导入不重新embedding
+    assert len(hash_embedding.calls) == embedded
+    assert result["collections"] == {
+        key: info["count"] for key, info in exported["collections"].items()
+    }
+    assert target._open_manifest().entries == {"ask/docs/storage.md": entry}
+
+    for key in ("text", "code"):
+        assert await target.retrievers[key].collection.count() == exported["collections"][key]["count"]
+    actual = await target.get_retriever("all").retrieve(query, top_k=3)
+    assert [(d.content, d.metadata.get("source")) for d in actual] == [
+        (d.content, d.metadata.get("source")) for d in expected
+    ]
+
+    # 文档索引随快照导入,可按doc_id删除
+    assert actual[0].metadata["source"] == "storage.md"
+    doc_id = actual[0].metadata["parent_id"].rsplit("_p", 1)[0]
+    assert await target.delete_document(doc_id) == ["text"]
+    assert await target.retrievers["text"].collection.count() < exported["collections"]["text"]["count"]
+
+
+@pytest.mark.asyncio
+async def test_snapshot_rejects_incompatible(tmp_vector_store, target, tmp_path, monkeypatch):
+    await _fill(tmp_vector_store)
+    path = tmp_path / "kb.tcsnap"
+    await tmp_vector_store.export_snapshot(path, collections=["code"])
+
+    child_chunk_size = settings.rag_child_chunk_size
+    monkeypatch.setattr(settings, "rag_child_chunk_size", child_chunk_size + 1)
+    with pytest.raises(SnapshotError, match="child_chunk_size"):
+        await target.import_snapshot(path)
+    monkeypatch.setattr(settings, "rag_child_chunk_size", child_chunk_size)
+
+    from app.core.rag import chunker
+
+    monkeypatch.setattr(chunker, "CHUNKER_VERSION", chunker.CHUNKER_VERSION + 1)
+    with pytest.raises(SnapshotError, match="chunker"):
+        await target.import_snapshot(path)
+
+    truncated = tmp_path / "broken.tcsnap"
+    truncated.write_bytes(path.read_bytes()[:-4])
+    with pytest.raises(SnapshotError):
+        SnapshotReader(truncated)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tmp_vector_store", ["chroma", "flat"], indirect=True)
+async def test_corrupt_snapshot_keeps_existing_collections(tmp_vector_store, target, tmp_path):
+    await _fill(tmp_vector_store)
+    path = tmp_path / "kb.tcsnap"
+    await tmp_vector_store.export_snapshot(path)
+    await _fill(target)
+    counts = {key: await target.retrievers[key].collection.count() for key in DOCS}
+
+    # 目录与首尾完好,但最后导入的集合的记录段已损坏
+    with SnapshotReader(path) as reader:
+        entry = reader.sections["code/records"]
+    data = bytearray(path.read_bytes())
+    data[entry["offset"] : entry["offset"] + entry["length"]] = b"\xff" * entry["length"]
+    corrupt = tmp_path / "corrupt.tcsnap"
+    corrupt.write_bytes(bytes(data))
+
+    with pytest.raises(SnapshotError):
+        await target.import_snapshot(corrupt)
+    # 校验失败时尚未删除任何集合
+    for key, count in counts.items():
+        assert await target.retrievers[key].collection.count() == count
+    docs = await target.get_retriever("text").retrieve("持久化对象", top_k=3)
+    assert docs and docs[0].metadata["source"] == "storage.md"
+
+
+def test_snapshot_vectors_are_mmapped(tmp_path):
+    vectors = np.arange(12, dtype="<f4").reshape(4, 3)
+    path = tmp_path / "s.tcsnap"
+    with SnapshotWriter(path, codec="zlib") as writer:
+        writer.write_bytes("note", "说明".encode("utf-8") * 100)
+        with writer.section("v", compress=False) as section:
+            section.write(vectors.tobytes())
+        with writer.section("lines") as section:
+            section.write(b'[1, "a"]\n[2, "b"]\n')
+        writer.finish({"embedding_model": "hash"})
+
+    with SnapshotReader(path) as reader:
+        assert reader.meta == {"embedding_model": "hash"}
+        assert reader.sections["v"]["offset"] % ALIGN == 0
+        assert reader.sections["note"]["length"] < reader.sections["note"]["raw_length"]
+        mapped = reader.vectors("v", 3)
+        assert isinstance(mapped, np.memmap)
+        assert np.array_equal(mapped, vectors)
+        assert list(reader.iter_json_lines("lines")) == [[1, "a"], [2, "b"]]
+        assert reader.read_bytes("note").decode("utf-8") == "说明" * 100
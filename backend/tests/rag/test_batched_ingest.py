@@ -0,0 +1,65 @@
+"""跨文档批量 embedding 与批量写入测试。"""
+import pytest
+
+from app.core.rag.retriever import ParentDocumentRetriever
+
+
+class RecordingCollection:
+    """记录 add 调用的集合桩"""
+
+    def __init__(self) -> None:
+        self.adds: list[dict] = []
+
+    def add(self, ids, embeddings, documents, metadatas):
+        self.adds.append(
+            {"ids": ids, "embeddings": embeddings, "documents": documents, "metadatas": metadatas}
+        )
+
+
+@pytest.mark.asyncio
+async def test_add_documents_batches_across_documents(hash_embedding):
+    collection = RecordingCollection()
+    retriever = ParentDocumentRetriever(
+        collection=collection,
+        embedding=hash_embedding,
+        child_chunk_size=40,
+        parent_chunk_size=120,
+        embed_batch_size=16,
+        write_batch_size=50,
+    )
+    docs = [f"文档{i}。" + "可信执行环境的安全存储与会话管理。" * (i % 5 + 1) for i in range(40)]
+    await retriever.add_documents(docs, [{"source": f"{i}.md"} for i in range(40)])
+
+    total = sum(len(a["ids"]) for a in collection.adds)
+    assert total > 40
+    # 嵌入调用按批次合并,远少于 parent 数
+    assert len(hash_embedding.calls) == -(-total // 16)
+    assert max(hash_embedding.calls) <= 16
+    # 写入同样按批次合并
+    assert len(collection.adds) == -(-total // 50)
+
+    # 排序打包后向量仍与文本一一对应
+    for add in collection.adds:
+        for text, vec in zip(add["documents"], add["embeddings"]):
+            assert vec == hash_embedding._vector(text)
+
+    # 每个 child 的 parent 都已写入 parent store
+    for add in collection.adds:
+        for meta in add["metadatas"]:
+            assert meta["parent_id"] in retriever.parent_store
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tmp_vector_store", ["flat"], indirect=True)
+async def test_duplicate_documents_in_one_call(tmp_vector_store, monkeypatch):
+    retriever = tmp_vector_store.retrievers["text"]
+    monkeypatch.setattr(retriever, "dedup_max_distance", None)
+    doc = "TEE_GetObjectInfo1 读取对象属性。" * 3
+
+    await tmp_vector_store.add_documents("text", [doc, doc], [{"source": "a.md"}, {"source": "b.md"}])
+
+    # 同一次调用中内容相同的文档只入库一次(不会触发BM25主键冲突)
+    assert await retriever.collection.count() > 0
+    assert len(tmp_vector_store._parent_stores["text"]) == 1
+    docs = await retriever.retrieve("TEE_GetObjectInfo1", top_k=5)
+    assert [d.metadata["source"] for d in docs] == ["a.md"]
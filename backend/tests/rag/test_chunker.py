@@ -0,0 +1,77 @@
+"""切分器测试：单遍产出偏移、段落/句子边界、真实重叠、代码块边界。"""
+from app.core.rag.c_lexer import item_spans
+from app.core.rag.chunker import CChunker, CodeChunker, PythonChunker, TextChunker, pack_spans
+
+
+def test_text_spans_refer_to_source():
+    text = "第一段。\n\n  第二段第一句。第二段第二句！\n\nThird paragraph. Version 3.14 of file.c is here.  \n"
+    chunker = TextChunker(overlap=0)
+    spans = list(chunker.iter_spans(text, 20))
+    chunks = chunker.chunk(text, 20)
+    assert chunks == [text[a:b] for a, b in spans]
+    assert all(c == c.strip() and len(c) <= 20 for c in chunks)
+    # 英文句点后不跟空白时不断句
+    assert any("3.14" in c for c in chunks)
+    assert "".join(chunks).replace(" ", "") == "".join(text.split()).replace(" ", "")
+
+
+def test_text_overlap_is_real():
+    sentences = [f"第{i:02d}句内容比较长一些。" for i in range(30)]
+    text = "".join(sentences)
+    chunks = TextChunker(overlap=24).chunk(text, 60)
+    assert all(len(c) <= 60 for c in chunks)
+    for prev, cur in zip(chunks, chunks[1:]):
+        # 下一个chunk以上一个chunk末尾不超过overlap的整句(两句,24字)开头
+        assert cur[:24] == prev[-24:]
+    assert TextChunker(overlap=0).chunk(text, 60)[1].startswith(sentences[5])
+
+
+def test_oversized_unit_hard_split_with_overlap():
+    text = "x" * 250
+    spans = list(pack_spans(text, [(0, 250)], 100, overlap=20))
+    assert all(b - a <= 100 for a, b in spans)
+    assert spans[0][0] == 0 and spans[-1][1] == 250
+    assert all(cur[0] <= prev[1] for prev, cur in zip(spans, spans[1:]))
+
+
+def test_c_chunker_blocks():
+    code = (
+        "/* license */\n#include <tee_internal_api.h>\n#include <string.h>\n\n"
+        "#define CHECK(x) \\\n    do { if (!(x)) { panic(\"}\"); } } while (0)\n\n"
+        "/* 递增计数 */\nstatic TEE_Result inc(void)\n{\n"
+        "    const char *s = \"{ not a brace\";\n    char c = '}';\n    // } in comment\n"
+        "    if (x) {\n        x++;\n    }\n    return TEE_SUCCESS;\n}\n\n"
+        "struct ctx {\n    int a;\n} ctx_t;\n"
+    )
+    chunks = CChunker().chunk(code, 500)
+    assert chunks[0].startswith("/* license */") and chunks[0].endswith("while (0)")
+    assert chunks[1].startswith("/* 递增计数 */") and chunks[1].endswith("return TEE_SUCCESS;\n}")
+    assert chunks[2] == "struct ctx {\n    int a;\n} ctx_t;"
+    assert CodeChunker().chunk(code, 500) == chunks
+
+    # 超过chunk_size的函数按行切分,保留缩进
+    body = "".join(f"    call_{i}();\n" for i in range(40))
+    big = CChunker(overlap=0).chunk("void f(void)\n{\n" + body + "}\n", 120)
+    assert len(big) > 1 and all(len(c) <= 120 for c in big)
+    assert big[1].startswith("    call_")
+
+
+def test_c_lexer_items():
+    code = (
+        "#ifdef __cplusplus\nextern \"C\" {\n#endif\n"
+        "int proto(void);\nstatic const int table[] = { 1, 2, 3 };\n"
+        "#ifdef __cplusplus\n}\n#endif\n"
+    )
+    kinds = [kind for kind, _, _ in item_spans(code)]
+    # extern "C" 的 { } 不包住整个头文件
+    assert kinds == ["macro", "macro", "macro", "declaration", "block", "macro", "macro"]
+
+
+def test_python_chunker_keeps_decorators():
+    code = "import os\n\n@dec\n@other\ndef f():\n    pass\n\nclass A:\n    def m(self):\n        pass\n\nasync def g():\n    return 1\n"
+    assert PythonChunker().chunk(code, 200) == [
+        "import os",
+        "@dec\n@other\ndef f():\n    pass",
+        "class A:\n    def m(self):\n        pass",
+        "async def g():\n    return 1",
+    ]
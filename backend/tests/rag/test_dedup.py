@@ -0,0 +1,99 @@
+"""入库近重复去重测试：SimHash 指纹、共享 child 的反向引用与删除转交。"""
+import pytest
+
+from app.core.rag.dedup import BatchDeduper, fingerprint, hamming, partition_key
+from app.core.rag.retriever import compute_doc_id
+
+BOILERPLATE = (
+    "TA_CreateEntryPoint is called when the TA instance is created. "
+    "TA_OpenSessionEntryPoint checks param_types and returns TEE_SUCCESS; "
+    "TA_InvokeCommandEntryPoint dispatches cmd_id to the {name} handler."
+)
+
+
+def test_fingerprint_near_duplicates():
+    a, approx_a = fingerprint(BOILERPLATE.format(name="hello_world"))
+    b, approx_b = fingerprint(BOILERPLATE.format(name="secure_storage"))
+    c, _ = fingerprint("可信应用通过共享内存与客户端交换数据, 需要先注册内存再调用命令。")
+    assert approx_a and approx_b
+    assert hamming(a, b) < hamming(a, c)
+
+    # 过短文本只做精确匹配
+    value, approximate = fingerprint("return 0;")
+    assert not approximate
+    assert fingerprint("return  0;")[0] == value
+
+    dedup = BatchDeduper(max_distance=10)
+    assert dedup.max_distance == 3  # 受分段数限制
+    part = partition_key({"scope": "ask"}, True)
+    dedup.add(part, a, "c1")
+    assert dedup.find(part, a, True) == "c1"
+    assert dedup.find(partition_key({"scope": "plan"}, True), a, True) is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tmp_vector_store", ["flat"], indirect=True)
+async def test_shared_child_back_references(tmp_vector_store):
+    retriever = tmp_vector_store.retrievers["text"]
+    assert retriever.dedup_max_distance is not None
+
+    first = BOILERPLATE.format(name="demo")
+    second = BOILERPLATE.format(name="demo") + " "  # 内容哈希不同, child文本相同
+    other_scope = BOILERPLATE.format(name="demo") + "  "
+    await tmp_vector_store.add_documents(
+        "text",
+        [first, second, other_scope],
+        [
+            {"source": "a.md", "scope": "ask"},
+            {"source": "b.md", "scope": "ask"},
+            {"source": "c.md", "scope": "plan"},
+        ],
+    )
+
+    # 同一过滤分区内只存一个向量, 不同scope不合并
+    assert await retriever.collection.count() == 2
+    assert retriever.doc_index.count() == 3
+    assert retriever.dedup_stats["duplicates"] == 1
+
+    results = await retriever.retrieve("TA_InvokeCommandEntryPoint", top_k=5, where={"scope": "ask"})
+    assert sorted(r.metadata["source"] for r in results) == ["a.md", "b.md"]
+
+    # 删除拥有者后共享child保留并转交给引用方
+    await tmp_vector_store.delete_document(compute_doc_id(first))
+    assert await retriever.collection.count() == 2
+    results = await retriever.retrieve("TA_InvokeCommandEntryPoint", top_k=5, where={"scope": "ask"})
+    assert [r.metadata["source"] for r in results] == ["b.md"]
+
+    await tmp_vector_store.delete_document(compute_doc_id(second))
+    assert await retriever.collection.count() == 1
+    assert await retriever.retrieve("TA_InvokeCommandEntryPoint", top_k=5, where={"scope": "ask"}) == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tmp_vector_store", ["flat"], indirect=True)
+async def test_default_keeps_identifier_variants(tmp_vector_store, monkeypatch):
+    template = (
+        "TEE_AllocateOperation(&op, TEE_ALG_AES_CBC_NOPAD, {mode}, 256) allocates the "
+        "operation handle; TEE_SetOperationKey installs the key before processing data."
+    )
+    mac, enc = template.format(mode="TEE_MODE_MAC"), template.format(mode="TEE_MODE_ENCRYPT")
+    retriever = tmp_vector_store.retrievers["text"]
+    # 默认只合并精确重复: 只差一个标识符的chunk各自保留向量与BM25词条
+    assert retriever.dedup_max_distance == 0
+    await tmp_vector_store.add_documents("text", [mac, enc], [{"source": "mac.md"}, {"source": "enc.md"}])
+    assert retriever.dedup_stats["duplicates"] == 0
+    for query, source in (("TEE_MODE_ENCRYPT", "enc.md"), ("TEE_MODE_MAC", "mac.md")):
+        assert retriever.lexical_index.search(query, top_k=5)[0][2]["source"] == source
+
+    # 超出范围的阈值在查询已入库指纹时同样被钳制
+    limits = []
+    original = retriever.doc_index.find_similar
+
+    def _find_similar(queries):
+        limits.extend(limit for _, _, limit in queries)
+        return original(queries)
+
+    monkeypatch.setattr(retriever.doc_index, "find_similar", _find_similar)
+    monkeypatch.setattr(retriever, "dedup_max_distance", 10)
+    await tmp_vector_store.add_documents("text", [BOILERPLATE.format(name="x")], [{"source": "x.md"}])
+    assert limits and max(limits) == 3
@@ -0,0 +1,91 @@
+"""混合检索测试：标识符感知分词、BM25 增量索引、RRF 融合。"""
+import pytest
+
+from app.core.rag.lexical import BM25Index, tokenize
+from app.core.rag.retriever import compute_doc_id
+
+
+def test_tokenize_identifiers_and_cjk():
+    tokens = tokenize("调用TEE_AllocateOperation分配 TEE_ALG_HMAC_SHA256")
+    for term in (
+        "tee_allocateoperation",
+        "allocate",
+        "operation",
+        "tee_alg_hmac_sha256",
+        "hmac",
+        "sha256",
+        "调用",
+        "分配",
+    ):
+        assert term in tokens
+    # 中文按二元组切分
+    assert tokenize("安全存储") == ["安全", "全存", "存储"]
+    assert tokenize("x = 42") == ["42"]
+
+
+def test_bm25_incremental_updates_and_filters():
+    index = BM25Index()
+    index.add(
+        [
+            ("a_p0_c0", "TEE_AllocateOperation allocates an operation handle", {"parent_id": "a_p0", "scope": "ask"}),
+            ("b_p0_c0", "TEEC_InvokeCommand sends a command to the TA", {"parent_id": "b_p0", "scope": "ask"}),
+            ("c_p0_c0", "TEE_AllocateOperation 在 plan 中的用法", {"parent_id": "c_p0", "scope": "plan"}),
+        ]
+    )
+    assert index.count() == 3
+
+    hits = index.search("TEE_AllocateOperation", top_k=5)
+    assert {h[0] for h in hits} == {"a_p0_c0", "c_p0_c0"}
+    hits = index.search("TEE_AllocateOperation", top_k=5, where={"scope": "ask"})
+    assert [h[0] for h in hits] == ["a_p0_c0"]
+    assert hits[0][2]["parent_id"] == "a_p0"
+
+    # 重新登记同一child只替换,不重复计数
+    index.add([("a_p0_c0", "TEEC_OpenSession", {"parent_id": "a_p0"})])
+    assert index.count() == 3
+    assert [h[0] for h in index.search("allocate operation", top_k=5)] == ["c_p0_c0"]
+
+    index.remove(["c_p0_c0", "missing"])
+    assert index.count() == 2
+    assert index.search("TEE_AllocateOperation") == []
+    index.clear()
+    assert index.count() == 0
+
+
+def test_bm25_skips_common_terms_and_pages_through_filters():
+    index = BM25Index()
+    index.add(
+        [(f"n{i}_c0", "TEE_Result res = TEE_SUCCESS;", {"scope": "plan"}) for i in range(300)]
+        + [("zz_c0", "TEE_Result res = TEE_OpenPersistentObject();", {"scope": "ask"})]
+    )
+    # tee/result/res出现在所有chunk中,不参与打分;只有稀有词决定结果
+    assert index._selective_terms({"tee": 301, "openpersistentobject": 1}, 301) == {
+        "openpersistentobject": 1
+    }
+    assert index._selective_terms({"tee": 301, "result": 300}, 301) == {"result": 300}
+    hits = index.search("TEE_Result TEE_OpenPersistentObject", top_k=3)
+    assert [h[0] for h in hits] == ["zz_c0"]
+
+    # 同分按child_id排序, zz_c0在最后一页: where过滤掉前面所有候选时继续翻页
+    hits = index.search("TEE_Result", top_k=2, where={"scope": "ask"})
+    assert [h[0] for h in hits] == ["zz_c0"]
+    assert hits[0][2] == {"scope": "ask"}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tmp_vector_store", ["flat"], indirect=True)
+async def test_hybrid_retrieval_ranks_identifier_match(tmp_vector_store):
+    target = "使用 TEE_ALG_HMAC_SHA256 计算消息认证码, 先分配操作句柄再设置密钥。"
+    noise = [f"可信执行环境的会话管理与内存共享说明, 第{i}节, 分配句柄与设置密钥。" for i in range(30)]
+    docs = noise + [target]
+    await tmp_vector_store.add_documents("text", docs, [{"source": f"{i}.md", "scope": "ask"} for i in range(len(docs))])
+
+    retriever = tmp_vector_store.retrievers["text"]
+    assert retriever.lexical_index is not None
+    results = await retriever.retrieve("TEE_ALG_HMAC_SHA256 怎么用", top_k=3, where={"scope": "ask"})
+    assert results[0].metadata["source"] == "30.md"
+    assert 0 < results[0].score <= 1
+
+    # 删除文档时同步清理BM25索引
+    await tmp_vector_store.delete_document(compute_doc_id(target))
+    assert retriever.lexical_index.search("TEE_ALG_HMAC_SHA256") == []
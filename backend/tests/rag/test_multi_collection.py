@@ -0,0 +1,99 @@
+"""多集合并发检索测试：共享 query embedding、超时隔离、按分数合并。"""
+import asyncio
+import time
+
+import pytest
+
+from app.core.rag.lexical import BM25Index
+from app.core.rag.retriever import ParentDocumentRetriever
+from app.infrastructure.async_store import StoreExecutor
+from app.infrastructure.vector_store import MultiCollectionRetriever
+
+
+class FixedCollection:
+    """返回固定结果的集合桩,可模拟慢查询"""
+
+    def __init__(self, name: str, distances: list[float], delay: float = 0.0) -> None:
+        self.name = name
+        self.distances = distances
+        self.delay = delay
+
+    def query(self, query_embeddings, n_results, include, where=None):
+        time.sleep(self.delay)
+        ids = [f"{self.name}{i}_p0_c0" for i in range(len(self.distances))]
+        return {
+            "ids": [ids],
+            "documents": [[f"child {i}" for i in ids]],
+            "metadatas": [[{"parent_id": f"{self.name}{i}_p0"} for i in range(len(ids))]],
+            "distances": [self.distances],
+        }
+
+
+def _retriever(collection, embedding, executor, lexical_index=None):
+    store = {
+        f"{collection.name}{i}_p0": {"content": f"{collection.name}-{i}", "metadata": {}}
+        for i in range(len(collection.distances))
+    }
+    return ParentDocumentRetriever(
+        collection=collection,
+        embedding=embedding,
+        parent_store=store,
+        executor=executor,
+        lexical_index=lexical_index,
+    )
+
+
+@pytest.fixture
+def executor():
+    ex = StoreExecutor(read_workers=4)
+    yield ex
+    ex.shutdown()
+
+
+@pytest.mark.asyncio
+async def test_shared_embedding_and_score_merge(hash_embedding, executor):
+    text = _retriever(FixedCollection("text", [0.1, 0.5]), hash_embedding, executor)
+    code = _retriever(FixedCollection("code", [0.2, 0.3]), hash_embedding, executor)
+
+    docs = await MultiCollectionRetriever([text, code]).retrieve("query", top_k=3)
+
+    assert hash_embedding.calls == [1]
+    assert [d.content for d in docs] == ["text-0", "code-0", "code-1"]
+
+
+@pytest.mark.asyncio
+async def test_slow_collection_times_out(hash_embedding, executor):
+    fast = _retriever(FixedCollection("text", [0.1]), hash_embedding, executor)
+    slow = _retriever(FixedCollection("code", [0.0], delay=1.0), hash_embedding, executor)
+
+    start = time.perf_counter()
+    docs = await MultiCollectionRetriever([fast, slow], timeout=0.2).retrieve("query")
+    elapsed = time.perf_counter() - start
+
+    assert [d.content for d in docs] == ["text-0"]
+    assert elapsed < 0.8
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("failure", ["error", "slow"])
+async def test_embedding_failure_falls_back_to_lexical(hash_embedding, executor, failure):
+    async def _embed(text):
+        if failure == "slow":
+            await asyncio.sleep(1.0)
+        raise RuntimeError("embedding服务不可用")
+
+    hash_embedding.embed = _embed
+    lexical = BM25Index()
+    lexical.add([("text1_p0_c0", "TEE_OpenSession 打开会话", {"parent_id": "text1_p0"})])
+    hybrid = _retriever(FixedCollection("text", [0.1, 0.2]), hash_embedding, executor, lexical)
+    vector_only = _retriever(FixedCollection("code", [0.0]), hash_embedding, executor)
+
+    start = time.perf_counter()
+    docs = await MultiCollectionRetriever([hybrid, vector_only], timeout=0.2).retrieve(
+        "TEE_OpenSession"
+    )
+
+    # 混合检索的集合仍返回BM25结果,纯向量集合返回空,整体不抛异常也不超出超时
+    assert [d.content for d in docs] == ["text-1"]
+    assert time.perf_counter() - start < 0.8
+    lexical.close()
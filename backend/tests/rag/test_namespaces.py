@@ -0,0 +1,101 @@
+"""知识命名空间测试：私有知识隔离、全局+命名空间合并检索、LRU/空闲淘汰与删除。"""
+import asyncio
+
+import pytest
+
+from app.infrastructure.config import settings
+from app.infrastructure.vector_store import validate_namespace
+
+GLOBAL_DOC = "OP-TEE 的安全存储使用 TEE_CreatePersistentObject 创建持久化对象。"
+TEAM_A_DOC = "团队A的可信应用 TA_SecureVault 使用 TEE_CreatePersistentObject 保存密钥。"
+TEAM_B_DOC = "团队B的可信应用 TA_Payments 使用 TEE_CreatePersistentObject 保存交易。"
+QUERY = "TEE_CreatePersistentObject 持久化对象"
+
+
+async def _sources(manager, namespace=None, collection_type="all"):
+    docs = await manager.get_retriever(collection_type, namespace=namespace).retrieve(QUERY, top_k=10)
+    return {d.metadata.get("source") for d in docs}
+
+
+async def _fill(manager):
+    await manager.add_documents("text", [GLOBAL_DOC], [{"source": "global.md"}])
+    await manager.add_documents("text", [TEAM_A_DOC], [{"source": "a.md"}], namespace="team-a")
+    await manager.add_documents("text", [TEAM_B_DOC], [{"source": "b.md"}], namespace="team-b")
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tmp_vector_store", ["chroma", "flat"], indirect=True)
+async def test_namespace_isolation_and_merged_query(tmp_vector_store):
+    await _fill(tmp_vector_store)
+
+    assert await _sources(tmp_vector_store) == {"global.md"}
+    assert await _sources(tmp_vector_store, "team-a") == {"global.md", "a.md"}
+    assert await _sources(tmp_vector_store, "team-b", "text") == {"global.md", "b.md"}
+    # 全局集合不受命名空间写入影响
+    assert await tmp_vector_store.retrievers["text"].collection.count() > 0
+    stats = await tmp_vector_store.namespace_stats("team-a")
+    assert stats["text"]["count"] > 0 and stats["code"]["count"] == 0
+
+    # 没有私有知识的命名空间只查全局,不创建任何索引
+    assert await _sources(tmp_vector_store, "team-c") == {"global.md"}
+    assert not tmp_vector_store.has_namespace("team-c")
+    assert tmp_vector_store.list_namespaces() == ["team-a", "team-b"]
+
+    docs = await tmp_vector_store.get_retriever("all", namespace="team-a").retrieve(QUERY, top_k=10)
+    team_doc = next(d for d in docs if d.metadata.get("source") == "a.md")
+    assert team_doc.metadata["namespace"] == "team-a"
+    doc_id = team_doc.metadata["parent_id"].rsplit("_p", 1)[0]
+    assert await tmp_vector_store.delete_document(doc_id) == []
+    assert await tmp_vector_store.delete_document(doc_id, namespace="team-a") == ["text"]
+    assert await _sources(tmp_vector_store, "team-a") == {"global.md"}
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tmp_vector_store", ["flat"], indirect=True)
+async def test_namespaces_are_evicted_and_reopened(tmp_vector_store, monkeypatch):
+    monkeypatch.setattr(settings, "knowledge_namespace_max_open", 1)
+    await _fill(tmp_vector_store)
+    # 写入team-b时team-a被淘汰
+    assert list(tmp_vector_store._namespaces) == ["team-b"]
+    assert tmp_vector_store.namespace_evictions >= 1
+
+    # 被淘汰的命名空间在下次检索时重新打开,数据仍在
+    assert await _sources(tmp_vector_store, "team-a") == {"global.md", "a.md"}
+    assert list(tmp_vector_store._namespaces) == ["team-a"]
+
+    # 使用中的命名空间不会因空闲被关闭
+    async with tmp_vector_store.namespace("team-a"):
+        await asyncio.sleep(0.02)
+        assert await tmp_vector_store.evict_idle_namespaces(0.01) == []
+    await asyncio.sleep(0.02)
+    assert await tmp_vector_store.evict_idle_namespaces(0.01) == ["team-a"]
+    # 命名空间版本不随淘汰/重新打开重置,写入后才变化
+    version = tmp_vector_store.namespace_version("team-a")
+    assert version > 0 and tmp_vector_store.namespace_version("team-c") == 0
+    await tmp_vector_store.add_documents("text", ["团队A的新文档。"], [{"source": "a2.md"}], namespace="team-a")
+    assert tmp_vector_store.namespace_version("team-a") > version
+    await asyncio.sleep(0.02)
+    assert await tmp_vector_store.evict_idle_namespaces(0.01) == ["team-a"]
+    assert not tmp_vector_store._namespaces
+    assert (await tmp_vector_store.get_stats())["namespaces"]["open"] == []
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tmp_vector_store", ["chroma", "flat"], indirect=True)
+async def test_delete_namespace(tmp_vector_store):
+    await _fill(tmp_vector_store)
+    assert await tmp_vector_store.delete_namespace("team-a")
+    assert not tmp_vector_store.has_namespace("team-a")
+    assert await _sources(tmp_vector_store, "team-a") == {"global.md"}
+    assert not await tmp_vector_store.delete_namespace("team-a")
+
+    async with tmp_vector_store.namespace("team-b"):
+        with pytest.raises(RuntimeError):
+            await tmp_vector_store.delete_namespace("team-b")
+    assert await _sources(tmp_vector_store, "team-b") == {"global.md", "b.md"}
+
+
+@pytest.mark.parametrize("name", ["", "../etc", "a/b", ".hidden", "x" * 65])
+def test_invalid_namespace(name):
+    with pytest.raises(ValueError):
+        validate_namespace(name)
@@ -0,0 +1,119 @@
+"""目录加载流水线测试：并发读取切分、跨文件批量 embedding、id 与处理顺序无关。"""
+import os
+
+import pytest
+
+from app.infrastructure import vector_store as vector_store_module
+from app.infrastructure.config import settings
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch, tmp_vector_store):
+    # 语料高度重复,关闭近重复去重以便按child数校验
+    monkeypatch.setattr(tmp_vector_store.retrievers["text"], "dedup_max_distance", None)
+    root = tmp_path / "knowledge"
+    docs = root / "ask" / "docs"
+    docs.mkdir(parents=True)
+    for i in range(24):
+        (docs / f"doc{i:02d}.md").write_text(
+            f"# 第{i}章\n\n" + "TEE_InvokeTACommand 调用可信应用命令。\n\n" * (i % 4 + 1),
+            encoding="utf-8",
+        )
+    # 内容重复的文件与空文件
+    (docs / "copy.md").write_text((docs / "doc03.md").read_text(encoding="utf-8"), encoding="utf-8")
+    (docs / "empty.md").write_text("   ", encoding="utf-8")
+    monkeypatch.setattr(vector_store_module, "PRESET_DIR", root)
+    monkeypatch.setattr(
+        vector_store_module, "PRESET_SOURCES", [("ask/docs", "text", ["*.md"], "ask")]
+    )
+    return docs
+
+
+async def _child_ids(manager) -> list:
+    result = await manager.retrievers["text"].collection.get(include=[])
+    return sorted(result["ids"])
+
+
+@pytest.mark.asyncio
+async def test_pipeline_batches_across_files(tmp_vector_store, corpus, hash_embedding, monkeypatch):
+    monkeypatch.setattr(settings, "rag_load_workers", 4)
+    monkeypatch.setattr(settings, "rag_load_queue_size", 3)
+    monkeypatch.setattr(settings, "rag_load_batch_chunks", 16)
+
+    hash_embedding.calls.clear()
+    count = await tmp_vector_store._load_directory(corpus, "text", ["*.md"], {"scope": "ask"})
+    assert count == 25  # 24个文件 + 内容重复的副本(空文件不计)
+
+    ids = await _child_ids(tmp_vector_store)
+    assert len(ids) == len(set(ids))
+    # embedding跨文件合批,调用次数远少于文件数
+    assert 0 < len(hash_embedding.calls) < 24
+    assert len(tmp_vector_store.retrievers["text"].doc_index.existing(
+        [i.split("_")[0] for i in ids]
+    )) == 24
+
+
+@pytest.mark.asyncio
+async def test_ids_independent_of_parallelism(tmp_vector_store, corpus, monkeypatch):
+    monkeypatch.setattr(settings, "rag_load_workers", 1)
+    monkeypatch.setattr(settings, "rag_load_batch_chunks", 1000)
+    await tmp_vector_store.load_preset_knowledge()
+    serial = await _child_ids(tmp_vector_store)
+
+    await tmp_vector_store.delete_collection("text")
+    monkeypatch.setattr(settings, "rag_load_workers", 8)
+    monkeypatch.setattr(settings, "rag_load_batch_chunks", 7)
+    await tmp_vector_store.load_preset_knowledge()
+    assert await _child_ids(tmp_vector_store) == serial
+
+    # 仅mtime变化的文件不重新embedding
+    target = corpus / "doc05.md"
+    os.utime(target, (target.stat().st_atime, target.stat().st_mtime + 10))
+    retriever = tmp_vector_store.retrievers["text"]
+    writes = []
+    original = retriever.write_prepared
+
+    async def _write(prepared, embeddings):
+        writes.append(len(prepared.child_ids))
+        await original(prepared, embeddings)
+
+    monkeypatch.setattr(retriever, "write_prepared", _write)
+    progress = []
+    await tmp_vector_store.load_preset_knowledge(progress=lambda *args: progress.append(args))
+    assert writes == [0]
+    # 进度: 未变化文件扫描即计为可检索,变化的文件写入后计入
+    assert progress[-1] == ("ask/docs", 26, 26)
+    assert all(indexed <= scanned for _, scanned, indexed in progress)
+    assert await _child_ids(tmp_vector_store) == serial
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_retried_on_next_load(tmp_vector_store, corpus, monkeypatch):
+    monkeypatch.setattr(settings, "rag_load_workers", 1)
+    monkeypatch.setattr(settings, "rag_load_batch_chunks", 1)  # 每个文件一个批次
+    retriever = tmp_vector_store.retrievers["text"]
+    original = retriever.collection.add
+    failing = {"on": True}
+
+    async def _add(**kwargs):
+        if failing["on"] and any(doc.startswith("# 第3章") for doc in kwargs["documents"]):
+            raise RuntimeError("写入失败")
+        return await original(**kwargs)
+
+    monkeypatch.setattr(retriever.collection, "add", _add)
+    await tmp_vector_store.load_preset_knowledge()
+
+    manifest = tmp_vector_store._open_manifest()
+    # doc03与内容相同的copy.md都未提交到清单,其余文件正常入库
+    assert "ask/docs/doc03.md" not in manifest.entries
+    assert "ask/docs/copy.md" not in manifest.entries
+    assert "ask/docs/doc04.md" in manifest.entries
+    before = await retriever.collection.count()
+
+    failing["on"] = False
+    await tmp_vector_store.load_preset_knowledge()
+    manifest = tmp_vector_store._open_manifest()
+    assert {"ask/docs/doc03.md", "ask/docs/copy.md"} <= manifest.entries.keys()
+    assert await retriever.collection.count() > before
+    docs = await retriever.retrieve("第3章", top_k=30)
+    assert any(d.metadata["filename"] in ("doc03.md", "copy.md") for d in docs)
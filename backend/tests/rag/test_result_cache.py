@@ -0,0 +1,85 @@
+"""检索结果缓存测试：按版本号失效、键包含 where/top_k、命中率统计。"""
+import pytest
+
+from app.core.rag.retriever import compute_doc_id
+
+DOCS = [
+    "TEE_OpenPersistentObject 打开安全存储中的持久化对象。",
+    "TEEC_InvokeCommand 向可信应用发送命令并等待返回。",
+]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tmp_vector_store", ["flat"], indirect=True)
+async def test_result_cache_versioned_invalidation(tmp_vector_store, monkeypatch):
+    await tmp_vector_store.add_documents("text", DOCS, [{"source": f"{i}.md", "scope": "ask"} for i in range(2)])
+    retriever = tmp_vector_store.retrievers["text"]
+    version = retriever.version
+
+    searches = []
+    original = retriever._search
+
+    async def counting(*args, **kwargs):
+        searches.append(args[0])
+        return await original(*args, **kwargs)
+
+    monkeypatch.setattr(retriever, "_search", counting)
+
+    first = await retriever.retrieve("安全存储", top_k=2, where={"scope": "ask"})
+    again = await retriever.retrieve("安全存储", top_k=2, where={"scope": "ask"})
+    assert [d.content for d in again] == [d.content for d in first]
+    assert len(searches) == 1
+
+    # where / top_k 不同不共用结果
+    await retriever.retrieve("安全存储", top_k=1, where={"scope": "ask"})
+    await retriever.retrieve("安全存储", top_k=2, where={"scope": "plan"})
+    assert len(searches) == 3
+
+    # 写入后版本号递增,旧结果不再命中
+    await tmp_vector_store.add_documents("text", ["安全存储对象可以被重命名。"], [{"source": "2.md", "scope": "ask"}])
+    assert retriever.version > version
+    refreshed = await retriever.retrieve("安全存储", top_k=3, where={"scope": "ask"})
+    assert len(searches) == 4
+    assert "2.md" in {d.metadata["source"] for d in refreshed}
+
+    await tmp_vector_store.delete_document(compute_doc_id(DOCS[0]))
+    await retriever.retrieve("安全存储", top_k=3, where={"scope": "ask"})
+    assert len(searches) == 5
+
+    await tmp_vector_store.delete_collection("text")
+    assert await retriever.retrieve("安全存储", top_k=3, where={"scope": "ask"}) == []
+    assert len(searches) == 6
+
+    stats = (await tmp_vector_store.get_stats())["text"]["result_cache"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 6
+    assert stats["version"] == retriever.version
+
+
+@pytest.mark.asyncio
+async def test_multi_collection_retrieve_uses_cache(tmp_vector_store):
+    await tmp_vector_store.add_documents("text", DOCS, [{"source": "a.md"}, {"source": "b.md"}])
+    multi = tmp_vector_store.get_retriever("all")
+
+    first = await multi.retrieve("TEEC_InvokeCommand", top_k=2)
+    second = await multi.retrieve("TEEC_InvokeCommand", top_k=2)
+    assert [d.content for d in second] == [d.content for d in first]
+    for key in ("text", "code"):
+        assert tmp_vector_store.retrievers[key].result_cache.hits == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("tmp_vector_store", ["flat"], indirect=True)
+async def test_cached_results_are_isolated_copies(tmp_vector_store):
+    await tmp_vector_store.add_documents("text", DOCS, [{"source": f"{i}.md"} for i in range(2)])
+    retriever = tmp_vector_store.retrievers["text"]
+
+    first = await retriever.retrieve("安全存储", top_k=2)
+    first[0].metadata["annotated"] = True
+    first[0].score = -1.0
+
+    # 调用方修改返回结果不影响后续命中缓存的结果
+    again = await retriever.retrieve("安全存储", top_k=2)
+    assert retriever.cache_stats()["hits"] >= 1
+    assert "annotated" not in again[0].metadata
+    assert again[0].score > 0